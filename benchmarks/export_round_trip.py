@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
+
+''' Check that the results of the pipeline survive a round trip through the output files, e.g. in continuous integration.
+
+The synthetic data is given missing values, so that the matching results mix True and False with the missing marker
+and the matching keywords of some chunks are all missing. The results are written in each columnar format, at once and
+in chunks, read back with DataImporter and compared with the ones computed in memory. The results are also streamed
+from a CSV file, whose first chunk has columns without any value, i.e. inferred as floats. Run from the root of the
+repository, e.g.:
+
+    python benchmarks/export_round_trip.py --rows 10000 --chunk-size 1000
+'''
+
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+_REPOSITORY_PATH = Path(__file__).resolve().parents[1]
+
+sys.path.insert(0, str(_REPOSITORY_PATH))
+
+import numpy
+import pandas
+
+import data_clues as dc
+from benchmarks.synthetic_data import generate_dataframe
+
+_MATCHING_PARAMETERS_DICTS = [
+    {'target_column_label': 'full_name', 'reference_keywords_list': ['John Doe', 'Jane Doe'],
+        'results_column_label': 'match_full_name', 'matched_keywords_column_label': 'matched_full_name'},
+    {'target_column_label': 'website', 'reference_keywords_list': ['.com', '.org'],
+        'results_column_label': 'match_website', 'match_mode': 'search'},
+]
+
+_OCCURRENCES_PARAMETERS_DICTS = [
+    {'target_column_label': 'email', 'results_column_label': 'occurrences_email'},
+]
+
+_FORMATS = ['parquet', 'feather', 'arrow']
+
+
+def results_dataframe(rows, missing_ratio=None, seed=None):
+    ''' Run the pipeline on synthetic data with missing values.
+
+    Args:
+        rows: The number of rows.
+        missing_ratio: The share of the values replaced by missing values. If not provided, 0.1 is used.
+        seed: The seed of the synthetic data and of the missing values. If not provided, 0 is used.
+    Raises:
+        None
+    Returns:
+        The Pandas Dataframe with the results of the pipeline.
+    '''
+
+    _seed = seed if seed is not None else 0
+
+    _target_df = generate_dataframe(rows, seed=_seed)
+
+    _random_state = numpy.random.default_rng(_seed)
+
+    _target_df = _target_df.mask(_random_state.random(_target_df.shape) < (
+        missing_ratio if missing_ratio is not None else 0.1))
+
+    return dc.Pipeline(_MATCHING_PARAMETERS_DICTS, None, _OCCURRENCES_PARAMETERS_DICTS, workers=1).run(_target_df)
+
+
+def check_round_trip(results_df, chunk_size=None):
+    ''' Write the results in each columnar format, at once, in chunks and streamed from a CSV file, and compare them with
+    the ones read back.
+
+    Args:
+        results_df: The Pandas Dataframe with the results of the pipeline.
+        chunk_size: The number of rows of each chunk. If not provided, 1000 is used.
+    Raises:
+        None
+    Returns:
+        A list with the mismatches, empty if there are none.
+    '''
+
+    _chunk_size = chunk_size if chunk_size is not None else 1000
+
+    # The rows without any matching keyword come first, so that the keywords of the first chunk are all missing
+    _ordered_df = results_df.iloc[numpy.argsort(
+        results_df['matched_full_name'].notna().to_numpy(), kind='stable')].reset_index(drop=True)
+
+    _mismatches = []
+
+    with tempfile.TemporaryDirectory(prefix='data_clues-') as _directory:
+
+        _ordered_df.to_csv(Path(_directory) / 'results.csv', index=False)
+
+        _csv_df = pandas.read_csv(Path(_directory) / 'results.csv')
+
+        for file_format in _FORMATS:
+
+            _filename = f'results.{file_format}'
+
+            try:
+
+                dc.export_dataframe(_ordered_df, str(Path(_directory) / _filename))
+
+                with dc.ChunksWriter(str(Path(_directory) / f'chunks-{_filename}')) as _writer:
+
+                    for start in range(0, len(_ordered_df), _chunk_size):
+                        _writer.write(_ordered_df.iloc[start:start + _chunk_size])
+
+                with dc.ChunksWriter(str(Path(_directory) / f'csv-chunks-{_filename}')) as _writer:
+
+                    for target_chunk in dc.DataImporter(csv_filepath=_directory, csv_filename='results.csv',
+                                                        chunk_size=_chunk_size).iter_chunks():
+                        _writer.write(target_chunk)
+
+                for filename, expected_df in ((_filename, _ordered_df), (f'chunks-{_filename}', _ordered_df),
+                                              (f'csv-chunks-{_filename}', _csv_df)):
+
+                    pandas.testing.assert_frame_equal(dc.DataImporter(filepath=_directory, filename=filename).get_dataframe(),
+                                                      expected_df, check_dtype=False)
+
+            except Exception as error:
+
+                _mismatches.append(f'{file_format}: {type(error).__name__}: {error}')
+
+    print(f'{len(_FORMATS) - len(_mismatches)} of {len(_FORMATS)} formats round-tripped {len(results_df)} rows')
+
+    return _mismatches
+
+
+if __name__ == '__main__':
+
+    _parser = argparse.ArgumentParser(
+        description='Check the round trip of the results of data_clues through the columnar output files.')
+
+    _parser.add_argument('--rows', type=int, default=10000,
+                         help='The number of rows of the synthetic data.')
+    _parser.add_argument('--chunk-size', type=int, default=1000,
+                         help='The number of rows of each chunk written.')
+    _parser.add_argument('--missing-ratio', type=float, default=0.1,
+                         help='The share of the values replaced by missing values.')
+
+    _arguments = _parser.parse_args()
+
+    _round_trip_mismatches = check_round_trip(results_dataframe(
+        _arguments.rows, _arguments.missing_ratio), _arguments.chunk_size)
+
+    for mismatch in _round_trip_mismatches:
+        print(mismatch, file=sys.stderr)
+
+    sys.exit(1 if _round_trip_mismatches else 0)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
+
+''' Measure the time taken by `import data_clues` and enforce a budget, e.g. in continuous integration.
+
+Each import is timed in a fresh interpreter. As data_clues registers its accessors on Pandas, the budget applies to the
+time on top of `import pandas`, which is measured in the same way. The heavy dependencies used by a few sources or
+analyses only, e.g. SQLAlchemy and Levenshtein, must not be imported at all. Run from the root of the repository, e.g.:
+
+    python benchmarks/import_time.py --budget 0.1 --repeat 7
+'''
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+_REPOSITORY_PATH = Path(__file__).resolve().parents[1]
+
+# The modules which must not be imported by `import data_clues`
+_DEFERRED_MODULES = ['sqlalchemy', 'Levenshtein', 'data_clues.data_importer', 'data_clues.similarity_checker',
+                     'data_clues.keywords_matcher', 'data_clues.pipeline']
+
+# Time an import, then list the modules it loaded
+_IMPORT_SCRIPT = '''
+import json, sys, time
+sys.path.insert(0, {repository_path!r})
+_start_time = time.perf_counter()
+import {module_name}
+print(json.dumps({{'seconds': time.perf_counter() - _start_time, 'modules': sorted(sys.modules)}}))
+'''
+
+
+def measure_import(module_name, repeat=None):
+    ''' Time the import of a module, each time in a fresh interpreter.
+
+    Args:
+        module_name: The name of the module to be imported.
+        repeat: The number of timed imports. If not provided, 5 is used.
+    Raises:
+        subprocess.CalledProcessError: If the import fails.
+    Returns:
+        A tuple with the median duration in seconds and the names of the modules loaded by the import.
+    '''
+
+    _durations = []
+
+    for _ in range(repeat if repeat is not None else 5):
+
+        _output = json.loads(subprocess.run([sys.executable, '-c', _IMPORT_SCRIPT.format(
+            repository_path=str(_REPOSITORY_PATH), module_name=module_name)], capture_output=True, text=True, check=True).stdout)
+
+        _durations.append(_output['seconds'])
+
+    return statistics.median(_durations), _output['modules']
+
+
+def check_import_budget(budget=None, repeat=None):
+    ''' Check that `import data_clues` stays within the budget and does not load the deferred dependencies.
+
+    Args:
+        budget: The maximum time in seconds on top of `import pandas`. If not provided, 0.1 is used.
+        repeat: The number of timed imports of each module.
+    Raises:
+        None
+    Returns:
+        A list with the violations of the budget, empty if there are none.
+    '''
+
+    _budget = budget if budget is not None else 0.1
+
+    _pandas_seconds, _ = measure_import('pandas', repeat)
+    _data_clues_seconds, _loaded_modules = measure_import('data_clues', repeat)
+
+    _overhead = _data_clues_seconds - _pandas_seconds
+
+    print(f"{'import pandas':<24}{_pandas_seconds:>10.3f} s")
+    print(f"{'import data_clues':<24}{_data_clues_seconds:>10.3f} s{_overhead:>+10.3f} s (budget {_budget:.3f} s)")
+
+    _violations = []
+
+    if _overhead > _budget:
+        _violations.append(
+            f'import data_clues takes {_overhead:.3f} s on top of pandas, over the budget of {_budget:.3f} s.')
+
+    for module_name in _DEFERRED_MODULES:
+
+        if module_name in _loaded_modules:
+            _violations.append(
+                f'import data_clues imports {module_name}, which should be imported on first use.')
+
+    return _violations
+
+
+if __name__ == '__main__':
+
+    _parser = argparse.ArgumentParser(
+        description='Enforce a budget on the import time of data_clues.')
+
+    _parser.add_argument('--budget', type=float, default=0.1,
+                         help='The maximum time in seconds of `import data_clues` on top of `import pandas`.')
+    _parser.add_argument('--repeat', type=int, default=5,
+                         help='The number of timed imports of each module, of which the median is taken.')
+
+    _arguments = _parser.parse_args()
+
+    _budget_violations = check_import_budget(_arguments.budget, _arguments.repeat)
+
+    for violation in _budget_violations:
+        print(violation, file=sys.stderr)
+
+    sys.exit(1 if _budget_violations else 0)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
+
+''' Check the incremental import of several sources, only some of which keep a watermark, e.g. in continuous integration.
+
+A SQLite table, imported in full at each run, is read along with CSV shards imported incrementally. After a first run,
+rows are appended to one of the shards: the second run must import the whole table again and only the rows appended
+to the shard, both at once and in chunks. Run from the root of the repository, e.g.:
+
+    python benchmarks/incremental_sources.py
+'''
+
+import sys
+import tempfile
+from pathlib import Path
+
+_REPOSITORY_PATH = Path(__file__).resolve().parents[1]
+
+sys.path.insert(0, str(_REPOSITORY_PATH))
+
+import pandas
+
+import data_clues as dc
+
+_TABLE_ROWS = pandas.DataFrame({'full_name': ['John Doe', 'Jane Doe', 'Mario Rossi']})
+
+_SHARDS_ROWS = [pandas.DataFrame({'full_name': ['Anna Bianchi', 'Luca Verdi']}),
+                pandas.DataFrame({'full_name': ['Paolo Neri']})]
+
+_APPENDED_ROWS = pandas.DataFrame({'full_name': ['Giulia Gialli', 'Marco Blu']})
+
+
+def _sources_data(directory):
+    ''' Write the table and the shards of a check, and return the parameters of their importers.
+
+    Args:
+        directory: The directory where the database, the shards and the watermark files are written.
+    Raises:
+        None
+    Returns:
+        A list of dictionaries with the parameters of the DataImporter of each source, the table first.
+    '''
+
+    import sqlalchemy
+
+    _database_file = str(Path(directory) / 'sources.db')
+
+    _TABLE_ROWS.to_sql('people', sqlalchemy.create_engine(f'sqlite:///{_database_file}'), index=False)
+
+    _sources_data = [{'db_type': 'sqlite', 'db_name': _database_file, 'table_name': 'people'}]
+
+    for position, shard_rows in enumerate(_SHARDS_ROWS):
+
+        shard_rows.to_csv(Path(directory) / f'shard-{position}.csv', index=False)
+
+        _sources_data.append({'csv_filepath': directory, 'csv_filename': f'shard-{position}.csv',
+                              'watermark_file': str(Path(directory) / f'watermark-shard-{position}.csv.json')})
+
+    return _sources_data
+
+
+def _imported_names(sources_data, chunk_size=None):
+    ''' Import the sources, save their watermarks and return the names imported.
+
+    Args:
+        sources_data: A list of dictionaries with the parameters of the DataImporter of each source.
+        chunk_size: If provided, the sources are streamed in chunks of this number of rows.
+    Raises:
+        None
+    Returns:
+        The sorted list of the names imported.
+    '''
+
+    _data_importer = dc.MultiSourceImporter(sources_data, workers=2)
+
+    if chunk_size is not None:
+        _target_df = pandas.concat(list(_data_importer.iter_chunks(chunk_size)), ignore_index=True)
+    else:
+        _target_df = _data_importer.get_dataframe()
+
+    _data_importer.save_watermark()
+
+    return sorted(_target_df['full_name'])
+
+
+def check_incremental_sources(chunk_size=None):
+    ''' Run the import twice, appending rows to a shard in between, and compare the names imported by each run.
+
+    Args:
+        chunk_size: If provided, the sources are streamed in chunks of this number of rows.
+    Raises:
+        None
+    Returns:
+        A list with the mismatches, empty if there are none.
+    '''
+
+    _mismatches = []
+
+    with tempfile.TemporaryDirectory(prefix='data_clues-') as _directory:
+
+        _sources = _sources_data(_directory)
+
+        _expected_names = [sorted(pandas.concat([_TABLE_ROWS, *_SHARDS_ROWS])['full_name']),
+                           sorted(pandas.concat([_TABLE_ROWS, _APPENDED_ROWS])['full_name'])]
+
+        for run, expected_names in enumerate(_expected_names):
+
+            try:
+
+                _names = _imported_names(_sources, chunk_size)
+
+                if _names != expected_names:
+                    _mismatches.append(f'run {run}: imported {_names}, expected {expected_names}')
+
+            except Exception as error:
+
+                _mismatches.append(f'run {run}: {type(error).__name__}: {error}')
+
+            _APPENDED_ROWS.to_csv(Path(_directory) / 'shard-0.csv', mode='a', header=False, index=False)
+
+    return _mismatches
+
+
+if __name__ == '__main__':
+
+    _incremental_mismatches = [f'{mode}: {mismatch}' for mode, chunk_size in (('at once', None), ('in chunks', 1))
+                               for mismatch in check_incremental_sources(chunk_size)]
+
+    for mismatch in _incremental_mismatches:
+        print(mismatch, file=sys.stderr)
+
+    print(f'{"failed" if _incremental_mismatches else "passed"}: incremental import of a table and of CSV shards')
+
+    sys.exit(1 if _incremental_mismatches else 0)
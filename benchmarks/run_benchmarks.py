@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
+
+''' Time and memory-profile the bulk methods of the accessors on synthetic data of growing size.
+
+Run from the root of the repository, e.g.:
+
+    python benchmarks/run_benchmarks.py --rows 10000 100000 1000000 --output benchmark_results.json
+    python benchmarks/run_benchmarks.py --rows 10000 --compare benchmark_results.json
+'''
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+_REPOSITORY_PATH = Path(__file__).resolve().parents[1]
+
+# The paths given as arguments are relative to the directory the benchmarks are run from
+_WORKING_PATH = Path.cwd()
+
+sys.path.insert(0, str(_REPOSITORY_PATH))
+
+# The reference lists are read from paths relative to the root of the repository
+os.chdir(_REPOSITORY_PATH)
+
+import numpy
+import pandas
+
+import data_clues as dc
+from data.input import reference_keywords_lists as rkl
+from benchmarks.synthetic_data import generate_dataframe
+from data_clues.similarity_checker import _cached_similarity_ratio
+
+# The same operations as main.py
+_MATCHING_PARAMETERS_DICTS = [
+    {'target_column_label': 'full_name',
+        'reference_keywords_list': rkl.placeholder_names, 'results_column_label': 'match_full_name'},
+    {'target_column_label': 'email', 'reference_keywords_list': rkl.popular_urls,
+        'results_column_label': 'match_email_domain'},
+    {'target_column_label': 'website', 'reference_keywords_list': rkl.generic_tlds,
+        'results_column_label': 'match_website_tld'},
+]
+
+_SIMILARITY_PARAMETERS_DICTS = [
+    {'target_column_a_label': 'username', 'target_column_b_label': 'email',
+        'results_column_label': 'similarity_username_email'},
+    {'target_column_a_label': 'username', 'target_column_b_label': 'website',
+        'results_column_label': 'similarity_username_website'},
+    {'target_column_a_label': 'full_name', 'target_column_b_label': 'username',
+        'results_column_label': 'similarity_full_name_username'},
+]
+
+_OCCURRENCES_PARAMETERS_DICTS = [
+    {'target_column_label': 'email', 'custom_factors': [
+        1, 3, 2], 'results_column_label': 'tweaked_similarity_email'},
+    {'target_column_label': 'website',
+        'results_column_label': 'standard_similarity_website'},
+]
+
+# The benchmarked methods, by name
+_BENCHMARKS = {
+    'bulk_data_matching': lambda target_df, executor: target_df.dc_matching.bulk_data_matching(
+        _MATCHING_PARAMETERS_DICTS, executor=executor),
+    'bulk_check_similarity': lambda target_df, executor: target_df.dc_similarity.bulk_check_similarity(
+        _SIMILARITY_PARAMETERS_DICTS, executor=executor),
+    'bulk_character_occurrences_analysis': lambda target_df, executor: target_df.dc_occurrences.bulk_character_occurrences_analysis(
+        _OCCURRENCES_PARAMETERS_DICTS, executor=executor),
+}
+
+
+def _measure(benchmark_function, target_df, executor, repeat):
+    ''' Time a benchmark, then run it once more tracing the memory allocations.
+
+    Each run starts with the process-wide cache of the similarity ratios cleared, so that every run is measured cold
+    and the timings of different runs are comparable.
+
+    Args:
+        benchmark_function: The function running the benchmarked method.
+        target_df: The Pandas Dataframe to be processed.
+        executor: The SharedMemoryExecutor running the operations.
+        repeat: The number of timed runs.
+    Raises:
+        None
+    Returns:
+        A dictionary with the best and the median duration in seconds, and the peak of the memory allocated in bytes.
+    '''
+
+    _durations = []
+
+    for _ in range(repeat):
+
+        _cached_similarity_ratio.cache_clear()
+
+        _start_time = time.perf_counter()
+
+        benchmark_function(target_df, executor)
+
+        _durations.append(time.perf_counter() - _start_time)
+
+    _cached_similarity_ratio.cache_clear()
+
+    # Tracing slows the allocations down, so the memory is measured in a separate run
+    tracemalloc.start()
+
+    benchmark_function(target_df, executor)
+
+    _, _peak_memory = tracemalloc.get_traced_memory()
+
+    tracemalloc.stop()
+
+    return {'best_seconds': min(_durations), 'median_seconds': float(numpy.median(_durations)), 'peak_memory_bytes': _peak_memory}
+
+
+def run_benchmarks(rows_counts, cardinality=None, duplicate_ratio=None, seed=None, repeat=None, workers=None, benchmarks_names=None):
+    ''' Run the benchmarks on synthetic dataframes of the given sizes.
+
+    Args:
+        rows_counts: The list of numbers of rows of the synthetic dataframes.
+        cardinality: The number of distinct entities, see generate_dataframe.
+        duplicate_ratio: The share of duplicate rows, see generate_dataframe.
+        seed: The seed of the generator of the synthetic data.
+        repeat: The number of timed runs of each benchmark. If not provided, 3 is used.
+        workers: The number of worker processes of the executor. If not provided, 1 is used, so that the memory of the
+            whole computation is traced.
+        benchmarks_names: The names of the methods to be benchmarked. If not provided, all of them are.
+    Raises:
+        None
+    Returns:
+        A dictionary with the environment, the parameters and the results of the benchmarks.
+    '''
+
+    _repeat = repeat if repeat is not None else 3
+
+    _executor = dc.SharedMemoryExecutor(
+        workers=workers if workers is not None else 1)
+
+    _results = []
+
+    for rows_count in rows_counts:
+
+        _target_df = generate_dataframe(
+            rows_count, cardinality, duplicate_ratio, seed=seed)
+
+        for name in benchmarks_names or _BENCHMARKS:
+
+            _result = {'benchmark': name, 'rows': rows_count, 'unique_values': {
+                label: int(_target_df[label].nunique()) for label in _target_df.columns}}
+
+            _result.update(_measure(
+                _BENCHMARKS[name], _target_df, _executor, _repeat))
+
+            _results.append(_result)
+
+            print(f"{name:<40}{rows_count:>12} rows{_result['best_seconds']:>12.3f} s{_result['peak_memory_bytes'] / 2**20:>12.1f} MiB")
+
+    return {
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(), 'numpy': numpy.__version__,
+                        'pandas': pandas.__version__, 'cpus': os.cpu_count()},
+        'parameters': {'cardinality': cardinality, 'duplicate_ratio': duplicate_ratio, 'seed': seed, 'repeat': _repeat, 'workers': workers},
+        'results': _results,
+    }
+
+
+def compare_results(results, baseline_results):
+    ''' Print the speedup and the memory ratio of each benchmark with respect to a previous run.
+
+    Args:
+        results: The results of the current run, as returned by run_benchmarks.
+        baseline_results: The results of the previous run.
+    Raises:
+        None
+    Returns:
+        None
+    '''
+
+    _baseline = {(result['benchmark'], result['rows']): result
+                 for result in baseline_results['results']}
+
+    for result in results['results']:
+
+        _baseline_result = _baseline.get((result['benchmark'], result['rows']))
+
+        if _baseline_result is None:
+            continue
+
+        _speedup = _baseline_result['best_seconds'] / \
+            result['best_seconds'] if result['best_seconds'] else float('inf')
+        _memory_ratio = result['peak_memory_bytes'] / \
+            _baseline_result['peak_memory_bytes'] if _baseline_result['peak_memory_bytes'] else float('inf')
+
+        print(f"{result['benchmark']:<40}{result['rows']:>12} rows{_speedup:>10.2f}x speed{_memory_ratio:>10.2f}x memory")
+
+
+if __name__ == '__main__':
+
+    _parser = argparse.ArgumentParser(
+        description='Benchmark the bulk methods of data_clues on synthetic data.')
+
+    _parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000],
+                         help='The numbers of rows of the synthetic dataframes, e.g. 10000 1000000 50000000.')
+    _parser.add_argument('--cardinality', type=int,
+                         help='The number of distinct entities of each dataframe.')
+    _parser.add_argument('--duplicate-ratio', type=float,
+                         help='The share of duplicate rows, if no cardinality is provided (default: 0.5).')
+    _parser.add_argument('--seed', type=int, default=0,
+                         help='The seed of the generator of the synthetic data.')
+    _parser.add_argument('--repeat', type=int, default=3,
+                         help='The number of timed runs of each benchmark.')
+    _parser.add_argument('--workers', type=int, default=1,
+                         help='The number of worker processes of the executor.')
+    _parser.add_argument('--benchmarks', nargs='+', choices=list(_BENCHMARKS),
+                         help='The methods to be benchmarked (default: all of them).')
+    _parser.add_argument('--output', default='benchmark_results.json',
+                         help='The JSON file where the results are written.')
+    _parser.add_argument('--compare',
+                         help='The JSON file of a previous run, to which the results are compared.')
+
+    _arguments = _parser.parse_args()
+
+    _benchmark_results = run_benchmarks(_arguments.rows, _arguments.cardinality, _arguments.duplicate_ratio,
+                                        _arguments.seed, _arguments.repeat, _arguments.workers, _arguments.benchmarks)
+
+    with open(_WORKING_PATH / _arguments.output, 'w') as _output_file:
+        json.dump(_benchmark_results, _output_file, indent=4)
+
+    if _arguments.compare is not None:
+
+        with open(_WORKING_PATH / _arguments.compare) as _baseline_file:
+            compare_results(_benchmark_results, json.load(_baseline_file))
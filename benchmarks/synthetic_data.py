@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
+
+__all__ = ['generate_dataframe']
+
+import json
+from pathlib import Path
+
+import numpy
+import pandas
+
+# The mock data, whose names and domains are the vocabulary of the synthetic data
+_MOCK_DATA_FILE = Path(__file__).resolve(
+).parents[1] / 'data' / 'input' / 'mock_data.csv'
+_POPULAR_URLS_FILE = Path(__file__).resolve(
+).parents[1] / 'data' / 'input' / 'popular_urls.json'
+
+_PLACEHOLDER_NAMES = ['John Doe', 'Jane Doe', 'Mary Moe', 'Jean Dupont',
+                      'Max Mustermann', 'Erika Mustermann', 'João das Couves', 'Maria das Couves']
+
+
+def _vocabulary():
+    ''' Collect the first names, the last names and the domains of the mock data.
+
+    Args:
+        None
+    Raises:
+        None
+    Returns:
+        A tuple with the arrays of first names, last names and domains.
+    '''
+
+    _mock_df = pandas.read_csv(_MOCK_DATA_FILE)
+
+    _names = _mock_df['full_name'].str.split(' ', n=1, expand=True)
+
+    with open(_POPULAR_URLS_FILE) as _popular_urls_file:
+        _popular_urls = json.load(_popular_urls_file)
+
+    _domains = pandas.unique(pandas.concat([_mock_df['website'], _mock_df['email'].str.split(
+        '@').str[1], pandas.Series(_popular_urls, dtype=object)], ignore_index=True).dropna())
+
+    return (numpy.array(pandas.unique(_names[0]), dtype=object), numpy.array(pandas.unique(_names[1].dropna()), dtype=object),
+            numpy.array(_domains, dtype=object))
+
+
+def generate_dataframe(rows, cardinality=None, duplicate_ratio=None, placeholder_ratio=None, seed=None):
+    ''' Generate a dataframe with the schema of the mock data (full_name, email, website, username).
+
+    Each row belongs to one of cardinality entities (people), whose values are derived from a random first name, last
+    name and domain, so that the values of the different columns are related as in the mock data. Every entity appears
+    at least once, and the other rows repeat random entities.
+
+    Args:
+        rows: The number of rows.
+        cardinality: The number of distinct entities. If not provided, it is derived from the duplicate_ratio.
+        duplicate_ratio: The share of rows repeating an entity of a previous row, used if no cardinality is provided.
+            If not provided, 0.5 is used.
+        placeholder_ratio: The share of entities whose full name is a placeholder name (e.g. John Doe). If not provided, 0.01 is used.
+        seed: The seed of the random generator, so that the same data are generated at every run. If not provided, 0 is used.
+    Raises:
+        None
+    Returns:
+        The Pandas Dataframe.
+    '''
+
+    _duplicate_ratio = duplicate_ratio if duplicate_ratio is not None else 0.5
+    _placeholder_ratio = placeholder_ratio if placeholder_ratio is not None else 0.01
+
+    _cardinality = min(rows, cardinality if cardinality is not None else max(
+        1, round(rows * (1 - _duplicate_ratio))))
+
+    _random_state = numpy.random.default_rng(seed if seed is not None else 0)
+
+    _first_names, _last_names, _domains = _vocabulary()
+
+    # The values of the entities
+    _entity_first_names = _first_names[_random_state.integers(
+        0, len(_first_names), _cardinality)]
+    _entity_last_names = _last_names[_random_state.integers(
+        0, len(_last_names), _cardinality)]
+
+    _full_names = pandas.Series(_entity_first_names, dtype=object) + ' ' + \
+        pandas.Series(_entity_last_names, dtype=object)
+
+    _is_placeholder = _random_state.random(_cardinality) < _placeholder_ratio
+
+    _full_names[_is_placeholder] = numpy.array(_PLACEHOLDER_NAMES, dtype=object)[
+        _random_state.integers(0, len(_PLACEHOLDER_NAMES), int(_is_placeholder.sum()))]
+
+    # As in the mock data, e.g. pcuniam0 for Page Cuniam
+    _usernames = (pandas.Series(_entity_first_names, dtype=object).str[0] + pandas.Series(_entity_last_names, dtype=object).str.replace(
+        r'\W', '', regex=True) + pandas.Series(numpy.arange(_cardinality), dtype=object).astype(str)).str.lower()
+
+    _emails = _usernames + '@' + \
+        pandas.Series(
+            _domains[_random_state.integers(0, len(_domains), _cardinality)], dtype=object)
+
+    _websites = pandas.Series(
+        _domains[_random_state.integers(0, len(_domains), _cardinality)], dtype=object)
+
+    # Each entity appears at least once, the remaining rows repeat random entities
+    _entities = _random_state.permutation(numpy.concatenate((numpy.arange(
+        _cardinality), _random_state.integers(0, _cardinality, rows - _cardinality))))
+
+    return pandas.DataFrame({
+        'full_name': _full_names.to_numpy()[_entities],
+        'email': _emails.to_numpy()[_entities],
+        'website': _websites.to_numpy()[_entities],
+        'username': _usernames.to_numpy()[_entities],
+    })
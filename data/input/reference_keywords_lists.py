@@ -2,8 +2,9 @@
 # Copyright (c) 2021 Francesco Ugolini
 
 import json
+import os
 
-__all__ = ['generic_hostnames', 'popular_urls', 'placeholder_names']
+__all__ = ['generic_tlds', 'popular_urls', 'placeholder_names']
 
 # Source
 
@@ -18,11 +19,26 @@ generic_tlds = (
 
 # B. JSON Files
 
-# B.1 - Popular URLs
-popular_urls = []
+# The lists read from JSON files, by name. They are loaded on first use, from the directory of this module
+
+# B.1 - Popular URLs (popular_urls)
+_JSON_LISTS_FILES = {'popular_urls': 'popular_urls.json'}
+
+_json_lists = {}
+
+
+def __getattr__(name):
+
+    if name not in _JSON_LISTS_FILES:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    if name not in _json_lists:
+
+        with open(os.path.join(os.path.dirname(__file__), _JSON_LISTS_FILES[name]), 'r') as json_list:
+            _json_lists[name] = json.load(json_list)
+
+    return _json_lists[name]
 
-with open('data/input/popular_urls.json', 'r') as urls:
-    popular_urls = json.load(urls)
 
 # C. Coded lists
 
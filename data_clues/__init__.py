@@ -1,9 +1,91 @@
 # -*- coding: utf-8 -*-
 # Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
 
-from data_clues.settings import *
-from data_clues.data_importer import *
-from data_clues.utilities import *
-from data_clues.keywords_matcher import *
-from data_clues.similarity_checker import *
-from data_clues.occurrences_analyzer import *
+# The modules are imported on first use of their names, so that short jobs and worker processes only pay for the
+# modules (and the dependencies, e.g. SQLAlchemy or Levenshtein) they actually use.
+
+import importlib
+
+import pandas
+
+# The public names of each module, i.e. its __all__
+_MODULES_NAMES = {
+    'data_clues.settings': ['SettingsReader'],
+    'data_clues.instrumentation': ['add_hook', 'remove_hook', 'stage', 'record', 'MetricsCollector'],
+    'data_clues.data_importer': ['DataImporter', 'pooled_engine', 'COLUMNAR_FORMATS'],
+    'data_clues.multi_source_importer': ['MultiSourceImporter'],
+    'data_clues.data_exporter': ['export_dataframe', 'ChunksWriter'],
+    'data_clues.results_cache': ['ResultsCache', 'PersistentResultsCache', 'operation_key', 'value_key'],
+    'data_clues.utilities': ['basic_unique_values', 'advanced_unique_values', 'factorize_columns', 'broadcast_results',
+                             'map_unique_values', 'code_points_batches', 'count_character_types', 'shape_signatures'],
+    'data_clues.sketches': ['CountMinSketch', 'HyperLogLog', 'ReservoirSample', 'SketchProfiler'],
+    'data_clues.parallel_executor': ['SharedMemoryExecutor'],
+    'data_clues.keywords_automaton': ['KeywordsAutomaton'],
+    'data_clues.keywords_bk_tree': ['KeywordsBKTree'],
+    'data_clues.keywords_matcher': ['KeywordsMatcher', 'compile_reference_keywords'],
+    'data_clues.minhash_index': ['MinHashIndex'],
+    'data_clues.similarity_checker': ['SimilarityChecker', 'similarity_ratios'],
+    'data_clues.occurrences_analyzer': ['CharacterOccurrencesAnalyzer'],
+    'data_clues.patterns_analyzer': ['PatternsAnalyzer'],
+    'data_clues.pipeline': ['Pipeline'],
+    'data_clues.lazy_frame': ['LazyFrame'],
+    'data_clues.partitioned_executor': ['PartitionedExecutor', 'ProcessPoolDispatcher'],
+    'data_clues.streaming_processor': ['StreamingProcessor'],
+    'data_clues.record_scorer': ['RecordScorer'],
+    'data_clues.analysis_service': ['AnalysisService'],
+}
+
+_NAMES_MODULES = {name: module_name for module_name,
+                  names in _MODULES_NAMES.items() for name in names}
+
+# The Dataframe accessors, registered at once but imported on first access
+_ACCESSORS = {
+    'dc_matching': ('data_clues.keywords_matcher', 'KeywordsMatcher'),
+    'dc_similarity': ('data_clues.similarity_checker', 'SimilarityChecker'),
+    'dc_occurrences': ('data_clues.occurrences_analyzer', 'CharacterOccurrencesAnalyzer'),
+    'dc_patterns': ('data_clues.patterns_analyzer', 'PatternsAnalyzer'),
+    'dc_lazy': ('data_clues.lazy_frame', 'LazyFrame'),
+}
+
+__all__ = list(_NAMES_MODULES)
+
+
+class _LazyAccessor:
+    ''' Stand in for an accessor class, importing its module only when the accessor is first used on a dataframe.
+
+    Attributes:
+        module_name: The name of the module defining the accessor class.
+        class_name: The name of the accessor class.
+    '''
+
+    def __init__(self, module_name, class_name):
+
+        self._module_name = module_name
+        self._class_name = class_name
+
+    def __call__(self, pandas_obj):
+
+        return getattr(importlib.import_module(self._module_name), self._class_name)(pandas_obj)
+
+
+for _accessor_name, (_module_name, _class_name) in _ACCESSORS.items():
+    pandas.api.extensions.register_dataframe_accessor(
+        _accessor_name)(_LazyAccessor(_module_name, _class_name))
+
+
+def __getattr__(name):
+
+    if name not in _NAMES_MODULES:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    _value = getattr(importlib.import_module(_NAMES_MODULES[name]), name)
+
+    # Cache the name, so that the module is looked up only once
+    globals()[name] = _value
+
+    return _value
+
+
+def __dir__():
+
+    return sorted(set(globals()) | set(_NAMES_MODULES))
@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
+
+__all__ = ['AnalysisService']
+
+import http.server
+import json
+import os
+import socketserver
+import stat
+import threading
+import time
+
+import pandas
+from data_clues.data_exporter import export_dataframe
+from data_clues.data_importer import COLUMNAR_FORMATS, DataImporter
+from data_clues.instrumentation import stage
+from data_clues.keywords_matcher import compile_reference_keywords, _fuzzy_value_matcher
+from data_clues.streaming_processor import StreamingProcessor
+
+
+def _is_socket(path):
+    ''' Establish if a path is a Unix socket, without following symbolic links.
+
+    Args:
+        path: The path to be checked.
+    Raises:
+        None
+    Returns:
+        True for a Unix socket, False otherwise, e.g. for a regular file or a missing path.
+    '''
+
+    try:
+        return stat.S_ISSOCK(os.lstat(path).st_mode)
+    except FileNotFoundError:
+        return False
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    ''' Serve HTTP over a Unix domain socket, handling each connection in a thread. '''
+
+    daemon_threads = True
+
+
+class _AnalysisRequestHandler(http.server.BaseHTTPRequestHandler):
+    ''' Translate the HTTP requests into jobs of the AnalysisService, and their results into JSON responses. '''
+
+    # Keep the connections of the clients open across requests
+    protocol_version = 'HTTP/1.1'
+
+    # Send the headers and the body of each response without waiting for the delayed acknowledgement of the client,
+    # which would add tens of milliseconds to each request on a reused connection
+    disable_nagle_algorithm = True
+
+    def setup(self):
+
+        # The Nagle algorithm only applies to TCP connections
+        if isinstance(self.server, socketserver.UnixStreamServer):
+            self.disable_nagle_algorithm = False
+
+        super().setup()
+
+    def do_GET(self):
+
+        if self.path != '/health':
+            return self._respond(404, {'error': f'Unknown path {self.path}.'})
+
+        self._respond(200, self.server.analysis_service.get_status())
+
+    def do_POST(self):
+
+        if self.path != '/analyze':
+            return self._respond(404, {'error': f'Unknown path {self.path}.'})
+
+        _start_time = time.perf_counter()
+
+        try:
+
+            _job = json.loads(self.rfile.read(
+                int(self.headers.get('Content-Length', 0))) or b'{}')
+
+            _response = self.server.analysis_service.run_job(_job)
+
+        except (AttributeError, KeyError, TypeError, ValueError, OSError) as error:
+
+            return self._respond(400, {'error': str(error)})
+
+        _response['milliseconds'] = (time.perf_counter() - _start_time) * 1000
+
+        self._respond(200, _response)
+
+    def _respond(self, status, response):
+
+        _body = json.dumps(response, default=str).encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(_body)))
+        self.end_headers()
+
+        self.wfile.write(_body)
+
+    def address_string(self):
+
+        # The clients of a Unix socket have no address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+
+        # The jobs are measured by the instrumentation instead
+        pass
+
+
+class AnalysisService:
+    ''' Keep a pipeline resident, with its reference keywords compiled, its results cache and its worker processes warm,
+    and run analysis jobs sent over a local HTTP port or Unix socket, without paying the start-up costs at each job.
+
+    The jobs are JSON objects posted to /analyze: either {"records": [...]}, a batch of records whose results are
+    returned along with them, or {"input_file": ..., "output_file": ...}, a CSV, Parquet, Feather or Arrow file processed
+    into another file, optionally in chunks with "chunk_size". GET /health returns the status of the service. The jobs
+    are run one at a time, as the results cache is shared by all of them.
+
+    Attributes:
+        pipeline: The Pipeline run by each job, e.g. with a ResultsCache and persistent_pool=True.
+        host: The host the HTTP server listens on. If not provided, 127.0.0.1 is used.
+        port: The port the HTTP server listens on. If not provided, 8765 is used. With 0, a free port is chosen.
+        unix_socket: If provided, the path of the Unix socket the HTTP server listens on, instead of the host and port.
+    '''
+
+    def __init__(self, pipeline, host=None, port=None, unix_socket=None):
+
+        self._pipeline = pipeline
+        self._host = host if host is not None else '127.0.0.1'
+        self._port = port if port is not None else 8765
+        self._unix_socket = unix_socket
+
+        self._jobs_lock = threading.Lock()
+        self._jobs_count = 0
+        self._start_time = time.time()
+
+        self._server = None
+
+        # The columns read by the pipeline, which every batch of records is given
+        self._input_columns_labels = list(dict.fromkeys(
+            label for input_columns in self._pipeline.plan() for label in input_columns))
+
+        self.warm_up()
+
+    def warm_up(self):
+        ''' Compile the reference keywords of the matching and fuzzy matching operations and import the modules of all the operations.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            None
+        '''
+
+        with stage('warm_up'):
+
+            for kind, parameters in self._pipeline.get_operations():
+
+                if kind == 'matching':
+                    compile_reference_keywords(parameters['reference_keywords_list'], parameters.get(
+                        'engine'), parameters.get('ignore_case', False))
+
+                elif kind == 'fuzzy_matching':
+                    _fuzzy_value_matcher(parameters['reference_keywords_list'], parameters.get(
+                        'max_distance'), parameters.get('ignore_case', False))
+
+            # Run the pipeline on no rows, so that the accessors of the operations are imported
+            self._pipeline.run(pandas.DataFrame(
+                {label: pandas.Series([], dtype=object) for label in self._input_columns_labels}))
+
+    def analyze_records(self, records):
+        ''' Run the pipeline on a batch of records.
+
+        Args:
+            records: A list of dictionaries with the values of each record, e.g. a signup with full_name, username,
+                email and website. The fields read by the pipeline and missing from a record are missing values.
+        Raises:
+            None
+        Returns:
+            A list of dictionaries with the values and the results of each record, the missing ones as None.
+        '''
+
+        with self._jobs_lock, stage('service_job', kind='records') as _stage:
+
+            _stage.record(rows=len(records))
+
+            self._jobs_count += 1
+
+            if not records:
+                return []
+
+            _target_df = pandas.DataFrame.from_records(records)
+
+            _target_df = _target_df.assign(**{label: pandas.Series(None, index=_target_df.index, dtype=object)
+                                              for label in self._input_columns_labels if label not in _target_df.columns})
+
+            _results_df = self._pipeline.run(_target_df)
+
+        return json.loads(_results_df.to_json(orient='records'))
+
+    def analyze_file(self, input_file, output_file, file_format=None, chunk_size=None):
+        ''' Run the pipeline on a file and write the results to another file.
+
+        Args:
+            input_file: The path of the CSV, Parquet, Feather or Arrow file to be processed.
+            output_file: The path of the output file, which is overwritten.
+            file_format: The format of the output file, i.e. csv, parquet, feather or arrow. If not provided, it is
+                inferred from the file extension.
+            chunk_size: If provided, the file is processed in chunks of chunk_size rows.
+        Raises:
+            AttributeError: If the input file does not exist.
+        Returns:
+            The number of rows written.
+        '''
+
+        if not os.path.isfile(input_file):
+
+            raise AttributeError(
+                f'Missing input file {input_file} (AnalysisService).')
+
+        _filepath, _filename = os.path.split(input_file)
+
+        if os.path.splitext(_filename)[1].lower() in COLUMNAR_FORMATS:
+            _data_importer = DataImporter(
+                filepath=_filepath, filename=_filename, chunk_size=chunk_size)
+        else:
+            _data_importer = DataImporter(
+                csv_filepath=_filepath, csv_filename=_filename, chunk_size=chunk_size)
+
+        with self._jobs_lock, stage('service_job', kind='file') as _stage:
+
+            self._jobs_count += 1
+
+            if chunk_size is not None:
+
+                _rows_count = StreamingProcessor(pipeline=self._pipeline).process_to_file(
+                    _data_importer.iter_chunks(), output_file, file_format)
+
+            else:
+
+                _results_df = self._pipeline.run(_data_importer.get_dataframe())
+
+                export_dataframe(_results_df, output_file, file_format)
+
+                _rows_count = len(_results_df)
+
+            _stage.record(rows=_rows_count)
+
+        return _rows_count
+
+    def run_job(self, job):
+        ''' Run an analysis job, as sent to the /analyze endpoint.
+
+        Args:
+            job: A dictionary with either the records, or the input_file, the output_file and optionally the
+                file_format and the chunk_size.
+        Raises:
+            AttributeError: If the job has neither records nor input and output files.
+        Returns:
+            A dictionary with the records and their results, or the output file and the number of rows written.
+        '''
+
+        if 'records' in job:
+            return {'records': self.analyze_records(job['records'])}
+
+        if 'input_file' in job and 'output_file' in job:
+
+            _rows_count = self.analyze_file(job['input_file'], job['output_file'], job.get(
+                'file_format'), job.get('chunk_size'))
+
+            return {'output_file': job['output_file'], 'rows': _rows_count}
+
+        raise AttributeError(
+            'Missing records or input_file and output_file in the job (AnalysisService).')
+
+    def get_status(self):
+        ''' Return the status of the service.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            A dictionary with the number of operations of the pipeline, the number of jobs run, the uptime in seconds
+            and the hit rate of the results cache, if any.
+        '''
+
+        _results_cache = self._pipeline.get_results_cache()
+
+        return {'status': 'ok', 'operations': len(self._pipeline.get_operations()), 'jobs': self._jobs_count,
+                'uptime_seconds': time.time() - self._start_time,
+                'cache_hit_rate': _results_cache.hit_rate() if _results_cache is not None else None}
+
+    def start(self):
+        ''' Start listening for jobs in a background thread.
+
+        Args:
+            None
+        Raises:
+            AttributeError: If the path of the Unix socket is taken by a file which is not a socket.
+        Returns:
+            The address the service listens on, i.e. a tuple with the host and the port, or the path of the Unix socket.
+        '''
+
+        if self._unix_socket is not None:
+
+            if os.path.lexists(self._unix_socket):
+
+                if not _is_socket(self._unix_socket):
+
+                    raise AttributeError(
+                        f'The path {self._unix_socket} is not a Unix socket and cannot be replaced (AnalysisService).')
+
+                # A socket left by a previous run would prevent binding
+                os.remove(self._unix_socket)
+
+            self._server = _UnixHTTPServer(
+                self._unix_socket, _AnalysisRequestHandler)
+
+        else:
+
+            self._server = http.server.ThreadingHTTPServer(
+                (self._host, self._port), _AnalysisRequestHandler)
+
+        self._server.analysis_service = self
+
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+        return self._server.server_address
+
+    def serve_forever(self):
+        ''' Listen for jobs until the process is interrupted, then stop the service.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            None
+        '''
+
+        if self._server is None:
+            self.start()
+
+        try:
+
+            threading.Event().wait()
+
+        except KeyboardInterrupt:
+
+            pass
+
+        finally:
+
+            self.stop()
+
+    def stop(self):
+        ''' Stop listening for jobs and stop the worker processes of the pipeline.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            None
+        '''
+
+        if self._server is not None:
+
+            self._server.shutdown()
+            self._server.server_close()
+
+            if self._unix_socket is not None and _is_socket(self._unix_socket):
+                os.remove(self._unix_socket)
+
+            self._server = None
+
+        self._pipeline.close()
@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
+
+__all__ = ['export_dataframe', 'ChunksWriter']
+
+from pathlib import Path
+
+from data_clues.data_importer import COLUMNAR_FORMATS
+
+# The result of the values which are not strings, e.g. of the matching operations
+_MISSING_MARKER = '-'
+
+# The key of the schema metadata listing the boolean columns whose nulls stand for the missing marker
+_MISSING_MARKER_METADATA = b'data_clues.missing_marker'
+
+
+def _output_format(output_file, file_format=None):
+    ''' Establish the format of the output file.
+
+    Args:
+        output_file: The path of the output file.
+        file_format: The format of the file, i.e. csv, parquet, feather or arrow. If not provided, it is inferred from the file extension.
+    Raises:
+        AttributeError: If the format is unknown.
+    Returns:
+        The name of the format.
+    '''
+
+    _suffix = Path(output_file).suffix.lower()
+
+    _file_format = file_format if file_format is not None else (
+        'csv' if _suffix == '.csv' else COLUMNAR_FORMATS.get(_suffix))
+
+    if _file_format not in ('csv', *COLUMNAR_FORMATS.values()):
+
+        raise AttributeError(
+            'Unknown file format for function export_dataframe, please specify csv, parquet, feather or arrow.')
+
+    return _file_format
+
+
+def _arrow_compatible(target_chunk):
+    ''' Convert the object columns of a chunk which Arrow cannot infer into columns of a single type.
+
+    The results of the matching operations mix True and False with the missing marker: they are converted into nullable
+    booleans, the marker becoming null, even when attached as Categoricals. The other columns mixing types are
+    converted into strings.
+
+    Args:
+        target_chunk: The Pandas Dataframe to be written.
+    Raises:
+        None
+    Returns:
+        The Pandas Dataframe with the converted columns.
+    '''
+
+    import numpy
+    import pandas
+
+    _converted_columns = {}
+
+    for label, column in target_chunk.items():
+
+        _categorical = isinstance(column.dtype, pandas.CategoricalDtype)
+
+        # The values of the Categoricals are established from their categories
+        _values = column.cat.categories if _categorical else column
+
+        # The results of a chunk whose values are all missing are inferred as strings
+        if _values.dtype != object and not (len(_values) and (_values == _MISSING_MARKER).all()):
+            continue
+
+        _values = _values[_values.notna()]
+
+        _marked = _values == _MISSING_MARKER
+
+        if len(_values):
+
+            if all(isinstance(value, (bool, numpy.bool_)) for value in _values[~_marked]):
+
+                _column = column.astype(object)
+
+                _converted_columns[label] = _column.where(
+                    _column.notna() & (_column != _MISSING_MARKER), None).astype('boolean')
+
+            elif len({type(value) for value in _values}) > 1:
+
+                _converted_columns[label] = column.cat.rename_categories(str) if _categorical else column.map(
+                    lambda value: None if value is None or value is pandas.NA or value != value else str(value)).astype(object)
+
+    return target_chunk.assign(**_converted_columns) if _converted_columns else target_chunk
+
+
+def _columnar_schema(table):
+    ''' Establish the schema of a columnar file from the table of its first chunk.
+
+    The columns without any value in the first chunk, even as Categoricals or as floats (e.g. the columns of a CSV chunk
+    whose values are all missing), are typed as strings, e.g. the matching keywords, so that the following chunks can
+    bring values (see _schema_compatible). The boolean columns are listed in the metadata, so that their nulls can be read
+    back as the missing marker (see _restore_missing_markers).
+
+    Args:
+        table: The Arrow table of the first chunk.
+    Raises:
+        None
+    Returns:
+        The Arrow schema.
+    '''
+
+    import json
+
+    import pyarrow
+
+    _schema = table.schema
+
+    for position, field in enumerate(_schema):
+
+        if pyarrow.types.is_null(field.type) or (pyarrow.types.is_floating(field.type) and
+                                                 table.column(position).null_count == table.num_rows):
+            _schema = _schema.set(position, field.with_type(pyarrow.large_string()))
+
+        elif pyarrow.types.is_dictionary(field.type) and pyarrow.types.is_null(field.type.value_type):
+            _schema = _schema.set(position, field.with_type(pyarrow.dictionary(
+                field.type.index_type, pyarrow.large_string())))
+
+    _boolean_labels = [field.name for field in _schema if pyarrow.types.is_boolean(field.type)]
+
+    return _schema.with_metadata({**(_schema.metadata or {}), _MISSING_MARKER_METADATA: json.dumps(_boolean_labels)})
+
+
+def _schema_compatible(target_chunk, schema):
+    ''' Convert the values of the columns typed as strings by the schema of a columnar file into strings.
+
+    A column without any value in the first chunk is typed as strings (see _columnar_schema), while the following chunks
+    may bring numbers or booleans in it, e.g. the values of a CSV column inferred from each chunk.
+
+    Args:
+        target_chunk: The Pandas Dataframe to be written, see _arrow_compatible.
+        schema: The Arrow schema of the file.
+    Raises:
+        None
+    Returns:
+        The Pandas Dataframe with the converted columns.
+    '''
+
+    import pandas
+    import pyarrow
+
+    _converted_columns = {}
+
+    for field in schema:
+
+        if field.name not in target_chunk.columns or not (pyarrow.types.is_string(field.type) or pyarrow.types.is_large_string(field.type)):
+            continue
+
+        _column = target_chunk[field.name]
+
+        if pandas.api.types.is_numeric_dtype(_column.dtype) or pandas.api.types.is_bool_dtype(_column.dtype):
+
+            _converted_columns[field.name] = _column.astype(object).where(
+                _column.notna(), None).map(lambda value: None if value is None else str(value)).astype(object)
+
+    return target_chunk.assign(**_converted_columns) if _converted_columns else target_chunk
+
+
+def _restore_missing_markers(target_dataframe, schema):
+    ''' Restore the missing markers of a dataframe read from a columnar file written by a ChunksWriter.
+
+    Args:
+        target_dataframe: The Pandas Dataframe read from the file.
+        schema: The Arrow schema of the file.
+    Raises:
+        None
+    Returns:
+        The Pandas Dataframe, with the missing marker in place of the nulls of the boolean columns.
+    '''
+
+    import json
+
+    _target_dataframe = target_dataframe
+
+    _marked_labels = json.loads((schema.metadata or {}).get(
+        _MISSING_MARKER_METADATA, b'[]'))
+
+    _restored_columns = {label: _target_dataframe[label].astype(object).where(_target_dataframe[label].notna(), _MISSING_MARKER)
+                         for label in _marked_labels if label in _target_dataframe and _target_dataframe[label].hasnans}
+
+    return _target_dataframe.assign(**_restored_columns) if _restored_columns else _target_dataframe
+
+
+def export_dataframe(target_dataframe, output_file, file_format=None, append=False):
+    ''' Write the processed dataframe in a CSV, Parquet, Feather or Arrow IPC file.
+
+    Args:
+        target_dataframe: The Pandas Dataframe to be written.
+        output_file: The path of the output file.
+        file_format: The format of the file, i.e. csv, parquet, feather or arrow. If not provided, it is inferred from the file extension.
+        append: If True, the rows are appended to the existing CSV file, e.g. the results of the rows imported incrementally.
+    Raises:
+        AttributeError: If the format is unknown, or if rows are appended to a columnar file.
+    Returns:
+        None
+    '''
+
+    with ChunksWriter(output_file, file_format, append) as _writer:
+        _writer.write(target_dataframe)
+
+
+class ChunksWriter:
+    ''' Write a stream of dataframes in a single CSV, Parquet, Feather or Arrow IPC file, one chunk at a time.
+
+    The schema of the columnar files is the one of the first chunk, to which the following chunks are converted. In the
+    columnar files, the results of the matching operations are written as nullable booleans, the missing marker ('-')
+    being null, and the columns without values in the first chunk as strings, whatever the values of the following chunks. To be used as a context manager, which
+    closes the file.
+
+    Attributes:
+        output_file: The path of the output file, which is overwritten.
+        file_format: The format of the file, i.e. csv, parquet, feather or arrow. If not provided, it is inferred from the file extension.
+        append: If True, the rows are appended to the existing CSV file instead of overwriting it. Not available for columnar files.
+    '''
+
+    def __init__(self, output_file, file_format=None, append=False):
+
+        import os
+
+        self._output_file = output_file
+        self._file_format = _output_format(output_file, file_format)
+
+        if append and self._file_format != 'csv':
+
+            raise AttributeError(
+                'Rows can only be appended to CSV files (ChunksWriter).')
+
+        self._append = append
+
+        # The header is written with the first chunk, even if empty, unless it is already in the file the rows are appended to
+        self._header = not (append and os.path.exists(
+            output_file) and os.path.getsize(output_file) > 0)
+
+        self._writer = None
+        self._schema = None
+        self._rows_count = 0
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *exception_details):
+
+        self.close()
+
+    def write(self, target_chunk):
+        ''' Append a chunk of data to the output file.
+
+        Args:
+            target_chunk: The Pandas Dataframe to be written.
+        Raises:
+            None
+        Returns:
+            None
+        '''
+
+        if self._file_format == 'csv':
+
+            if self._writer is None:
+                self._writer = open(self._output_file,
+                                    'a' if self._append else 'w', newline='')
+
+            target_chunk.to_csv(self._writer, index=None, header=self._header)
+
+            self._header = False
+
+            self._writer.flush()
+
+        else:
+
+            import pyarrow
+
+            _target_chunk = _arrow_compatible(target_chunk)
+
+            if self._writer is None:
+
+                self._schema = _columnar_schema(pyarrow.Table.from_pandas(
+                    _target_chunk, preserve_index=False))
+                self._writer = self._columnar_writer()
+
+            _table = pyarrow.Table.from_pandas(_schema_compatible(
+                _target_chunk, self._schema), schema=self._schema, preserve_index=False)
+
+            self._writer.write_table(_table)
+
+        self._rows_count += len(target_chunk)
+
+    def _columnar_writer(self):
+        ''' Open the writer of the columnar file, with the schema of the first chunk.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            The Parquet writer or the Arrow IPC file writer.
+        '''
+
+        import pyarrow
+        import pyarrow.parquet
+
+        if self._file_format == 'parquet':
+            return pyarrow.parquet.ParquetWriter(self._output_file, self._schema)
+
+        # Feather (version 2) files are Arrow IPC files
+        return pyarrow.ipc.new_file(self._output_file, self._schema)
+
+    def close(self):
+        ''' Close the output file.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            The number of rows written.
+        '''
+
+        if self._writer is not None:
+
+            self._writer.close()
+            self._writer = None
+
+        return self._rows_count
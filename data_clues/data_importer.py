@@ -1,10 +1,88 @@
 # -*- coding: utf-8 -*-
 # Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
 
-__all__ = ['DataImporter']
+__all__ = ['DataImporter', 'pooled_engine', 'COLUMNAR_FORMATS']
+
+import io
 
 import pandas
-import sqlalchemy
+
+from data_clues.instrumentation import stage
+
+# The columnar file formats, by file extension
+COLUMNAR_FORMATS = {'.parquet': 'parquet', '.pq': 'parquet',
+                    '.feather': 'feather', '.arrow': 'arrow', '.ipc': 'arrow'}
+
+# The engines created so far, keyed by database URL, so that their connection pools are reused across importers
+_ENGINES = {}
+
+
+def pooled_engine(database_url):
+    ''' Return the engine of a database, creating it only the first time the database is accessed.
+
+    Args:
+        database_url: The SQLAlchemy URL of the database.
+    Raises:
+        None
+    Returns:
+        The SQLAlchemy engine, shared by all the importers reading from the same database.
+    '''
+
+    # SQLAlchemy is only imported by the database sources
+    import sqlalchemy
+
+    _engine_key = database_url.render_as_string(hide_password=False) if isinstance(
+        database_url, sqlalchemy.engine.URL) else str(database_url)
+
+    _engine = _ENGINES.get(_engine_key)
+
+    if _engine is None:
+
+        # Check the pooled connections before using them, as they might have been closed by the server
+        _engine = _ENGINES[_engine_key] = sqlalchemy.create_engine(
+            database_url, pool_pre_ping=True)
+
+    return _engine
+
+
+class _FileSlice(io.RawIOBase):
+    ''' Expose a range of bytes of a file as a readable stream, e.g. the rows appended to a CSV file since the last run.
+
+    Attributes:
+        file_path: The path of the file.
+        start: The offset of the first byte of the range.
+        end: The offset following the last byte of the range.
+    '''
+
+    def __init__(self, file_path, start, end):
+
+        self._file = open(file_path, 'rb')
+        self._file.seek(start)
+
+        self._remaining_size = end - start
+
+    def readable(self):
+
+        return True
+
+    def readinto(self, buffer):
+
+        _size = min(len(buffer), self._remaining_size)
+
+        if _size <= 0:
+            return 0
+
+        _read_size = self._file.readinto(memoryview(buffer)[:_size])
+
+        self._remaining_size -= _read_size
+
+        return _read_size
+
+    def close(self):
+
+        self._file.close()
+
+        super().close()
 
 
 class DataImporter:
@@ -13,26 +91,63 @@ class DataImporter:
     Attributes:
         csv_filepath: The path to the CSV file containing the targeted dataset. To be specified along with csv_filename. 
         csv_filename: The name of the CSV file containing the targeted dataset. To be specified along with csv_filepath. 
+        filepath: The path to the Parquet, Feather or Arrow IPC file containing the targeted dataset. To be specified along with filename.
+        filename: The name of the Parquet, Feather or Arrow IPC file containing the targeted dataset. To be specified along with filepath.
+        file_format: The format of the file, i.e. parquet, feather or arrow. If not provided, it is inferred from the file extension.
         db_type: The type of the database, see https://docs.sqlalchemy.org/en/13/core/engines.html for more details. 
-        db_host: The hostname of the database.
-        db_port: The port of the database. 
-        db_name: The name of the database.
+        db_host: The hostname of the database. Not required by SQLite.
+        db_port: The port of the database. Not required by SQLite.
+        db_name: The name of the database, or the path of the database file for SQLite.
         table_name: The name of the table from which data have to be taken. 
-        username: The username to access the database. 
-        password: The password to access the database. 
+        username: The username to access the database. Not required by SQLite.
+        password: The password to access the database. Not required by SQLite.
+        chunk_size: If provided, the data are not loaded at once, but streamed in dataframes of chunk_size rows (see iter_chunks).
+            Database rows are streamed with a server-side cursor.
+        columns: If provided, the list of the only columns to be imported, e.g. the ones needed by the analyses.
+        where: If provided, an SQL condition filtering the rows of the database table (e.g. "created_at >= '2021-01-01'").
+        watermark_column: The monotonic key column of the database table (e.g. an autoincrement id), used to import only the rows
+            added after the watermark. CSV files use the byte offset of the rows instead.
+        watermark: The watermark reached by the previous run, i.e. the last key imported or the CSV byte offset.
+            If not provided, it is read from the watermark_file.
+        watermark_file: The JSON file where the watermark is kept across runs, see save_watermark. If neither a watermark nor a
+            watermark_file are provided, the rows are not imported incrementally.
+        categorical_columns: If provided, the list of the columns kept as Pandas Categoricals (e.g. email, website), whose
+            values are stored once, along with an integer code for each row. Dictionary-encoded Parquet columns are
+            read without decoding their values.
     '''
 
-    def __init__(self, csv_filepath=None, csv_filename=None, db_type=None, db_host=None, db_port=None, db_name=None, table_name=None, username=None, password=None):  # sql_query=None
+    def __init__(self, csv_filepath=None, csv_filename=None, db_type=None, db_host=None, db_port=None, db_name=None, table_name=None, username=None, password=None, chunk_size=None, columns=None, where=None, filepath=None, filename=None, file_format=None, watermark_column=None, watermark=None, watermark_file=None, categorical_columns=None):  # sql_query=None
 
         # Initialise the dataframe variable
         self._target_df = None
+        self._chunk_size = chunk_size
+
+        # The details necessary to read the source again, e.g. chunk by chunk
+        self._engine = None
+        self._table_name = None
+        self._full_path = None
+        self._file_format = None
+        self._columns = list(columns) if columns is not None else None
+        self._where = where
+        self._categorical_columns = list(
+            categorical_columns) if categorical_columns is not None else None
+
+        # The position of the last row imported by the previous run and by the current one
+        self._watermark_column = watermark_column
+        self._watermark_file = watermark_file
+        self._watermark = watermark if watermark is not None else self._load_watermark()
+        self._next_watermark = self._watermark
+        self._incremental = watermark_column is not None or watermark is not None or watermark_file is not None
 
         import os
 
         if not os.path.exists('data'):
             os.mkdir('data')
 
-        if all(element is not None for element in [db_host, db_port, db_name, table_name, username, password]):
+        # SQLite databases are local files, which do not need a host nor credentials
+        _is_sqlite = db_type is not None and db_type.startswith('sqlite')
+
+        if all(element is not None for element in [db_name, table_name]) and (_is_sqlite or all(element is not None for element in [db_host, db_port, username, password])):
             # Populated the dataframe from the data selected from the database
 
             # PostgreSQL is the default database engine. Always use the SqlAlchemy naming.
@@ -41,39 +156,500 @@ class DataImporter:
 
             # Query the database to get the data to be processed and return a dataframe with these data
 
-            _engine = sqlalchemy.create_engine(
-                db_type + '://' + username + ':' + password +
-                '@' + db_host + ':' + db_port + '/' + db_name
-            )
+            import sqlalchemy
+
+            # Build the URL escaping the credentials, and reuse the engine (and its pool) of the same database
+            self._engine = pooled_engine(sqlalchemy.engine.URL.create(
+                db_type, username=username, password=password, host=db_host,
+                port=int(db_port) if db_port is not None else None, database=db_name
+            ))
+
+            self._table_name = table_name
+
+            # The watermark column has to be imported to advance the watermark
+            if watermark_column is not None and self._columns is not None and watermark_column not in self._columns:
+                self._columns.append(watermark_column)
+
+            if chunk_size is None:
+                self._target_df = self._read_source()
+
+        elif all(element is not None for element in [filepath, filename]):
+            # Populated the dataframe from the data of the columnar file, which is memory-mapped
+
+            from pathlib import Path
+
+            self._full_path = Path(filepath) / filename
 
-            self._target_df = pandas.read_sql_table(table_name, _engine)
+            if self._incremental:
 
-        elif all(element is not None for element in [csv_filepath, csv_filepath]):
+                raise AttributeError(
+                    'Incremental import is only available for CSV files and databases (DataImporter).')
+            self._file_format = file_format if file_format is not None else COLUMNAR_FORMATS.get(
+                self._full_path.suffix.lower())
+
+            if self._file_format not in COLUMNAR_FORMATS.values():
+
+                raise AttributeError(
+                    'Unknown file format for class DataImporter, please specify parquet, feather or arrow.')
+
+            if chunk_size is None:
+                self._target_df = self._read_source()
+
+        elif all(element is not None for element in [csv_filepath, csv_filename]):
             # Populated the dataframe from the data selected from the csv file
 
             # Build the path to open the CSV file
             from pathlib import Path
 
-            _full_path = Path(csv_filepath) / csv_filename
+            self._full_path = Path(csv_filepath) / csv_filename
 
-            try:
+            if chunk_size is None:
 
-                with open(_full_path) as _csv_file:
+                try:
 
-                    self._target_df = pandas.read_csv(_csv_file)
+                    self._target_df = self._read_source()
 
-            except IOError as error:
+                except IOError as error:
 
-                print(
-                    "I/O error({0}): {1}".format(error.errno, error.strerror))
+                    print(
+                        "I/O error({0}): {1}".format(error.errno, error.strerror))
 
         else:
 
             raise AttributeError(
                 'Missing class attributes for KeywordsMatcher.')
 
+    def _read_source(self, chunk_size=None):
+        ''' Read the data from the source.
+
+        Args: 
+            chunk_size: If provided, the number of rows of each chunk of data.
+        Raises: 
+            IOError: If the CSV file cannot be read.
+        Returns:
+            The dataframe with all the data or, if chunk_size is provided, an iterator of dataframes.  
+        '''
+
+        if chunk_size is not None:
+            return self._open_source(chunk_size)
+
+        with stage('import', source=self._source_name()) as _stage:
+
+            _target_df = self._open_source()
+
+            _stage.record(rows=len(_target_df))
+
+        return _target_df
+
+    def _source_name(self):
+        ''' Name the source of the data, e.g. to label the metrics of the import.
+
+        Args: 
+            None
+        Raises: 
+            None
+        Returns:
+            The name of the database table or the path of the file.  
+        '''
+
+        return str(self._table_name if self._table_name is not None else self._full_path)
+
+    def _open_source(self, chunk_size=None):
+        ''' Read the data from the source, or open it to be read chunk by chunk.
+
+        Args: 
+            chunk_size: If provided, the number of rows of each chunk of data.
+        Raises: 
+            IOError: If the CSV file cannot be read.
+        Returns:
+            The dataframe with all the data or, if chunk_size is provided, an iterator of dataframes.  
+        '''
+
+        if self._engine is not None:
+
+            if chunk_size is not None:
+                return self._read_database_chunks(chunk_size)
+
+            with self._engine.connect() as _connection:
+                return self._advance_watermark(self._encode_categorical(pandas.read_sql_query(self._database_query(), _connection)))
+
+        elif self._file_format is not None:
+
+            if chunk_size is not None:
+                return self._read_columnar_chunks(chunk_size)
+
+            from data_clues.data_exporter import _restore_missing_markers
+
+            _table = self._columnar_table()
+
+            # The schema is taken before the table is released by the conversion
+            _schema = _table.schema
+
+            # The results written by a ChunksWriter are read back with their missing markers
+            return _restore_missing_markers(_table.to_pandas(categories=self._categorical_columns, split_blocks=True, self_destruct=True), _schema)
+
+        elif self._incremental:
+
+            return self._read_csv_increment(chunk_size)
+
+        else:
+
+            return pandas.read_csv(self._full_path, usecols=self._columns, dtype=self._categorical_dtypes(), chunksize=chunk_size)
+
+    def _categorical_dtypes(self):
+        ''' Map the categorical columns to the category data type, so that they are parsed as such.
+
+        Args: 
+            None
+        Raises: 
+            None
+        Returns:
+            A dictionary with the label of each categorical column and its data type, None without categorical columns.  
+        '''
+
+        if self._categorical_columns is None:
+            return None
+
+        return {label: 'category' for label in self._categorical_columns}
+
+    def _encode_categorical(self, target_df):
+        ''' Convert the categorical columns of a dataframe read without their data types, e.g. from a database.
+
+        Args: 
+            target_df: The dataframe just read.
+        Raises: 
+            None
+        Returns:
+            The dataframe with the categorical columns converted.  
+        '''
+
+        if self._categorical_columns is None:
+            return target_df
+
+        return target_df.astype({label: 'category' for label in self._categorical_columns if label in target_df.columns})
+
+    def _read_csv_increment(self, chunk_size=None):
+        ''' Read only the rows appended to the CSV file after the watermark, i.e. the byte offset reached by the previous run.
+
+        Args: 
+            chunk_size: If provided, the number of rows of each chunk of data.
+        Raises: 
+            IOError: If the CSV file cannot be read.
+        Returns:
+            The dataframe with the new rows or, if chunk_size is provided, a generator of dataframes.  
+        '''
+
+        import os
+
+        with open(self._full_path, 'rb') as _csv_file:
+            _header_line = _csv_file.readline()
+            _start = self._watermark if self._watermark is not None else _csv_file.tell()
+
+        # Skip the last line if it is still being written, i.e. if it does not end with a newline
+        _end = _start + self._complete_lines_size(
+            _start, os.path.getsize(self._full_path))
+
+        _columns_labels = pandas.read_csv(
+            io.BytesIO(_header_line), nrows=0).columns.tolist()
+
+        if _end == _start:
+
+            # No row has been appended since the previous run
+            _new_rows = pandas.DataFrame(columns=[
+                label for label in _columns_labels if self._columns is None or label in self._columns])
+
+            _new_rows = self._encode_categorical(_new_rows)
+
+            return _new_rows if chunk_size is None else (new_rows for new_rows in [_new_rows])
+
+        _new_rows = pandas.read_csv(io.BufferedReader(_FileSlice(self._full_path, _start, _end)), header=None,
+                                    names=_columns_labels, usecols=self._columns, dtype=self._categorical_dtypes(), chunksize=chunk_size)
+
+        if chunk_size is None:
+
+            self._next_watermark = _end
+
+            return _new_rows
+
+        return self._csv_increment_chunks(_new_rows, _end)
+
+    def _csv_increment_chunks(self, new_rows_chunks, end):
+        ''' Stream the rows appended to the CSV file, advancing the watermark once all of them have been read.
+
+        Args: 
+            new_rows_chunks: The reader of the new rows.
+            end: The byte offset following the last new row.
+        Raises: 
+            None
+        Returns:
+            A generator of dataframes.  
+        '''
+
+        with new_rows_chunks:
+            yield from new_rows_chunks
+
+        self._next_watermark = end
+
+    def _complete_lines_size(self, start, end):
+        ''' Measure the bytes of the complete lines of the CSV file between two offsets.
+
+        Args: 
+            start: The offset of the first byte.
+            end: The size of the file.
+        Raises: 
+            None
+        Returns:
+            The number of bytes up to the last newline.  
+        '''
+
+        with open(self._full_path, 'rb') as _csv_file:
+
+            # Scan the file backwards, one block at a time
+            _block_end = end
+
+            while _block_end > start:
+
+                _block_start = max(start, _block_end - 65536)
+
+                _csv_file.seek(_block_start)
+
+                _last_newline = _csv_file.read(
+                    _block_end - _block_start).rfind(b'\n')
+
+                if _last_newline >= 0:
+                    return _block_start + _last_newline + 1 - start
+
+                _block_end = _block_start
+
+        return 0
+
+    def _columnar_table(self):
+        ''' Read the required columns of the Parquet, Feather or Arrow IPC file, memory-mapping it.
+
+        Args: 
+            None
+        Raises: 
+            None
+        Returns:
+            The Arrow table. Its columns point to the mapped file wherever no decoding is needed.  
+        '''
+
+        import pyarrow.feather
+        import pyarrow.parquet
+
+        if self._file_format == 'parquet':
+            return pyarrow.parquet.read_table(self._full_path, columns=self._columns, memory_map=True, read_dictionary=self._categorical_columns)
+
+        # Feather (version 2) files are Arrow IPC files
+        return pyarrow.feather.read_table(self._full_path, columns=self._columns, memory_map=True)
+
+    def _read_columnar_chunks(self, chunk_size):
+        ''' Stream the rows of the Parquet, Feather or Arrow IPC file.
+
+        Args: 
+            chunk_size: The number of rows of each chunk of data.
+        Raises: 
+            None
+        Returns:
+            A generator of dataframes.  
+        '''
+
+        import pyarrow.parquet
+
+        from data_clues.data_exporter import _restore_missing_markers
+
+        if self._file_format == 'parquet':
+
+            # Only the row groups of the current chunk are decoded
+            with pyarrow.parquet.ParquetFile(self._full_path, memory_map=True, read_dictionary=self._categorical_columns) as _parquet_file:
+
+                for record_batch in _parquet_file.iter_batches(batch_size=chunk_size, columns=self._columns):
+                    yield _restore_missing_markers(record_batch.to_pandas(categories=self._categorical_columns), _parquet_file.schema_arrow)
+
+        else:
+
+            _table = self._columnar_table()
+
+            # The mapped table is not copied in memory, only the chunks converted to dataframes are
+            for record_batch in _table.to_batches(max_chunksize=chunk_size):
+                yield _restore_missing_markers(record_batch.to_pandas(categories=self._categorical_columns), _table.schema)
+
+    def _database_query(self):
+        ''' Build the query selecting only the required columns and rows of the database table.
+
+        Args: 
+            None
+        Raises: 
+            None
+        Returns:
+            The SQLAlchemy select statement.  
+        '''
+
+        import sqlalchemy
+
+        if self._columns is not None:
+            _query = sqlalchemy.select(*[sqlalchemy.column(label) for label in self._columns]).select_from(
+                sqlalchemy.table(self._table_name))
+        else:
+            _query = sqlalchemy.select(sqlalchemy.text('*')).select_from(
+                sqlalchemy.table(self._table_name))
+
+        if self._where is not None:
+            _query = _query.where(sqlalchemy.text(self._where))
+
+        if self._watermark_column is not None:
+
+            # Read the rows in the order of the key, so that the watermark is valid even if the reading stops
+            _query = _query.order_by(sqlalchemy.column(self._watermark_column))
+
+            if self._watermark is not None:
+                _query = _query.where(sqlalchemy.column(
+                    self._watermark_column) > sqlalchemy.bindparam('watermark', self._watermark))
+
+        return _query
+
+    def _advance_watermark(self, new_rows):
+        ''' Move the watermark to the last key of the rows read from the database table.
+
+        Args: 
+            new_rows: The dataframe of the rows just read.
+        Raises: 
+            None
+        Returns:
+            The same dataframe.  
+        '''
+
+        if self._watermark_column is not None and len(new_rows):
+
+            _last_key = new_rows[self._watermark_column].max()
+
+            # Store the key as a Python object, so that it can be written in the watermark file
+            self._next_watermark = _last_key.item() if hasattr(_last_key, 'item') else _last_key
+
+        return new_rows
+
+    def _load_watermark(self):
+        ''' Read the watermark reached by the previous run from the watermark file.
+
+        Args: 
+            None
+        Raises: 
+            None
+        Returns:
+            The watermark, or None if there is no watermark file yet.  
+        '''
+
+        import json
+        import os
+
+        if self._watermark_file is None or not os.path.exists(self._watermark_file):
+            return None
+
+        with open(self._watermark_file) as _watermark_file:
+            return json.load(_watermark_file)['watermark']
+
+    def get_watermark(self):
+        ''' Return the watermark reached by the rows imported so far.
+
+        Args: 
+            None
+        Raises: 
+            None
+        Returns:
+            The last key imported from the database table or the byte offset reached in the CSV file.  
+        '''
+
+        return self._next_watermark
+
+    def save_watermark(self):
+        ''' Write the watermark reached by the rows imported so far in the watermark file, once they have been processed.
+        The next run will import only the rows added afterwards.
+
+        Args: 
+            None
+        Raises: 
+            AttributeError: If no watermark file has been provided.
+        Returns:
+            None  
+        '''
+
+        import json
+
+        if self._watermark_file is None:
+
+            raise AttributeError(
+                'Missing watermark_file for method save_watermark (DataImporter).')
+
+        with open(self._watermark_file, 'w') as _watermark_file:
+            json.dump({'watermark': self._next_watermark},
+                      _watermark_file, default=str)
+
+    def _read_database_chunks(self, chunk_size):
+        ''' Stream the rows of the database table through a server-side cursor.
+
+        Args: 
+            chunk_size: The number of rows of each chunk of data.
+        Raises: 
+            None
+        Returns:
+            A generator of dataframes. The connection is returned to the pool once the generator is exhausted or closed.  
+        '''
+
+        with self._engine.connect().execution_options(stream_results=True, max_row_buffer=chunk_size) as _connection:
+            for new_rows in pandas.read_sql_query(self._database_query(), _connection, chunksize=chunk_size):
+                yield self._advance_watermark(self._encode_categorical(new_rows))
+
+    def iter_chunks(self, chunk_size=None):
+        ''' Stream the data in dataframes of a bounded number of rows, without loading all of them in memory.
+
+        Args: 
+            chunk_size: The number of rows of each chunk. If not provided, the chunk_size of the importer is used.
+        Raises: 
+            AttributeError: If no chunk size is provided.
+        Returns:
+            A generator of dataframes, with consecutive rows of the source.  
+        '''
+
+        _chunk_size = chunk_size if chunk_size is not None else self._chunk_size
+
+        if _chunk_size is None:
+
+            raise AttributeError(
+                'Missing chunk size for method iter_chunks (DataImporter).')
+
+        if self._target_df is not None:
+
+            # The data are already in memory
+            for chunk_start in range(0, len(self._target_df), _chunk_size):
+                yield self._target_df.iloc[chunk_start:chunk_start + _chunk_size]
+
+        else:
+
+            _chunks = self._read_source(_chunk_size)
+
+            try:
+
+                while True:
+
+                    with stage('import_chunk', source=self._source_name()) as _stage:
+
+                        _chunk = next(_chunks, None)
+
+                        if _chunk is not None:
+                            _stage.record(rows=len(_chunk))
+
+                    if _chunk is None:
+                        break
+
+                    yield _chunk
+
+            finally:
+
+                # Release the file or the database cursor, even if the chunks are not consumed entirely
+                _chunks.close()
+
     def get_dataframe(self):
-        ''' Return the retrieved dataframe.
+        ''' Return the retrieved dataframe. In streaming mode (i.e. with a chunk_size), the data are loaded on the first call.
 
         Args: 
             None
@@ -83,4 +659,7 @@ class DataImporter:
             The dataframe to be processed.  
         '''
 
+        if self._target_df is None and (self._engine is not None or self._full_path is not None) and self._chunk_size is not None:
+            self._target_df = self._read_source()
+
         return self._target_df
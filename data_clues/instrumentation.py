@@ -0,0 +1,449 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
+
+__all__ = ['add_hook', 'remove_hook', 'stage', 'record', 'MetricsCollector']
+
+import json
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where the peak RSS is not measured
+    resource = None
+
+# The callbacks receiving the metrics of each stage. Without any hook, the instrumentation is disabled
+_HOOKS = []
+
+# The stages being measured by each thread, the innermost being the last one
+_THREAD_STATE = threading.local()
+
+
+def _stages_stack():
+    ''' Return the stack of the stages being measured by the current thread, so concurrent stages do not nest.
+
+    Args:
+        None
+    Raises:
+        None
+    Returns:
+        A list of stages.
+    '''
+
+    if not hasattr(_THREAD_STATE, 'stages_stack'):
+        _THREAD_STATE.stages_stack = []
+
+    return _THREAD_STATE.stages_stack
+
+
+def add_hook(hook):
+    ''' Enable the instrumentation, calling a function with the metrics of each stage once it is completed.
+
+    Args:
+        hook: A function receiving a dictionary with the stage name, its labels (e.g. the column), the parent stage,
+            the duration in seconds, the increase of the peak RSS in bytes and the counts recorded in the stage.
+    Raises:
+        None
+    Returns:
+        None
+    '''
+
+    _HOOKS.append(hook)
+
+
+def remove_hook(hook):
+    ''' Stop calling a function with the metrics of the stages. Without any hook left, the instrumentation is disabled.
+
+    Args:
+        hook: The function previously added with add_hook.
+    Raises:
+        None
+    Returns:
+        None
+    '''
+
+    _HOOKS.remove(hook)
+
+
+def _peak_rss():
+    ''' Measure the peak resident set size of the process.
+
+    Args:
+        None
+    Raises:
+        None
+    Returns:
+        The peak RSS in bytes, 0 if it cannot be measured.
+    '''
+
+    if resource is None:
+        return 0
+
+    _peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # The peak RSS is in bytes on macOS, in kilobytes elsewhere
+    return _peak_rss if sys.platform == 'darwin' else _peak_rss * 1024
+
+
+class _Stage:
+    ''' Measure a stage of the processing, e.g. the factorization of a column, and report it to the hooks.
+
+    Attributes:
+        name: The name of the stage.
+        labels: A dictionary with the labels of the stage, e.g. the column being processed.
+    '''
+
+    def __init__(self, name, labels):
+
+        self._name = name
+        self._labels = labels
+        self._counts = {}
+
+    def __enter__(self):
+
+        _stack = _stages_stack()
+
+        self._parent = _stack[-1]._name if _stack else None
+
+        _stack.append(self)
+
+        self._start_peak_rss = _peak_rss()
+        self._start_time = time.perf_counter()
+
+        return self
+
+    def __exit__(self, *exception_details):
+
+        _seconds = time.perf_counter() - self._start_time
+
+        _stages_stack().pop()
+
+        _metrics = {'stage': self._name, 'labels': self._labels, 'parent': self._parent, 'seconds': _seconds,
+                    'peak_rss_delta_bytes': _peak_rss() - self._start_peak_rss, 'counts': self._counts}
+
+        for hook in list(_HOOKS):
+            hook(_metrics)
+
+    def record(self, **counts):
+        ''' Add counts to the metrics of the stage, e.g. the number of rows and unique values.
+
+        Args:
+            counts: The counts, by name.
+        Raises:
+            None
+        Returns:
+            None
+        '''
+
+        for name, count in counts.items():
+            self._counts[name] = self._counts.get(name, 0) + count
+
+
+class _DisabledStage:
+    ''' Stand in for a stage when the instrumentation is disabled, at the cost of a function call.
+
+    Attributes:
+        None
+    '''
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *exception_details):
+
+        pass
+
+    def record(self, **counts):
+
+        pass
+
+
+_DISABLED_STAGE = _DisabledStage()
+
+
+def stage(name, **labels):
+    ''' Measure a stage of the processing, to be used as a context manager (e.g. with stage('factorize', column='email')).
+
+    Args:
+        name: The name of the stage.
+        labels: The labels of the stage, e.g. the column being processed.
+    Raises:
+        None
+    Returns:
+        The context manager of the stage, whose record method adds counts to its metrics.
+    '''
+
+    if not _HOOKS:
+        return _DISABLED_STAGE
+
+    return _Stage(name, labels)
+
+
+def record(**counts):
+    ''' Add counts to the metrics of the innermost stage being measured.
+
+    Args:
+        counts: The counts, by name (e.g. cache_hits).
+    Raises:
+        None
+    Returns:
+        None
+    '''
+
+    if _HOOKS:
+
+        _stack = _stages_stack()
+
+        if _stack:
+            _stack[-1].record(**counts)
+
+
+def _replay(stages_metrics):
+    ''' Report to the hooks the metrics of stages measured elsewhere, e.g. in a worker process.
+
+    Args:
+        stages_metrics: A list with the metrics of each stage, as received by the hooks. The stages without a parent
+            get the innermost stage being measured by the current thread.
+    Raises:
+        None
+    Returns:
+        None
+    '''
+
+    _stack = _stages_stack()
+
+    _parent = _stack[-1]._name if _stack else None
+
+    for stage_metrics in stages_metrics:
+
+        _stage_metrics = dict(stage_metrics, parent=stage_metrics['parent'] if stage_metrics['parent'] is not None else _parent)
+
+        for hook in list(_HOOKS):
+            hook(_stage_metrics)
+
+
+def _run_measured(function, *arguments):
+    ''' Run a function in a worker process, measuring its stages and the pickling of its result, see _submit_measured.
+
+    Args:
+        function: A function importable by the worker.
+        arguments: The arguments of the function.
+    Raises:
+        None
+    Returns:
+        A tuple with the pickled result of the function and a list with the metrics of each stage.
+    '''
+
+    import pickle
+
+    _stages_metrics = []
+
+    # The hooks inherited from the parent process, e.g. through fork, only receive the metrics once replayed there
+    _inherited_hooks = list(_HOOKS)
+
+    _HOOKS[:] = [_stages_metrics.append]
+
+    try:
+
+        _result = function(*arguments)
+
+        with stage('results_pickling') as _stage:
+
+            _pickled_result = pickle.dumps(_result, protocol=pickle.HIGHEST_PROTOCOL)
+
+            _stage.record(transferred_bytes=len(_pickled_result))
+
+    finally:
+
+        _HOOKS[:] = _inherited_hooks
+
+    return _pickled_result, _stages_metrics
+
+
+def _submit_measured(pool, function, *arguments):
+    ''' Submit a function to a pool of worker processes, in which no hook is registered. When the instrumentation is
+    enabled, the stages run by the worker are measured there and reported to the hooks along with the result.
+
+    Args:
+        pool: The ProcessPoolExecutor.
+        function: A function importable by the workers.
+        arguments: The arguments of the function.
+    Raises:
+        None
+    Returns:
+        A function waiting for the result of the worker and returning it.
+    '''
+
+    if not _HOOKS:
+        return pool.submit(function, *arguments).result
+
+    _future = pool.submit(_run_measured, function, *arguments)
+
+    def _result():
+
+        import pickle
+
+        _pickled_result, _stages_metrics = _future.result()
+
+        _replay(_stages_metrics)
+
+        with stage('results_unpickling') as _stage:
+
+            _stage.record(transferred_bytes=len(_pickled_result))
+
+            return pickle.loads(_pickled_result)
+
+    return _result
+
+
+class MetricsCollector:
+    ''' Aggregate the metrics of the stages with the same name and labels, and export them as JSON or in the Prometheus text format.
+
+    To be registered with add_hook, e.g. add_hook(MetricsCollector()), or used as a context manager, which adds and
+    removes the hook.
+
+    Attributes:
+        None
+    '''
+
+    def __init__(self):
+
+        self._metrics = {}
+
+    def __call__(self, stage_metrics):
+
+        _key = (stage_metrics['stage'], tuple(sorted((name, str(value))
+                for name, value in stage_metrics['labels'].items())))
+
+        _aggregated_metrics = self._metrics.get(_key)
+
+        if _aggregated_metrics is None:
+
+            _aggregated_metrics = self._metrics[_key] = {'stage': stage_metrics['stage'], 'labels': dict(_key[1]), 'parent': stage_metrics['parent'],
+                                                         'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'peak_rss_delta_bytes': 0, 'counts': {}}
+
+        _aggregated_metrics['calls'] += 1
+        _aggregated_metrics['seconds'] += stage_metrics['seconds']
+        _aggregated_metrics['max_seconds'] = max(
+            _aggregated_metrics['max_seconds'], stage_metrics['seconds'])
+        _aggregated_metrics['peak_rss_delta_bytes'] += stage_metrics['peak_rss_delta_bytes']
+
+        for name, count in stage_metrics['counts'].items():
+            _aggregated_metrics['counts'][name] = _aggregated_metrics['counts'].get(
+                name, 0) + count
+
+    def __enter__(self):
+
+        add_hook(self)
+
+        return self
+
+    def __exit__(self, *exception_details):
+
+        remove_hook(self)
+
+    def get_metrics(self):
+        ''' Return the aggregated metrics of each stage.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            A list of dictionaries with the stage, its labels, the number of calls, the total and the maximum duration,
+            the total increase of the peak RSS, the total counts and, if the cache was used, its hit rate.
+        '''
+
+        _metrics = []
+
+        for aggregated_metrics in self._metrics.values():
+
+            _stage_metrics = dict(aggregated_metrics, counts=dict(
+                aggregated_metrics['counts']))
+
+            _lookups_count = _stage_metrics['counts'].get(
+                'cache_hits', 0) + _stage_metrics['counts'].get('cache_misses', 0)
+
+            if _lookups_count:
+                _stage_metrics['cache_hit_rate'] = _stage_metrics['counts'].get(
+                    'cache_hits', 0) / _lookups_count
+
+            _metrics.append(_stage_metrics)
+
+        return _metrics
+
+    def to_json(self, output_file):
+        ''' Write the aggregated metrics in a JSON file.
+
+        Args:
+            output_file: The path of the JSON file.
+        Raises:
+            None
+        Returns:
+            None
+        '''
+
+        with open(output_file, 'w') as _output_file:
+            json.dump(self.get_metrics(), _output_file, indent=4)
+
+    def to_prometheus(self, output_file):
+        ''' Write the aggregated metrics in the Prometheus text format, e.g. for the textfile collector of the node exporter.
+
+        Args:
+            output_file: The path of the text file.
+        Raises:
+            None
+        Returns:
+            None
+        '''
+
+        _lines = []
+
+        def _metric_line(metric_name, stage_metrics, value):
+
+            _labels = dict(stage_metrics['labels'], stage=stage_metrics['stage'])
+
+            _labels_text = ','.join('{}="{}"'.format(name, str(label_value).replace('\\', '\\\\').replace('"', '\\"'))
+                                    for name, label_value in sorted(_labels.items()))
+
+            return f'data_clues_{metric_name}{{{_labels_text}}} {value}'
+
+        _metrics = self.get_metrics()
+
+        for metric_name, metric_type, metric_help, value_function in [
+            ('stage_calls_total', 'counter', 'The number of runs of the stage.',
+             lambda stage_metrics: stage_metrics['calls']),
+            ('stage_seconds_total', 'counter', 'The total duration of the stage.',
+             lambda stage_metrics: stage_metrics['seconds']),
+            ('stage_max_seconds', 'gauge', 'The longest duration of the stage.',
+             lambda stage_metrics: stage_metrics['max_seconds']),
+            ('stage_peak_rss_delta_bytes', 'gauge', 'The increase of the peak RSS during the stage.',
+             lambda stage_metrics: stage_metrics['peak_rss_delta_bytes']),
+        ]:
+
+            _lines.append(f'# HELP data_clues_{metric_name} {metric_help}')
+            _lines.append(f'# TYPE data_clues_{metric_name} {metric_type}')
+
+            _lines.extend(_metric_line(metric_name, stage_metrics, value_function(stage_metrics))
+                          for stage_metrics in _metrics)
+
+        _counts_names = sorted(
+            {name for stage_metrics in _metrics for name in stage_metrics['counts']})
+
+        for count_name in _counts_names:
+
+            _lines.append(f'# TYPE data_clues_{count_name}_total counter')
+
+            _lines.extend(_metric_line(f'{count_name}_total', stage_metrics, stage_metrics['counts'][count_name])
+                          for stage_metrics in _metrics if count_name in stage_metrics['counts'])
+
+        _lines.append('# TYPE data_clues_cache_hit_rate gauge')
+
+        _lines.extend(_metric_line('cache_hit_rate', stage_metrics, stage_metrics['cache_hit_rate'])
+                      for stage_metrics in _metrics if 'cache_hit_rate' in stage_metrics)
+
+        with open(output_file, 'w') as _output_file:
+            _output_file.write('\n'.join(_lines) + '\n')
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
+
+__all__ = ['KeywordsAutomaton']
+
+from collections import deque
+
+
+class KeywordsAutomaton:
+    ''' Match strings against a list of literal keywords with an Aho-Corasick automaton.
+
+    Each string is scanned in a time proportional to its length, regardless of the number of keywords. When more than one
+    keyword matches, the first one in the reference list is returned, as the alternation of a regular expression would do.
+
+    Attributes:
+        keywords: The list of literal keywords to be matched.
+    '''
+
+    def __init__(self, keywords):
+
+        self._keywords = list(keywords)
+
+        # The trie: the transitions, the failure links and the index of the first keyword ending in each node
+        self._transitions = [{}]
+        self._failures = [0]
+        self._outputs = [-1]
+
+        # The depth of each node, i.e. the length of the prefix it represents
+        self._depths = [0]
+
+        # The closest node, along the failure links, where a keyword ends
+        self._output_links = [0]
+
+        for keyword_index, keyword in enumerate(self._keywords):
+            self._add_keyword(keyword_index, keyword)
+
+        self._build_failure_links()
+
+    def _add_keyword(self, keyword_index, keyword):
+        ''' Add a keyword to the trie.
+
+        Args:
+            keyword_index: The position of the keyword in the reference list.
+            keyword: The keyword to be added.
+        Raises:
+            None
+        Returns:
+            None
+        '''
+
+        _node = 0
+
+        for character in keyword:
+
+            _next_node = self._transitions[_node].get(character)
+
+            if _next_node is None:
+
+                _next_node = len(self._transitions)
+
+                self._transitions.append({})
+                self._failures.append(0)
+                self._outputs.append(-1)
+                self._depths.append(self._depths[_node] + 1)
+                self._output_links.append(0)
+
+                self._transitions[_node][character] = _next_node
+
+            _node = _next_node
+
+        # Keep the first keyword of the list in case of duplicates
+        if self._outputs[_node] < 0:
+            self._outputs[_node] = keyword_index
+
+    def _build_failure_links(self):
+        ''' Link each node of the trie to the node of its longest proper suffix, visiting the trie breadth-first.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            None
+        '''
+
+        _queue = deque(self._transitions[0].values())
+
+        while _queue:
+
+            _node = _queue.popleft()
+
+            for character, child_node in self._transitions[_node].items():
+
+                _fallback_node = self._failures[_node]
+
+                while _fallback_node and character not in self._transitions[_fallback_node]:
+                    _fallback_node = self._failures[_fallback_node]
+
+                _failure_node = self._transitions[_fallback_node].get(
+                    character, 0)
+
+                self._failures[child_node] = _failure_node if _failure_node != child_node else 0
+
+                self._output_links[child_node] = _failure_node if self._outputs[_failure_node] >= 0 else self._output_links[_failure_node]
+
+                _queue.append(child_node)
+
+    def match(self, target_string):
+        ''' Find the keyword matching the beginning of a string.
+
+        Args:
+            target_string: The string to be matched.
+        Raises:
+            None
+        Returns:
+            The first keyword of the list the string begins with, None if there is no match.
+        '''
+
+        _node = 0
+        _keyword_index = self._outputs[0]
+
+        for character in target_string:
+
+            _node = self._transitions[_node].get(character)
+
+            if _node is None:
+                break
+
+            _node_output = self._outputs[_node]
+
+            if _node_output >= 0 and (_keyword_index < 0 or _node_output < _keyword_index):
+                _keyword_index = _node_output
+
+        return self._keywords[_keyword_index] if _keyword_index >= 0 else None
+
+    def search(self, target_string):
+        ''' Find the keyword matching the string at the leftmost position.
+
+        Args:
+            target_string: The string to be scanned.
+        Raises:
+            None
+        Returns:
+            The first keyword of the list found at the leftmost position, None if there is no match.
+        '''
+
+        # An empty keyword matches at the beginning of any string
+        if self._outputs[0] >= 0:
+            return self._keywords[self._outputs[0]]
+
+        _node = 0
+        _best_start = None
+        _best_index = -1
+
+        for position, character in enumerate(target_string):
+
+            while _node and character not in self._transitions[_node]:
+                _node = self._failures[_node]
+
+            _node = self._transitions[_node].get(character, 0)
+
+            # Collect every keyword ending here, through the output links
+            _output_node = _node if self._outputs[_node] >= 0 else self._output_links[_node]
+
+            while _output_node:
+
+                _start = position + 1 - self._depths[_output_node]
+                _output_index = self._outputs[_output_node]
+
+                if _best_start is None or _start < _best_start or (_start == _best_start and _output_index < _best_index):
+                    _best_start, _best_index = _start, _output_index
+
+                _output_node = self._output_links[_output_node]
+
+            # No later match can start before the best one found so far
+            if _best_start is not None and position + 1 - self._depths[_node] > _best_start:
+                break
+
+        return self._keywords[_best_index] if _best_index >= 0 else None
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
+
+__all__ = ['KeywordsBKTree']
+
+
+class KeywordsBKTree:
+    ''' Find the keyword nearest to a string, within a maximum Levenshtein distance, with a BK-tree over a list of keywords.
+
+    Each node of the tree holds a keyword, and its children are keyed by their distance from it. By the triangle
+    inequality, the keywords within distance d of a string can only be below the children whose key differs from the
+    distance between the string and the node by at most d, so a lookup only compares the string with a fraction of the
+    keywords, the smaller the maximum distance. When more than one keyword is at the same distance, the first one in the
+    reference list is returned, as the other matching engines do.
+
+    Attributes:
+        keywords: The list of keywords to be indexed.
+    '''
+
+    def __init__(self, keywords):
+
+        self._keywords = list(keywords)
+
+        # The keyword of each node, as its position in the reference list, and the children of each node by distance
+        self._nodes_keywords = []
+        self._children = []
+
+        for keyword_index, keyword in enumerate(self._keywords):
+            self._add_keyword(keyword_index, keyword)
+
+    def _add_keyword(self, keyword_index, keyword):
+        ''' Add a keyword to the tree.
+
+        Args:
+            keyword_index: The position of the keyword in the reference list.
+            keyword: The keyword to be added.
+        Raises:
+            None
+        Returns:
+            None
+        '''
+
+        import Levenshtein
+
+        if not self._nodes_keywords:
+
+            self._nodes_keywords.append(keyword_index)
+            self._children.append({})
+
+            return
+
+        _node = 0
+
+        while True:
+
+            _distance = Levenshtein.distance(
+                keyword, self._keywords[self._nodes_keywords[_node]])
+
+            # Keep the first keyword of the list in case of duplicates
+            if _distance == 0:
+                return
+
+            _child_node = self._children[_node].get(_distance)
+
+            if _child_node is None:
+
+                self._children[_node][_distance] = len(self._nodes_keywords)
+
+                self._nodes_keywords.append(keyword_index)
+                self._children.append({})
+
+                return
+
+            _node = _child_node
+
+    def nearest(self, target_string, max_distance=None):
+        ''' Find the keyword nearest to a string.
+
+        Args:
+            target_string: The string to be looked up.
+            max_distance: The maximum Levenshtein distance between the string and the keyword. If not provided, 2 is used.
+        Raises:
+            None
+        Returns:
+            A tuple with the nearest keyword (the first one of the list, in case of a tie) and its distance from the
+            string, (None, None) if no keyword is within max_distance.
+        '''
+
+        import Levenshtein
+
+        if not self._nodes_keywords:
+            return None, None
+
+        # The search radius shrinks to the distance of the best keyword found so far
+        _radius = max_distance if max_distance is not None else 2
+
+        _best_index = -1
+        _best_distance = None
+
+        _nodes_stack = [0]
+
+        while _nodes_stack:
+
+            _node = _nodes_stack.pop()
+
+            _keyword_index = self._nodes_keywords[_node]
+
+            _distance = Levenshtein.distance(
+                target_string, self._keywords[_keyword_index])
+
+            if _distance <= _radius and (_best_distance is None or _distance < _best_distance or (
+                    _distance == _best_distance and _keyword_index < _best_index)):
+
+                _best_index, _best_distance = _keyword_index, _distance
+                _radius = _distance
+
+            for child_distance, child_node in self._children[_node].items():
+
+                if _distance - _radius <= child_distance <= _distance + _radius:
+                    _nodes_stack.append(child_node)
+
+        return (self._keywords[_best_index], _best_distance) if _best_index >= 0 else (None, None)
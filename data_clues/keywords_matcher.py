@@ -1,14 +1,355 @@
 # -*- coding: utf-8 -*-
 # Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
 
-__all__ = ['KeywordsMatcher']
+__all__ = ['KeywordsMatcher', 'compile_reference_keywords']
 
 import re
 import pandas
-from data_clues.utilities import basic_unique_values
+from functools import lru_cache
+from data_clues.utilities import map_unique_values
+from data_clues.instrumentation import stage
+from data_clues.results_cache import operation_key
+from data_clues.keywords_automaton import KeywordsAutomaton
+from data_clues.keywords_bk_tree import KeywordsBKTree
+from data_clues.parallel_executor import SharedMemoryExecutor
+
+# The characters with a special meaning in a regular expression
+_REGEX_METACHARACTERS = frozenset('.^$*+?{}[]\\|()')
+
+# The characters for which 'auto' selects the regex engine. The dots are taken literally, as in the domains of a list
+# such as popular_urls, rather than as any character
+_AUTO_REGEX_METACHARACTERS = _REGEX_METACHARACTERS - {'.'}
+
+
+def compile_reference_keywords(reference_keywords_list, engine=None, ignore_case=False):
+    ''' Compile a reference list for the given matching engine.
+
+    Args:
+        reference_keywords_list: The list of keywords (or a single regular expression) to be compiled.
+        engine: An optional engine name, i.e. 'auto', 'regex', 'automaton' or 'arrow'. With 'auto', or if not provided, the automaton 
+            is used when the reference list contains only literal keywords, in which the dots are literal (e.g. domains).
+        ignore_case: If True, the reference list is compiled to match regardless of the case. The pattern of the arrow
+            engine is the same either way, as the case is ignored when it is evaluated.
+    Raises:
+        ValueError: If the engine is not supported, or if the arrow engine does not support the regular expression 
+            (e.g. backreferences and lookarounds, which cannot be matched in linear time).
+    Returns:
+        A tuple with the name of the selected engine and the compiled reference list.
+    '''
+
+    # A single string is a regular expression on its own, not a list of characters
+    if isinstance(reference_keywords_list, str):
+        reference_keywords_list = [reference_keywords_list]
+
+    _engine = engine if engine is not None else 'auto'
+
+    return _compile_reference_keywords(tuple(reference_keywords_list), _engine, ignore_case and _engine != 'arrow')
+
+
+@lru_cache(maxsize=32)
+def _compile_reference_keywords(reference_keywords, engine, ignore_case):
+    ''' Compile a reference list, reusing the compiled matchers of the reference lists already seen.
+
+    Args:
+        reference_keywords: The tuple of keywords to be compiled.
+        engine: The engine name, i.e. 'auto', 'regex', 'automaton' or 'arrow'.
+        ignore_case: If True, the reference list is compiled to match regardless of the case.
+    Raises:
+        ValueError: If the engine is not supported, or if the arrow engine does not support the regular expression.
+    Returns:
+        A tuple with the name of the selected engine and the compiled reference list.
+    '''
+
+    if engine == 'auto':
+        engine = 'automaton' if all(_AUTO_REGEX_METACHARACTERS.isdisjoint(keyword)
+                                    for keyword in reference_keywords) else 'regex'
+
+    if engine == 'automaton':
+
+        if ignore_case:
+
+            # The keywords are matched in lower case, and reported as they are in the reference list
+            return engine, (KeywordsAutomaton([keyword.lower() for keyword in reference_keywords]),
+                            dict(zip(reversed([keyword.lower() for keyword in reference_keywords]), reversed(reference_keywords))))
+
+        return engine, KeywordsAutomaton(reference_keywords)
+
+    elif engine == 'regex':
+
+        # Concatenate all the string and regular expression and compile them
+        return engine, re.compile('|'.join(reference_keywords), re.IGNORECASE if ignore_case else 0)
+
+    elif engine == 'arrow':
+
+        import pyarrow
+        import pyarrow.compute
+
+        _pattern = '|'.join(reference_keywords)
+
+        # The RE2 syntax is checked once, rather than on each evaluation
+        pyarrow.compute.match_substring_regex(
+            pyarrow.array([''], type=pyarrow.string()), _pattern)
+
+        return engine, _pattern
+
+    else:
+
+        raise ValueError(
+            f'Unsupported matching engine: {engine}. (Ref. KeywordsMatcher)')
+
+
+@lru_cache(maxsize=32)
+def _compile_fuzzy_keywords(reference_keywords, ignore_case):
+    ''' Index a reference list in a BK-tree, reusing the trees of the reference lists already seen.
+
+    Args:
+        reference_keywords: The tuple of keywords to be indexed.
+        ignore_case: If True, the keywords are indexed in lower case.
+    Raises:
+        None
+    Returns:
+        A tuple with the KeywordsBKTree and, if ignore_case, a dictionary with the keyword of the reference list of each
+        lower case keyword (None otherwise).
+    '''
+
+    if ignore_case:
+
+        # The keywords are looked up in lower case, and reported as they are in the reference list
+        return (KeywordsBKTree([keyword.lower() for keyword in reference_keywords]),
+                dict(zip(reversed([keyword.lower() for keyword in reference_keywords]), reversed(reference_keywords))))
+
+    return KeywordsBKTree(reference_keywords), None
+
+
+def _fuzzy_value_matcher(reference_keywords_list, max_distance=None, ignore_case=False):
+    ''' Build a function finding the keyword of a reference list nearest to a single string.
+
+    Args:
+        reference_keywords_list: The list of keywords. A single string is a keyword on its own.
+        max_distance: The maximum Levenshtein distance between a string and its keyword. If not provided, 2 is used.
+        ignore_case: If True, the strings are matched regardless of the case.
+    Raises:
+        None
+    Returns:
+        A function returning a tuple with the nearest keyword of a string and its distance, (None, None) if no keyword
+        is within max_distance.
+    '''
+
+    if isinstance(reference_keywords_list, str):
+        reference_keywords_list = [reference_keywords_list]
+
+    _bk_tree, _original_keywords = _compile_fuzzy_keywords(
+        tuple(reference_keywords_list), ignore_case)
+
+    if ignore_case:
+
+        def _match_value(value):
+
+            _keyword, _distance = _bk_tree.nearest(value.lower(), max_distance)
+
+            return _original_keywords.get(_keyword), _distance
+
+        return _match_value
+
+    return lambda value: _bk_tree.nearest(value, max_distance)
+
+
+def _matching_operation_key(reference_keywords_list, results_column_label, engine=None, matched_keywords_column_label=None, match_mode=None, ignore_case=False):
+    ''' Build the key of the cached results of a matching operation, the same for the accessor and the Pipeline.
+
+    Args:
+        reference_keywords_list: The list of keywords (or a single regular expression).
+        results_column_label: The name of the column populated with the result of the matching process.
+        engine: An optional engine name, i.e. 'auto', 'regex', 'automaton' or 'arrow'.
+        matched_keywords_column_label: If provided, the name of the column populated with the matching keyword.
+        match_mode: 'match' or 'search', see KeywordsMatcher.match_rows_to_keywords.
+        ignore_case: If True, the values are matched regardless of the case.
+    Raises:
+        None
+    Returns:
+        The operation key, see operation_key.
+    '''
+
+    return operation_key('dc_matching', reference_keywords_list=reference_keywords_list, engine=engine,
+                         results_column_label=results_column_label, matched_keywords_column_label=matched_keywords_column_label,
+                         match_mode=match_mode, ignore_case=ignore_case)
+
+
+def _fuzzy_matching_operation_key(reference_keywords_list, results_column_label, max_distance=None, matched_keywords_column_label=None, distance_column_label=None, ignore_case=False):
+    ''' Build the key of the cached results of a fuzzy matching operation, the same for the accessor and the Pipeline.
+
+    Args:
+        reference_keywords_list: The list of keywords.
+        results_column_label: The name of the column populated with the result of the matching process.
+        max_distance: The maximum Levenshtein distance between a value and its keyword.
+        matched_keywords_column_label: If provided, the name of the column populated with the nearest keyword.
+        distance_column_label: If provided, the name of the column populated with the distance of the nearest keyword.
+        ignore_case: If True, the values are matched regardless of the case.
+    Raises:
+        None
+    Returns:
+        The operation key, see operation_key.
+    '''
+
+    return operation_key('dc_matching_fuzzy', reference_keywords_list=reference_keywords_list, max_distance=max_distance,
+                         results_column_label=results_column_label, matched_keywords_column_label=matched_keywords_column_label,
+                         distance_column_label=distance_column_label, ignore_case=ignore_case)
+
+
+def _non_capturing_pattern(pattern):
+    ''' Turn the unnamed groups of a regular expression into non-capturing groups, leaving escapes and character classes as they are.
+
+    Args:
+        pattern: The regular expression.
+    Raises:
+        None
+    Returns:
+        The regular expression, with (?: in place of each unnamed (.
+    '''
+
+    _characters = []
+    _escaped = False
+    _in_class = False
+
+    for position, character in enumerate(pattern):
+
+        if _escaped:
+            _escaped = False
+        elif character == '\\':
+            _escaped = True
+        elif _in_class:
+            _in_class = character != ']' or pattern[position - 1] == '['
+        elif character == '[':
+            _in_class = True
+        elif character == '(' and not pattern.startswith('?', position + 1):
+            character = '(?:'
+
+        _characters.append(character)
+
+    return ''.join(_characters)
+
+
+def _value_matcher(engine_name, compiled_keywords, match_mode=None, ignore_case=False):
+    ''' Build a function matching a single string with a compiled reference list, e.g. to match one record at a time.
+
+    Args:
+        engine_name: The name of the engine, as returned by compile_reference_keywords.
+        compiled_keywords: The compiled reference list, as returned by compile_reference_keywords.
+        match_mode: 'match' to match the beginning of the values, or 'search' to match anywhere in the values.
+            If not provided, 'match' is used.
+        ignore_case: If True, the values are matched regardless of the case.
+    Raises:
+        ValueError: If the match mode is not supported.
+    Returns:
+        A function returning the matching keyword of a string (with the regex and arrow engines, the matching text),
+        None if it does not match.
+    '''
+
+    _match_mode = match_mode if match_mode is not None else 'match'
+
+    if _match_mode not in ('match', 'search'):
+
+        raise ValueError(
+            f'Unsupported match mode: {match_mode}. (Ref. KeywordsMatcher)')
+
+    if engine_name == 'automaton':
+
+        if ignore_case:
+
+            _automaton, _original_keywords = compiled_keywords
+
+            _automaton_match = getattr(_automaton, _match_mode)
+
+            return lambda value: _original_keywords.get(_automaton_match(value.lower()))
+
+        return getattr(compiled_keywords, _match_mode)
+
+    elif engine_name == 'arrow':
+
+        # Each call to Arrow has a fixed cost, so the single values are better matched in batches
+        return lambda value: _match_values([value], engine_name, compiled_keywords, _match_mode, ignore_case)[1][0]
+
+    _regex_match = getattr(compiled_keywords, _match_mode)
+
+    def _match_value(value):
+
+        _match = _regex_match(value)
+
+        return _match.group(0) if _match is not None else None
+
+    return _match_value
+
+
+def _match_values(values, engine_name, compiled_keywords, match_mode=None, ignore_case=False, matched_keywords=True):
+    ''' Match an array of values with a compiled reference list.
+
+    Args:
+        values: The values to be matched.
+        engine_name: The name of the engine, as returned by compile_reference_keywords.
+        compiled_keywords: The compiled reference list, as returned by compile_reference_keywords.
+        match_mode: 'match' to match the beginning of the values, or 'search' to match anywhere in the values.
+            If not provided, 'match' is used.
+        ignore_case: If True, the values are matched regardless of the case.
+        matched_keywords: If False, the arrow engine does not extract the matching text, which is reported as None.
+    Raises:
+        ValueError: If the match mode is not supported.
+    Returns:
+        A tuple with the list of the matching results (True, False or '-' for the values which are not strings) and
+        the list of the matching keywords (with the regex and arrow engines, the matching text).
+    '''
+
+    _match_mode = match_mode if match_mode is not None else 'match'
+
+    if _match_mode not in ('match', 'search'):
+
+        raise ValueError(
+            f'Unsupported match mode: {match_mode}. (Ref. KeywordsMatcher)')
+
+    _values = pandas.Series(values, dtype=object)
+
+    _string_mask = [isinstance(value, str) for value in _values]
+
+    if engine_name == 'arrow':
+
+        import pyarrow
+        import pyarrow.compute
+
+        # RE2 finds matches in a time linear in the length of the values, with no backtracking
+        _pattern = f'^(?:{compiled_keywords})' if _match_mode == 'match' else compiled_keywords
 
+        _strings = pyarrow.array([value if is_string else None for value, is_string in zip(_values, _string_mask)],
+                                 type=pyarrow.string())
 
-@pandas.api.extensions.register_dataframe_accessor("dc_matching")
+        if not matched_keywords:
+
+            _matches = pyarrow.compute.match_substring_regex(
+                _strings, _pattern, ignore_case=ignore_case).to_pylist()
+
+            return [bool(match) if is_string else '-' for match, is_string in zip(_matches, _string_mask)], [None] * len(_values)
+
+        # Only the named group of the whole match can be extracted
+        _extracted = pyarrow.compute.extract_regex(
+            _strings, ('(?i)' if ignore_case else '') + f'(?P<keyword>{_non_capturing_pattern(_pattern)})')
+
+        # The values without a match are null in the extracted array
+        _matched_keywords = pyarrow.compute.if_else(pyarrow.compute.is_valid(_extracted), pyarrow.compute.struct_field(
+            _extracted, [0]), pyarrow.scalar(None, pyarrow.string())).to_pylist()
+
+    else:
+
+        _match_value = _value_matcher(
+            engine_name, compiled_keywords, _match_mode, ignore_case)
+
+        _matched_keywords = [_match_value(value) if is_string else None
+                             for value, is_string in zip(_values, _string_mask)]
+
+    _matching_results = [matched_keyword is not None if is_string else '-'
+                         for matched_keyword, is_string in zip(_matched_keywords, _string_mask)]
+
+    return _matching_results, _matched_keywords
+
+
+# Registered as the dc_matching accessor by data_clues/__init__.py, and imported on its first use
 class KeywordsMatcher(object):
     ''' Match a dataframe to a given set of reference lists.
 
@@ -22,12 +363,15 @@ class KeywordsMatcher(object):
         # TODO: add validator self._validate(pandas_obj)
         self._dataframe_obj = pandas_obj
 
-    def filter_column_by_keywords(self, target_column_label=None, reference_keywords_list=None):
+    def filter_column_by_keywords(self, target_column_label=None, reference_keywords_list=None, engine=None, match_mode=None, ignore_case=False):
         '''Filter a specific column of the target_df according to a reference list.
 
         Args:
             target_column_label: The label of the column to be inspected.
             reference_keywords_list: The list of keywords used to filter the target_column_label.
+            engine: The matching engine, see match_rows_to_keywords.
+            match_mode: 'match' or 'search', see match_rows_to_keywords.
+            ignore_case: If True, the values are matched regardless of the case.
         Raises:
             None
         Returns:
@@ -36,102 +380,269 @@ class KeywordsMatcher(object):
 
         _target_keywords_list = list(self._dataframe_obj[target_column_label])
 
-        # Concatenate all the string and regular expression and compile them
-        _reference_keywords_regex = re.compile(
-            '|'.join(reference_keywords_list)
-        )
+        _engine_name, _compiled_keywords = compile_reference_keywords(
+            reference_keywords_list, engine, ignore_case)
 
         # Generate a list with all the dossiers with bad keywords
-        _filtered_list = list(filter(lambda target_keyword: re.match(
-            _reference_keywords_regex, target_keyword), _target_keywords_list)
-        )
+        _matching_results, _ = _match_values(
+            _target_keywords_list, _engine_name, _compiled_keywords, match_mode, ignore_case, False)
+
+        _filtered_list = [target_keyword for target_keyword, matching_result in zip(_target_keywords_list, _matching_results)
+                          if matching_result is True]
 
         return _filtered_list
 
-    def match_rows_to_keywords(self, target_column_label=None, reference_keywords_list=None, results_column_label=None):
+    def match_rows_to_keywords(self, target_column_label=None, reference_keywords_list=None, results_column_label=None, engine=None, matched_keywords_column_label=None, results_cache=None, match_mode=None, ignore_case=False):
         ''' Match the targetted values Series to a given list and append the results to a new Series in the target_df.
 
         The matching values can be: 
         - 0, if the value matches an element in the reference_keyword_list; 
         - 1, if the value does NOT match any of the elements in the reference_keyword_list
 
+        Three engines are available: 
+        - regex, which concatenates the keywords in a single regular expression; 
+        - automaton, which treats the keywords as literal strings and scans each value in linear time, 
+          regardless of the number of keywords (see KeywordsAutomaton);
+        - arrow, which concatenates the keywords in a single RE2 regular expression, evaluated by Arrow on all the 
+          values at once in linear time, so that no pattern can backtrack catastrophically.
+        By default, the automaton is used when the reference list contains only literal keywords, in which the dots
+        are literal (e.g. the domains of popular_urls): use the regex engine for a dot matching any character.
+
         Args: 
             target_column_label: The name of the column to be analysed.
             reference_keywords_list: The list of keywords used to filter the object_series.
             results_column_label: The name of the new column populated with the result of the matching process.
+            engine: An optional engine name, i.e. 'auto', 'regex', 'automaton' or 'arrow'.
+            matched_keywords_column_label: If provided, the name of a new column populated with the matching keyword 
+                (with the regex and arrow engines, the matching text).
+            results_cache: An optional ResultsCache, which provides the results of the values already matched 
+                (e.g. in previous chunks of data) and stores the new ones.
+            match_mode: 'match' to match the keywords at the beginning of the values, or 'search' to match them 
+                anywhere in the values. If not provided, 'match' is used.
+            ignore_case: If True, the values are matched regardless of the case.
         Raises: 
             AttributeError: If any of the attribute is not provided. 
         Returns:
             None
         '''
 
-        if all(element is not None for element in [target_column_label, reference_keywords_list, results_column_label]):
+        self._dataframe_obj = self._dataframe_obj.assign(**self._matching_results(
+            target_column_label, reference_keywords_list, results_column_label, engine, matched_keywords_column_label, results_cache, match_mode, ignore_case))
 
-            # Concatenate all the string and regular expression and compile them
-            _reference_keywords_regex = re.compile(
-                '|'.join(reference_keywords_list))
+    def _match_unique_values(self, unique_values, reference_keywords_list=None, results_column_label=None, engine=None, matched_keywords_column_label=None, match_mode=None, ignore_case=False):
+        ''' Match the unique values of the targetted Series to a given list.
 
-            # Collect all the unique values in an array and store them in a new DataFrame
-            _unique_values = pandas.Series(basic_unique_values(
-                self._dataframe_obj[target_column_label]))
+        Args: 
+            unique_values: The unique values to be matched.
+            reference_keywords_list: The list of keywords used to filter the object_series.
+            results_column_label: The name of the column populated with the result of the matching process.
+            engine: An optional engine name, i.e. 'auto', 'regex', 'automaton' or 'arrow'.
+            matched_keywords_column_label: If provided, the name of the column populated with the matching keyword.
+            match_mode: 'match' or 'search', see match_rows_to_keywords.
+            ignore_case: If True, the values are matched regardless of the case.
+        Raises: 
+            None
+        Returns:
+            A dictionary with the label of each results column and the results of the unique values.
+        '''
 
-            _matching_results_series = _unique_values.str.match(
-                _reference_keywords_regex, case=True, flags=0, na='-')
+        with stage('matching', results_column_label=results_column_label, engine=str(engine)) as _stage:
 
-            _unique_values_df = pandas.DataFrame({
-                target_column_label: _unique_values,
-                results_column_label: _matching_results_series
-            })
+            _stage.record(unique_values=len(unique_values))
 
-            self._dataframe_obj = self._dataframe_obj.merge(
-                _unique_values_df, how='outer', on=target_column_label)
+            _engine_name, _compiled_keywords = compile_reference_keywords(
+                reference_keywords_list, engine, ignore_case)
+
+            _matching_results, _matched_keywords = _match_values(
+                unique_values, _engine_name, _compiled_keywords, match_mode, ignore_case, matched_keywords_column_label is not None)
+
+            _unique_results_dict = {
+                results_column_label: pandas.Series(_matching_results)}
+
+            if matched_keywords_column_label is not None:
+                _unique_results_dict[matched_keywords_column_label] = pandas.Series(
+                    _matched_keywords, dtype=object)
+
+            return _unique_results_dict
+
+    def _matching_results(self, target_column_label=None, reference_keywords_list=None, results_column_label=None, engine=None, matched_keywords_column_label=None, results_cache=None, match_mode=None, ignore_case=False):
+        ''' Match the targetted values Series to a given list and return the results aligned to the rows of the dataframe.
+
+        The values are matched once for each unique value, and the results are expanded to the rows through their codes.
+
+        Args: 
+            target_column_label: The name of the column to be analysed.
+            reference_keywords_list: The list of keywords used to filter the object_series.
+            results_column_label: The name of the column populated with the result of the matching process.
+            engine: An optional engine name, i.e. 'auto', 'regex', 'automaton' or 'arrow'.
+            matched_keywords_column_label: If provided, the name of the column populated with the matching keyword.
+            results_cache: An optional ResultsCache, which provides the results of the values already matched.
+            match_mode: 'match' or 'search', see match_rows_to_keywords.
+            ignore_case: If True, the values are matched regardless of the case.
+        Raises: 
+            AttributeError: If any of the attribute is not provided. 
+        Returns:
+            A dictionary with the label and the values, aligned to the rows, of each results column.
+        '''
+
+        if all(element is not None for element in [target_column_label, reference_keywords_list, results_column_label]):
+
+            _operation_key = _matching_operation_key(reference_keywords_list, results_column_label, engine, matched_keywords_column_label,
+                                                     match_mode, ignore_case) if results_cache is not None else None
+
+            return map_unique_values(self._dataframe_obj, [target_column_label], lambda unique_values_df: self._match_unique_values(
+                unique_values_df[target_column_label], reference_keywords_list, results_column_label, engine, matched_keywords_column_label, match_mode, ignore_case),
+                results_cache, _operation_key)
 
         else:
 
             raise AttributeError(
                 'Missing attributes for method match_rows_to_keywords (KeywordsMatcher).')
 
-    def _data_matching_iterator(self, keywords_parameters_dicts, index):
-        ''' Run the rows-to-keywords matching concurrently, with each process responsible for a keywords_parameters_dicts dictionary (identified by the index). 
+    def fuzzy_match_rows_to_keywords(self, target_column_label=None, reference_keywords_list=None, results_column_label=None, max_distance=None, matched_keywords_column_label=None, distance_column_label=None, ignore_case=False, results_cache=None):
+        ''' Match the targetted values Series to the nearest keyword of a given list, within a maximum edit distance, and append the results to new Series in the target_df.
+
+        The keywords are indexed once in a BK-tree (see KeywordsBKTree), so that each unique value is compared with a
+        fraction of the keywords only, e.g. Jon Doe is matched to John Doe and gmial.com to gmail.com. The whole value
+        is compared with the keywords, by their Levenshtein distance.
+
+        Args: 
+            target_column_label: The name of the column to be analysed.
+            reference_keywords_list: The list of keywords, compared as literal strings.
+            results_column_label: The name of the new column populated with True if a keyword is within max_distance,
+                False if none is, or '-' for the values which are not strings.
+            max_distance: The maximum Levenshtein distance between a value and its keyword. If not provided, 2 is used.
+            matched_keywords_column_label: If provided, the name of a new column populated with the nearest keyword
+                (the first one of the list, in case of a tie).
+            distance_column_label: If provided, the name of a new column populated with the distance of the nearest keyword
+                (NaN if no keyword is within max_distance).
+            ignore_case: If True, the values are matched regardless of the case.
+            results_cache: An optional ResultsCache, which provides the results of the values already matched.
+        Raises: 
+            AttributeError: If any of the attribute is not provided. 
+        Returns:
+            None
+        '''
+
+        self._dataframe_obj = self._dataframe_obj.assign(**self._fuzzy_matching_results(
+            target_column_label, reference_keywords_list, results_column_label, max_distance, matched_keywords_column_label, distance_column_label, ignore_case, results_cache))
+
+    def _fuzzy_match_unique_values(self, unique_values, reference_keywords_list=None, results_column_label=None, max_distance=None, matched_keywords_column_label=None, distance_column_label=None, ignore_case=False):
+        ''' Match the unique values of the targetted Series to the nearest keyword of a given list.
 
         Args: 
-            keywords_parameters_dicts: A list of dictionaries containing the parameters to be passed to the the match_rows_to_keyword function.
-            index: The element in the keywords_parameters_dicts to be used.
+            unique_values: The unique values to be matched.
+            reference_keywords_list: The list of keywords.
+            results_column_label: The name of the column populated with the result of the matching process.
+            max_distance: The maximum Levenshtein distance between a value and its keyword.
+            matched_keywords_column_label: If provided, the name of the column populated with the nearest keyword.
+            distance_column_label: If provided, the name of the column populated with the distance of the nearest keyword.
+            ignore_case: If True, the values are matched regardless of the case.
         Raises: 
             None
         Returns:
-            The processed dataframe with a new column containing the result of the matching. 
+            A dictionary with the label of each results column and the results of the unique values.
         '''
 
-        self.match_rows_to_keywords(**keywords_parameters_dicts[index])
+        with stage('fuzzy_matching', results_column_label=results_column_label) as _stage:
 
-        return self._dataframe_obj
+            _stage.record(unique_values=len(unique_values))
+
+            _match_value = _fuzzy_value_matcher(
+                reference_keywords_list, max_distance, ignore_case)
 
-    def bulk_data_matching(self, keywords_parameters_dicts):
+            _matches = [_match_value(value) if isinstance(value, str) else None
+                        for value in unique_values]
+
+            _unique_results_dict = {results_column_label: pandas.Series(
+                [match[0] is not None if match is not None else '-' for match in _matches])}
+
+            if matched_keywords_column_label is not None:
+                _unique_results_dict[matched_keywords_column_label] = pandas.Series(
+                    [match[0] if match is not None else None for match in _matches], dtype=object)
+
+            if distance_column_label is not None:
+                # The distances are floats, so that the values without a keyword within max_distance are NaN
+                _unique_results_dict[distance_column_label] = pandas.Series(
+                    [match[1] if match is not None else None for match in _matches], dtype=float)
+
+            return _unique_results_dict
+
+    def _fuzzy_matching_results(self, target_column_label=None, reference_keywords_list=None, results_column_label=None, max_distance=None, matched_keywords_column_label=None, distance_column_label=None, ignore_case=False, results_cache=None):
+        ''' Match the targetted values Series to the nearest keyword of a given list and return the results aligned to the rows of the dataframe.
+
+        Args: 
+            target_column_label: The name of the column to be analysed.
+            reference_keywords_list: The list of keywords.
+            results_column_label: The name of the column populated with the result of the matching process.
+            max_distance: The maximum Levenshtein distance between a value and its keyword.
+            matched_keywords_column_label: If provided, the name of the column populated with the nearest keyword.
+            distance_column_label: If provided, the name of the column populated with the distance of the nearest keyword.
+            ignore_case: If True, the values are matched regardless of the case.
+            results_cache: An optional ResultsCache, which provides the results of the values already matched.
+        Raises: 
+            AttributeError: If any of the attribute is not provided. 
+        Returns:
+            A dictionary with the label and the values, aligned to the rows, of each results column.
+        '''
+
+        if all(element is not None for element in [target_column_label, reference_keywords_list, results_column_label]):
+
+            _operation_key = _fuzzy_matching_operation_key(reference_keywords_list, results_column_label, max_distance, matched_keywords_column_label,
+                                                           distance_column_label, ignore_case) if results_cache is not None else None
+
+            return map_unique_values(self._dataframe_obj, [target_column_label], lambda unique_values_df: self._fuzzy_match_unique_values(
+                unique_values_df[target_column_label], reference_keywords_list, results_column_label, max_distance, matched_keywords_column_label, distance_column_label, ignore_case),
+                results_cache, _operation_key)
+
+        else:
+
+            raise AttributeError(
+                'Missing attributes for method fuzzy_match_rows_to_keywords (KeywordsMatcher).')
+
+    def bulk_data_matching(self, keywords_parameters_dicts, executor=None, results_cache=None):
         '''For each dictionary of keyword arguments, run in parallel the rows-keywords matching function. 
 
         Args: 
             keywords_parameters_dicts: A list of dictionaries containing the parameters to be passed to the the match_rows_to_keyword function. 
+            executor: An optional SharedMemoryExecutor used to run the matching operations. If not provided, a default one is used.
+            results_cache: An optional ResultsCache or PersistentResultsCache, which provides the results of the values already processed.
         Raises: 
             None
         Returns:
             The processed Pandas dataframe with new columns containing the global (i.e. from all the processes) results of the matching operations.  
         '''
 
-        from functools import partial
-        from rosetta.parallel.parallel_easy import imap_easy
+        _executor = executor if executor is not None else SharedMemoryExecutor()
+
+        _input_columns_labels = [parameters.get('target_column_label')
+                                 for parameters in keywords_parameters_dicts]
+
+        self._dataframe_obj = _executor.run(
+            self._dataframe_obj, 'dc_matching', '_matching_results', keywords_parameters_dicts, _input_columns_labels, results_cache)
+
+        return self._dataframe_obj
 
-        _list_length = len(keywords_parameters_dicts)
+    def bulk_fuzzy_data_matching(self, keywords_parameters_dicts, executor=None, results_cache=None):
+        '''For each dictionary of keyword arguments, run in parallel the fuzzy_match_rows_to_keywords function. 
 
-        _data_matching_partial_func = partial(
-            self._data_matching_iterator, keywords_parameters_dicts)
+        Args: 
+            keywords_parameters_dicts: A list of dictionaries containing the parameters to be passed to the fuzzy_match_rows_to_keywords function. 
+            executor: An optional SharedMemoryExecutor used to run the matching operations. If not provided, a default one is used.
+            results_cache: An optional ResultsCache or PersistentResultsCache, which provides the results of the values already processed.
+        Raises: 
+            None
+        Returns:
+            The processed Pandas dataframe with new columns containing the results of the fuzzy matching operations.  
+        '''
 
-        _results_iterator = imap_easy(
-            _data_matching_partial_func, range(_list_length), -1, 10000)
+        _executor = executor if executor is not None else SharedMemoryExecutor()
 
-        for result in _results_iterator:
+        _input_columns_labels = [parameters.get('target_column_label')
+                                 for parameters in keywords_parameters_dicts]
 
-            self._dataframe_obj = result
+        self._dataframe_obj = _executor.run(
+            self._dataframe_obj, 'dc_matching', '_fuzzy_matching_results', keywords_parameters_dicts, _input_columns_labels, results_cache)
 
         return self._dataframe_obj
 
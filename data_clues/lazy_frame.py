@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
+
+__all__ = ['LazyFrame']
+
+from data_clues.pipeline import Pipeline, _RESULTS_PARAMETERS
+
+# For each kind of operation, the parameters naming its input columns
+_INPUT_PARAMETERS = {
+    'matching': ('target_column_label',),
+    'similarity': ('target_column_a_label', 'target_column_b_label'),
+    'occurrences': ('target_column_label',),
+    'fuzzy_matching': ('target_column_label',),
+}
+
+
+# Registered as the dc_lazy accessor by data_clues/__init__.py, and imported on its first use
+class LazyFrame(object):
+    ''' Record the matching, similarity and occurrences operations of a dataframe into a plan, run only by collect.
+
+    The operations are recorded through the same dc_matching, dc_similarity and dc_occurrences methods of the dataframe,
+    e.g. target_df.dc_lazy.dc_matching.bulk_data_matching(...).dc_similarity.bulk_check_similarity(...).collect().
+    At collect, the operations whose results are not requested are dropped, only the columns needed are copied, the
+    operations reading the same columns share their unique values (see Pipeline) and all the results are attached at once.
+
+    Attributes:
+        pandas_obj: A Pandas object containing the data to be processed.
+    '''
+
+    def __init__(self, pandas_obj):
+
+        self._dataframe_obj = pandas_obj
+
+        # The operations, as tuples of kind and parameters, in the order they were recorded
+        self._operations = []
+
+        self.dc_matching = _LazyKeywordsMatcher(self)
+        self.dc_similarity = _LazySimilarityChecker(self)
+        self.dc_occurrences = _LazyOccurrencesAnalyzer(self)
+
+    def _record(self, kind, parameters):
+        ''' Add an operation to the plan. An operation writing the same results columns as a previous one replaces it.
+
+        Args:
+            kind: The kind of operation, i.e. matching, similarity or occurrences.
+            parameters: A dictionary with the parameters of the operation.
+        Raises:
+            AttributeError: If the input or the results columns of the operation are not provided.
+        Returns:
+            The LazyFrame, so that the operations can be chained.
+        '''
+
+        if not all(parameters.get(name) is not None for name in _INPUT_PARAMETERS[kind] + ('results_column_label',)):
+
+            raise AttributeError(
+                f'Missing attributes for the {kind} operation (LazyFrame).')
+
+        _results_labels = self._results_labels(parameters)
+
+        # As assigning a column twice would do, the last operation writing a results column wins
+        self._operations = [(recorded_kind, recorded_parameters) for recorded_kind, recorded_parameters in self._operations
+                            if not _results_labels & self._results_labels(recorded_parameters)]
+
+        self._operations.append((kind, dict(parameters)))
+
+        return self
+
+    @staticmethod
+    def _results_labels(parameters):
+        ''' Collect the labels of the results columns of an operation.
+
+        Args:
+            parameters: A dictionary with the parameters of the operation.
+        Raises:
+            None
+        Returns:
+            A set with the labels.
+        '''
+
+        return {parameters[name] for name in _RESULTS_PARAMETERS if parameters.get(name) is not None}
+
+    def plan(self, columns=None):
+        ''' Optimise the recorded operations: drop the ones whose results are not needed and order the others in levels.
+
+        Args:
+            columns: The labels of the columns to be returned by collect. If not provided, all the columns are.
+        Raises:
+            None
+        Returns:
+            A tuple with the list of levels, each one a list of operations which do not depend on each other, and
+            the labels of the columns of the dataframe read by them or requested.
+        '''
+
+        # Visit the operations backwards, keeping only the ones producing requested columns or the inputs of kept operations
+        _needed_labels = set(columns) if columns is not None else None
+        _kept_operations = []
+
+        for kind, parameters in reversed(self._operations):
+
+            if _needed_labels is not None and not self._results_labels(parameters) & _needed_labels:
+                continue
+
+            _kept_operations.insert(0, (kind, parameters))
+
+            if _needed_labels is not None:
+                _needed_labels.update(parameters[name]
+                                      for name in _INPUT_PARAMETERS[kind])
+
+        # An operation reading the results of another one runs in a later level
+        _producers_levels = {}
+        _levels = []
+
+        for kind, parameters in _kept_operations:
+
+            _level = max([_producers_levels[parameters[name]] + 1 for name in _INPUT_PARAMETERS[kind]
+                          if parameters[name] in _producers_levels], default=0)
+
+            for label in self._results_labels(parameters):
+                _producers_levels[label] = _level
+
+            if _level == len(_levels):
+                _levels.append([])
+
+            _levels[_level].append((kind, parameters))
+
+        _source_labels = [label for label in self._dataframe_obj.columns
+                          if _needed_labels is None or label in _needed_labels]
+
+        return _levels, _source_labels
+
+    def collect(self, columns=None, workers=None, serial_threshold=None, results_cache=None):
+        ''' Run the recorded operations in one pass and attach all their results at once.
+
+        Args:
+            columns: The labels of the columns to be returned. If not provided, all the columns of the dataframe and
+                all the results columns are returned.
+            workers: The number of worker processes, see Pipeline.
+            serial_threshold: The minimum number of unique values for which worker processes are used, see Pipeline.
+            results_cache: An optional ResultsCache or PersistentResultsCache, see Pipeline.
+        Raises:
+            None
+        Returns:
+            A new dataframe with the requested columns.
+        '''
+
+        _levels, _source_labels = self.plan(columns)
+
+        # Only the columns read or requested are copied
+        _target_df = self._dataframe_obj[_source_labels] if len(
+            _source_labels) < len(self._dataframe_obj.columns) else self._dataframe_obj
+
+        for operations in _levels:
+
+            _pipeline = Pipeline(
+                workers=workers, serial_threshold=serial_threshold, results_cache=results_cache)
+
+            # The operations differing only in the labels of their results are run once, and their results copied
+            _distinct_operations = {}
+            _copied_labels = {}
+
+            for kind, parameters in operations:
+
+                _operation_signature = (kind, repr(sorted((name, value) for name, value in parameters.items() if name not in _RESULTS_PARAMETERS)),
+                                        tuple(parameters.get(name) is None for name in _RESULTS_PARAMETERS[1:]))
+
+                _distinct_parameters = _distinct_operations.get(
+                    _operation_signature)
+
+                if _distinct_parameters is None:
+
+                    _distinct_operations[_operation_signature] = parameters
+
+                    getattr(_pipeline, 'add_' + kind)(**parameters)
+
+                else:
+
+                    for name in _RESULTS_PARAMETERS:
+
+                        if parameters.get(name) is not None:
+                            _copied_labels[parameters[name]] = _distinct_parameters[name]
+
+            _target_df = _pipeline.run(_target_df)
+
+            if _copied_labels:
+                _target_df = _target_df.assign(**{label: _target_df[distinct_label]
+                                                  for label, distinct_label in _copied_labels.items()})
+
+        if columns is not None:
+            return _target_df[list(columns)]
+
+        # The results columns are in the order the operations were recorded, as if they were run eagerly
+        _ordered_labels = list(self._dataframe_obj.columns)
+
+        for _, parameters in self._operations:
+
+            _ordered_labels.extend(parameters[name] for name in _RESULTS_PARAMETERS
+                                   if parameters.get(name) is not None and parameters[name] not in _ordered_labels)
+
+        return _target_df[_ordered_labels]
+
+
+class _LazyKeywordsMatcher(object):
+    ''' Record the operations of the dc_matching accessor into the plan of a LazyFrame.
+
+    Attributes:
+        lazy_frame: The LazyFrame recording the operations.
+    '''
+
+    def __init__(self, lazy_frame):
+
+        self._lazy_frame = lazy_frame
+
+    def match_rows_to_keywords(self, target_column_label=None, reference_keywords_list=None, results_column_label=None, engine=None, matched_keywords_column_label=None, match_mode=None, ignore_case=False):
+        ''' Record a matching operation, see KeywordsMatcher.match_rows_to_keywords. '''
+
+        return self._lazy_frame._record('matching', {'target_column_label': target_column_label, 'reference_keywords_list': reference_keywords_list,
+                                                     'results_column_label': results_column_label, 'engine': engine, 'matched_keywords_column_label': matched_keywords_column_label,
+                                                     'match_mode': match_mode, 'ignore_case': ignore_case})
+
+    def bulk_data_matching(self, keywords_parameters_dicts):
+        ''' Record a list of matching operations, see KeywordsMatcher.bulk_data_matching. '''
+
+        for parameters in keywords_parameters_dicts:
+            self.match_rows_to_keywords(**parameters)
+
+        return self._lazy_frame
+
+    def fuzzy_match_rows_to_keywords(self, target_column_label=None, reference_keywords_list=None, results_column_label=None, max_distance=None, matched_keywords_column_label=None, distance_column_label=None, ignore_case=False):
+        ''' Record a fuzzy matching operation, see KeywordsMatcher.fuzzy_match_rows_to_keywords. '''
+
+        return self._lazy_frame._record('fuzzy_matching', {'target_column_label': target_column_label, 'reference_keywords_list': reference_keywords_list,
+                                                           'results_column_label': results_column_label, 'max_distance': max_distance,
+                                                           'matched_keywords_column_label': matched_keywords_column_label,
+                                                           'distance_column_label': distance_column_label, 'ignore_case': ignore_case})
+
+    def bulk_fuzzy_data_matching(self, keywords_parameters_dicts):
+        ''' Record a list of fuzzy matching operations, see KeywordsMatcher.bulk_fuzzy_data_matching. '''
+
+        for parameters in keywords_parameters_dicts:
+            self.fuzzy_match_rows_to_keywords(**parameters)
+
+        return self._lazy_frame
+
+
+class _LazySimilarityChecker(object):
+    ''' Record the operations of the dc_similarity accessor into the plan of a LazyFrame.
+
+    Attributes:
+        lazy_frame: The LazyFrame recording the operations.
+    '''
+
+    def __init__(self, lazy_frame):
+
+        self._lazy_frame = lazy_frame
+
+    def check_similarity(self, target_column_a_label=None, target_column_b_label=None, results_column_label=None, min_ratio=None):
+        ''' Record a similarity check, see SimilarityChecker.check_similarity. '''
+
+        return self._lazy_frame._record('similarity', {'target_column_a_label': target_column_a_label, 'target_column_b_label': target_column_b_label,
+                                                       'results_column_label': results_column_label, 'min_ratio': min_ratio})
+
+    def bulk_check_similarity(self, similarity_parameters_dicts):
+        ''' Record a list of similarity checks, see SimilarityChecker.bulk_check_similarity. '''
+
+        for parameters in similarity_parameters_dicts:
+            self.check_similarity(**parameters)
+
+        return self._lazy_frame
+
+
+class _LazyOccurrencesAnalyzer(object):
+    ''' Record the operations of the dc_occurrences accessor into the plan of a LazyFrame.
+
+    Attributes:
+        lazy_frame: The LazyFrame recording the operations.
+    '''
+
+    def __init__(self, lazy_frame):
+
+        self._lazy_frame = lazy_frame
+
+    def _character_occurrences_analysis(self, target_column_label=None, custom_factors=None, results_column_label=None):
+        ''' Record a character occurrences analysis, see CharacterOccurrencesAnalyzer._character_occurrences_analysis. '''
+
+        return self._lazy_frame._record('occurrences', {'target_column_label': target_column_label, 'custom_factors': custom_factors,
+                                                        'results_column_label': results_column_label})
+
+    def bulk_character_occurrences_analysis(self, occurrences_parameters_dicts):
+        ''' Record a list of character occurrences analyses, see CharacterOccurrencesAnalyzer.bulk_character_occurrences_analysis. '''
+
+        for parameters in occurrences_parameters_dicts:
+            self._character_occurrences_analysis(**parameters)
+
+        return self._lazy_frame
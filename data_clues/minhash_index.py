@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
+
+__all__ = ['MinHashIndex']
+
+import numpy
+import pandas
+
+# The characters padding the beginning and the end of the values, so that short values have n-grams too
+_START_PADDING = '\x02'
+_END_PADDING = '\x03'
+
+# The Mersenne prime used by the universal hash functions of the MinHash signatures
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+class MinHashIndex:
+    ''' Find the pairs of similar values in a list, blocking them with MinHash signatures of their n-grams (LSH).
+
+    The signature of each value is split in bands: only the values sharing all the hashes of at least one band are
+    compared with the Levenshtein ratio. Near-duplicates share most of their n-grams, so they are very likely to collide
+    in one band, while unrelated values rarely do. The number of comparisons therefore grows roughly linearly with the
+    number of values, at the cost of a small probability of missing a similar pair.
+
+    Attributes:
+        values: The list of (unique) values to be indexed.
+        ngram_size: The number of characters of each n-gram. If not provided, 2 is used.
+        bands: The number of bands of the signatures. If not provided, 32 is used.
+        rows: The number of hashes of each band. If not provided, 4 is used.
+        max_bucket_size: The maximum number of values sharing a band for them to be compared. Larger buckets, made
+            of values with very common n-grams, are skipped. If not provided, 100 is used.
+        seed: The seed of the hash functions. If not provided, 0 is used.
+    '''
+
+    def __init__(self, values, ngram_size=None, bands=None, rows=None, max_bucket_size=None, seed=None):
+
+        self._values = [str(value) for value in values]
+        self._ngram_size = ngram_size if ngram_size is not None else 2
+        self._bands = bands if bands is not None else 32
+        self._rows = rows if rows is not None else 4
+        self._max_bucket_size = max_bucket_size if max_bucket_size is not None else 100
+
+        _random_state = numpy.random.default_rng(seed if seed is not None else 0)
+
+        _hashes_count = self._bands * self._rows
+
+        self._hash_multipliers = _random_state.integers(
+            1, _MERSENNE_PRIME, size=_hashes_count, dtype=numpy.int64)
+        self._hash_increments = _random_state.integers(
+            0, _MERSENNE_PRIME, size=_hashes_count, dtype=numpy.int64)
+
+        self._signatures = self._minhash_signatures()
+
+    def _value_ngrams(self, value):
+        ''' Split a value in its set of padded n-grams.
+
+        Args:
+            value: The string to be split.
+        Raises:
+            None
+        Returns:
+            A set with the n-grams of the value.
+        '''
+
+        _padded_value = _START_PADDING * (self._ngram_size - 1) + \
+            value + _END_PADDING * (self._ngram_size - 1)
+
+        return {_padded_value[start:start + self._ngram_size] for start in range(len(_padded_value) - self._ngram_size + 1)}
+
+    def _minhash_signatures(self):
+        ''' Compute the MinHash signature of each indexed value.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            A 2D array with a row of bands * rows hashes for each value.
+        '''
+
+        _values_ngrams = [self._value_ngrams(value) for value in self._values]
+
+        _ngrams_counts = numpy.fromiter(
+            map(len, _values_ngrams), dtype=numpy.int64, count=len(_values_ngrams))
+
+        # Encode the n-grams as integers, so that they can be hashed as arrays
+        _ngram_ids, _ = pandas.factorize(numpy.array(
+            [ngram for ngrams in _values_ngrams for ngram in ngrams], dtype=object))
+
+        _ngram_ids = _ngram_ids.astype(numpy.int64)
+
+        _value_starts = numpy.concatenate(([0], numpy.cumsum(_ngrams_counts)[:-1])) if len(
+            _ngrams_counts) else numpy.zeros(0, dtype=numpy.int64)
+
+        _signatures = numpy.empty(
+            (len(self._values), len(self._hash_multipliers)), dtype=numpy.int64)
+
+        # The values without n-grams, e.g. empty with an ngram_size of 1, get a negative signature of their own, which
+        # never shares a band with another value
+        _with_ngrams = _ngrams_counts > 0
+
+        _signatures[~_with_ngrams] = -1 - \
+            numpy.flatnonzero(~_with_ngrams)[:, numpy.newaxis]
+
+        # The n-grams of each value start where the ones of the previous value with n-grams end
+        _value_starts = _value_starts[_with_ngrams]
+
+        for hash_position, (multiplier, increment) in enumerate(zip(self._hash_multipliers, self._hash_increments)):
+
+            _hashes = (multiplier * _ngram_ids + increment) % _MERSENNE_PRIME
+
+            if len(_value_starts):
+                _signatures[_with_ngrams, hash_position] = numpy.minimum.reduceat(
+                    _hashes, _value_starts)
+
+        return _signatures
+
+    def _candidate_pairs(self):
+        ''' Collect the pairs of values sharing all the hashes of at least one band.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            A tuple with the arrays of the first and the second position of each candidate pair.
+        '''
+
+        _pairs_codes = []
+
+        for band in range(self._bands):
+
+            _band_signatures = self._signatures[:,
+                                                band * self._rows:(band + 1) * self._rows]
+
+            _bucket_codes = pandas.util.hash_pandas_object(
+                pandas.DataFrame(_band_signatures), index=False).to_numpy()
+
+            _order = numpy.argsort(_bucket_codes, kind='stable')
+
+            _sorted_codes = _bucket_codes[_order]
+
+            _bucket_starts = numpy.flatnonzero(numpy.concatenate(
+                ([True], _sorted_codes[1:] != _sorted_codes[:-1])))
+            _bucket_sizes = numpy.diff(numpy.append(_bucket_starts, len(_order)))
+
+            # Most buckets hold a single pair, so they are collected at once
+            _pair_bucket_starts = _bucket_starts[_bucket_sizes == 2]
+
+            _pair_positions = numpy.sort(numpy.stack(
+                (_order[_pair_bucket_starts], _order[_pair_bucket_starts + 1])), axis=0)
+
+            _pairs_codes.append(
+                _pair_positions[0] * len(self._values) + _pair_positions[1])
+
+            _large_buckets = (_bucket_sizes > 2) & (
+                _bucket_sizes <= self._max_bucket_size)
+
+            for bucket_start, bucket_size in zip(_bucket_starts[_large_buckets].tolist(), _bucket_sizes[_large_buckets].tolist()):
+
+                _bucket_positions = numpy.sort(
+                    _order[bucket_start:bucket_start + bucket_size])
+
+                _first_positions, _second_positions = numpy.triu_indices(
+                    bucket_size, k=1)
+
+                _pairs_codes.append(_bucket_positions[_first_positions] * len(
+                    self._values) + _bucket_positions[_second_positions])
+
+        _pairs_codes = numpy.unique(numpy.concatenate(_pairs_codes)) if _pairs_codes else numpy.zeros(
+            0, dtype=numpy.int64)
+
+        return _pairs_codes // len(self._values), _pairs_codes % len(self._values)
+
+    def similar_pairs(self, min_ratio=None):
+        ''' Find the pairs of indexed values whose Levenshtein ratio is at least min_ratio.
+
+        Args:
+            min_ratio: The similarity threshold, between 0 and 1. If not provided, 0.8 is used.
+        Raises:
+            None
+        Returns:
+            A list of tuples with the positions of the two values and their similarity ratio.
+        '''
+
+        import Levenshtein
+
+        _min_ratio = min_ratio if min_ratio is not None else 0.8
+
+        _first_positions, _second_positions = self._candidate_pairs()
+
+        _lengths = numpy.fromiter(
+            map(len, self._values), dtype=numpy.int64, count=len(self._values))
+
+        _first_lengths = _lengths[_first_positions]
+        _second_lengths = _lengths[_second_positions]
+
+        # The ratio cannot exceed 2 * min(len_a, len_b) / (len_a + len_b), given the difference in length
+        _reachable = 2 * numpy.minimum(_first_lengths, _second_lengths) >= _min_ratio * \
+            (_first_lengths + _second_lengths)
+
+        _similar_pairs = []
+
+        for position_a, position_b in zip(_first_positions[_reachable].tolist(), _second_positions[_reachable].tolist()):
+
+            _ratio = Levenshtein.ratio(
+                self._values[position_a], self._values[position_b])
+
+            if _ratio >= _min_ratio:
+                _similar_pairs.append((position_a, position_b, _ratio))
+
+        return _similar_pairs
+
+    def clusters(self, similar_pairs):
+        ''' Group the indexed values connected by similar pairs, i.e. the connected components of the pairs.
+
+        Args:
+            similar_pairs: The list of similar pairs, as returned by similar_pairs.
+        Raises:
+            None
+        Returns:
+            A list with the cluster of each indexed value, identified by the position of its first value.
+            Values without any similar value have a cluster of -1.
+        '''
+
+        _parents = list(range(len(self._values)))
+
+        def _root(position):
+
+            while _parents[position] != position:
+                _parents[position] = _parents[_parents[position]]
+                position = _parents[position]
+
+            return position
+
+        for position_a, position_b, _ in similar_pairs:
+
+            _root_a, _root_b = _root(position_a), _root(position_b)
+
+            # The smallest position is always the root, so it identifies the cluster
+            if _root_a != _root_b:
+                _parents[max(_root_a, _root_b)] = min(_root_a, _root_b)
+
+        _paired_positions = {position for pair in similar_pairs for position in pair[:2]}
+
+        return [_root(position) if position in _paired_positions else -1 for position in range(len(self._values))]
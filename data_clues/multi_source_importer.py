@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
+
+__all__ = ['MultiSourceImporter']
+
+import os
+
+import pandas
+from data_clues.data_importer import DataImporter
+from data_clues.instrumentation import stage
+
+# The number of chunks read ahead of the consumer, for each source
+_PREFETCHED_CHUNKS_COUNT = 2
+
+
+def _is_database_source(source_data):
+    ''' Establish if a source is a database table.
+
+    Args:
+        source_data: A dictionary with the parameters of the DataImporter.
+    Raises:
+        None
+    Returns:
+        True for a database table, False for a file.
+    '''
+
+    return source_data.get('table_name') is not None
+
+
+def _unified_dtypes(target_dfs):
+    ''' Find the data types the columns of different dataframes share once concatenated, e.g. float for int and float.
+
+    Args:
+        target_dfs: The dataframes (or their first chunks).
+    Raises:
+        None
+    Returns:
+        A dictionary with the label and the data type of each column, in the order the columns first appear. The
+        columns categorical in every dataframe are kept categorical.
+    '''
+
+    _empty_dfs = [target_df.iloc[:0] for target_df in target_dfs]
+
+    _dtypes = pandas.concat(_empty_dfs, ignore_index=True).dtypes.to_dict()
+
+    for label in _dtypes:
+
+        if all(label in target_df.columns and isinstance(target_df[label].dtype, pandas.CategoricalDtype) for target_df in target_dfs):
+            _dtypes[label] = 'category'
+
+    return _dtypes
+
+
+def _cast_chunk(target_chunk, dtypes):
+    ''' Cast a chunk to the unified columns and data types.
+
+    The columns are only cast to data types which cannot lose information: a column whose values do not fit the unified
+    data type is cast to the type both share instead, e.g. the int column of a chunk with missing values stays float.
+
+    Args:
+        target_chunk: The Pandas Dataframe to be cast.
+        dtypes: A dictionary with the label and the data type of each column, see _unified_dtypes.
+    Raises:
+        None
+    Returns:
+        The dataframe with all the columns, in the same order, and their data types. The missing columns are empty.
+    '''
+
+    _chunk = target_chunk.reindex(columns=list(dtypes))
+
+    _widened_dtypes = _unified_dtypes([_chunk, pandas.DataFrame(
+        {label: pandas.Series(dtype=dtype) for label, dtype in dtypes.items()})])
+
+    return _chunk.astype({label: dtype for label, dtype in _widened_dtypes.items() if _chunk[label].dtype != dtype and not (
+        dtype == 'category' and isinstance(_chunk[label].dtype, pandas.CategoricalDtype))})
+
+
+class MultiSourceImporter:
+    ''' Import data from several sources at once, e.g. daily CSV shards and database tables, into a single dataframe or stream of chunks.
+
+    The database tables are fetched in a thread each, as their blocking queries mostly wait on the network, while the
+    files are parsed in a pool of threads, in which Pandas and Arrow release the GIL. The dataframes of the different
+    sources are unified, i.e. they have the same columns with the same data types.
+
+    Attributes:
+        sources_data: A list of dictionaries with the parameters of the DataImporter of each source, see SettingsReader.get_sources_data.
+        workers: The number of files parsed at once by get_dataframe. If not provided, the number of available CPUs is used.
+    '''
+
+    def __init__(self, sources_data, workers=None):
+
+        if not sources_data:
+
+            raise AttributeError(
+                'Missing data sources for class MultiSourceImporter.')
+
+        self._sources_data = list(sources_data)
+        self._workers = workers if workers is not None else (
+            os.cpu_count() or 1)
+
+        # The importer of each source, kept to save their watermarks
+        self._data_importers = [None] * len(self._sources_data)
+
+        self._target_df = None
+
+    def _data_importer(self, position):
+        ''' Create the importer of a source, and keep it to save its watermark.
+
+        Args:
+            position: The position of the source.
+        Raises:
+            None
+        Returns:
+            The DataImporter of the source.
+        '''
+
+        with stage('import_source', source=str(position)):
+
+            self._data_importers[position] = DataImporter(
+                **self._sources_data[position])
+
+        return self._data_importers[position]
+
+    def _import_sources(self, function):
+        ''' Create the importer of each source concurrently, and run a function on it.
+
+        Args:
+            function: A function receiving the position of the source and its DataImporter.
+        Raises:
+            None
+        Returns:
+            A list with the value returned by the function for each source, in the order of the sources.
+        '''
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        def _import_source(position):
+
+            return function(position, self._data_importer(position))
+
+        _database_sources_count = sum(_is_database_source(source_data) for source_data in self._sources_data)
+
+        # The database queries wait on the network, so each one gets its own thread, while the files share the workers
+        with ThreadPoolExecutor(max_workers=max(_database_sources_count, 1)) as _database_pool, \
+                ThreadPoolExecutor(max_workers=self._workers) as _files_pool:
+
+            _futures = [(_database_pool if _is_database_source(source_data) else _files_pool).submit(_import_source, position)
+                        for position, source_data in enumerate(self._sources_data)]
+
+            return [future.result() for future in _futures]
+
+    def get_dataframe(self):
+        ''' Return the data of all the sources in a single dataframe, loading them concurrently on the first call.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            The dataframe with the rows of all the sources, in the order of the sources.
+        '''
+
+        if self._target_df is None:
+
+            _target_dfs = self._import_sources(
+                lambda _, data_importer: data_importer.get_dataframe())
+
+            _target_dfs = [target_df for target_df in _target_dfs if target_df is not None]
+
+            _dtypes = _unified_dtypes(_target_dfs)
+
+            # The categories of all the sources are merged, otherwise the concatenated column would not be categorical
+            for label, dtype in _dtypes.items():
+
+                if dtype == 'category':
+
+                    _categories = pandas.api.types.union_categoricals(
+                        [target_df[label].array for target_df in _target_dfs]).categories
+
+                    _target_dfs = [target_df.assign(**{label: target_df[label].cat.set_categories(_categories)})
+                                   for target_df in _target_dfs]
+
+            with stage('unify_sources', sources=len(_target_dfs)):
+
+                self._target_df = pandas.concat(
+                    [_cast_chunk(target_df, _dtypes) for target_df in _target_dfs], ignore_index=True)
+
+        return self._target_df
+
+    def iter_chunks(self, chunk_size=None):
+        ''' Stream the data of all the sources concurrently, in chunks with the same columns and data types.
+
+        Each source is read by its own thread, which only reads its first chunk until the data types are unified and then
+        reads ahead by at most a few chunks, so that at most a few chunks of each source are held in memory. The chunks
+        are yielded as soon as they are available, so the chunks of different sources are interleaved. The data types
+        are the ones shared by the first chunk of each source, widened for the later chunks whose values do not fit them
+        (see _cast_chunk).
+
+        Args:
+            chunk_size: The number of rows of each chunk. If not provided, the chunk_size of each source is used.
+        Raises:
+            AttributeError: If no chunk size is provided.
+            RuntimeError: If the sources stop being read before being exhausted.
+        Returns:
+            A generator of dataframes.
+        '''
+
+        import queue
+        import threading
+
+        _chunks_queue = queue.Queue(maxsize=_PREFETCHED_CHUNKS_COUNT * len(self._sources_data))
+        _stop_event = threading.Event()
+
+        # Set once the data types are unified, i.e. once every source has provided its first chunk or is empty
+        _unified_event = threading.Event()
+
+        # Each source puts its chunks in the queue, then its position once it is exhausted
+        def _put(item):
+
+            while not _stop_event.is_set():
+
+                try:
+                    _chunks_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+
+            return False
+
+        def _read_source(position):
+
+            # The errors raised by the creation of the importer are reported too
+            try:
+
+                for target_chunk in self._data_importer(position).iter_chunks(chunk_size):
+
+                    if not _put((position, target_chunk)):
+                        break
+
+                    # The chunks read before the data types are unified are held by the consumer
+                    while not (_unified_event.wait(0.1) or _stop_event.is_set()):
+                        continue
+
+                    if _stop_event.is_set():
+                        break
+
+                _put((position, None))
+
+            except BaseException as error:
+
+                _put((position, error))
+
+        _readers = [threading.Thread(target=_read_source, args=(position,), daemon=True)
+                    for position in range(len(self._sources_data))]
+
+        for reader in _readers:
+            reader.start()
+
+        _first_chunks = {}
+        _exhausted_positions = set()
+        _pending_chunks = []
+        _dtypes = None
+
+        try:
+
+            while len(_exhausted_positions) < len(self._sources_data):
+
+                try:
+
+                    _position, _item = _chunks_queue.get(timeout=0.1)
+
+                except queue.Empty:
+
+                    # The readers put every outcome in the queue before stopping, so an empty queue means they failed
+                    if not any(reader.is_alive() for reader in _readers) and _chunks_queue.empty():
+
+                        raise RuntimeError(
+                            'The data sources stopped being read before being exhausted (MultiSourceImporter).')
+
+                    continue
+
+                if isinstance(_item, BaseException):
+                    raise _item
+
+                if _item is None:
+                    _exhausted_positions.add(_position)
+                else:
+                    _first_chunks.setdefault(_position, _item)
+                    _pending_chunks.append(_item)
+
+                # The data types are unified once every source has provided its first chunk, or is empty
+                if _dtypes is None and len(_first_chunks.keys() | _exhausted_positions) == len(self._sources_data):
+                    _dtypes = _unified_dtypes(list(_first_chunks.values()))
+                    _unified_event.set()
+
+                if _dtypes is not None:
+
+                    for target_chunk in _pending_chunks:
+                        yield _cast_chunk(target_chunk, _dtypes)
+
+                    _pending_chunks = []
+
+        finally:
+
+            _stop_event.set()
+
+            for reader in _readers:
+                reader.join()
+
+    def get_watermark(self):
+        ''' Return the watermarks reached by the sources imported incrementally.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            A list with the watermark of each source, None for the sources not imported yet.
+        '''
+
+        return [data_importer.get_watermark() if data_importer is not None else None
+                for data_importer in self._data_importers]
+
+    def save_watermark(self):
+        ''' Save the watermark of each source imported incrementally, once their rows have been processed.
+
+        The sources without a watermark_file, e.g. a database table imported in full along with incremental CSV shards,
+        are skipped.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            None
+        '''
+
+        for data_importer, source_data in zip(self._data_importers, self._sources_data):
+
+            if data_importer is not None and source_data.get('watermark_file') is not None:
+                data_importer.save_watermark()
@@ -3,11 +3,33 @@
 
 __all__ = ['CharacterOccurrencesAnalyzer']
 
-import pandas
-from data_clues.utilities import basic_unique_values
+import numpy
+from data_clues.utilities import map_unique_values, count_character_types, _string_value
+from data_clues.instrumentation import stage
+from data_clues.results_cache import operation_key
+from data_clues.parallel_executor import SharedMemoryExecutor
+
+
+def _occurrences_operation_key(results_column_label, custom_factors=None):
+    ''' Build the key of the cached results of a character occurrences analysis, the same for the accessor and the Pipeline.
+
+    The key depends on the resolved weighting factors, so that the default factors and the same custom ones share their results.
+
+    Args:
+        results_column_label: The name of the column populated with the results of the analysis.
+        custom_factors: An optional array containing numerical custom weights for the different character types,
+            as [word_factor, digit_factor, sign_factor].
+    Raises:
+        None
+    Returns:
+        The operation key, see operation_key.
+    '''
+
+    return operation_key('dc_occurrences', weighting_factors=CharacterOccurrencesAnalyzer(None)._weighting_factors(custom_factors),
+                         results_column_label=results_column_label)
 
 
-@pandas.api.extensions.register_dataframe_accessor("dc_occurrences")
+# Registered as the dc_occurrences accessor by data_clues/__init__.py, and imported on its first use
 class CharacterOccurrencesAnalyzer(object):
     ''' Provide a numerical weighted description of the different character types (word, digit, sign) for given Series in the Dataframe.
 
@@ -29,22 +51,25 @@ class CharacterOccurrencesAnalyzer(object):
         self._digit_factor = digit_factor if digit_factor is not None else 1
         self._sign_factor = sign_factor if sign_factor is not None else 2
 
-    def _character_occurrences_ratio(self, target_string=None, custom_factors=None):
-        ''' Calculate the occurrence ratio for a given string.
+    def _weighting_factors(self, custom_factors=None):
+        ''' Resolve the weighting factors of the character types, giving precedence to the custom ones.
 
         Args:
-            target_string: The string to be analysed.
             custom_factors: If provided, an array containing custom weighting factors for each character type,
-                as [word_factor, digit factor, sign factor].
+                as [word_factor, digit factor, sign factor]. Factors set to None fall back to the default ones, as
+                the digit and sign factors do for now (see the TODO below).
         Raises:
             None
         Returns:
-            A floating point number, which represents the character occurrences ratio. 
+            A tuple with the word, digit and sign factors.
         '''
 
         # Words (a-Z)
         _word_factor = custom_factors[0] if custom_factors is not None and custom_factors[0] is not None else self._word_factor
 
+        # TODO: the chained comparisons below are always False, so the custom digit and sign factors are never applied.
+        # Fixing them changes the ratios computed with custom_factors, hence it is left to a separate change.
+
         # Digits (0-9)
         _digit_factor = custom_factors[1] if custom_factors is not None and custom_factors[
             1] is not None is not None else self._digit_factor
@@ -53,21 +78,78 @@ class CharacterOccurrencesAnalyzer(object):
         _sign_factor = custom_factors[2] if custom_factors is not None and custom_factors[
             2] is not None is not None else self._sign_factor
 
-        _digit_characters_count = len(
-            list(filter(lambda character: character.isdigit(), str(target_string))))
-        _word_characters_count = len(
-            list(filter(lambda character: character.isalpha(), str(target_string))))
+        return _word_factor, _digit_factor, _sign_factor
+
+    def _character_occurrences_ratio(self, target_string=None, custom_factors=None):
+        ''' Calculate the occurrence ratio for a given string.
+
+        A missing value, or an empty string, has a ratio of 0, as in _character_occurrences_ratios.
+
+        Args:
+            target_string: The string to be analysed.
+            custom_factors: If provided, an array containing custom weighting factors for each character type,
+                as [word_factor, digit factor, sign factor].
+        Raises:
+            None
+        Returns:
+            A floating point number, which represents the character occurrences ratio. 
+        '''
+
+        _target_string = _string_value(target_string)
+
+        if not _target_string:
+            return 0.0
+
+        _word_factor, _digit_factor, _sign_factor = self._weighting_factors(
+            custom_factors)
+
+        _digit_characters_count = sum(map(str.isdigit, _target_string))
+        _word_characters_count = sum(map(str.isalpha, _target_string))
         _other_characters_count = len(
-            target_string) - _digit_characters_count - _word_characters_count
+            _target_string) - _digit_characters_count - _word_characters_count
 
-        total_characters_count = len(list(target_string))
+        total_characters_count = len(_target_string)
 
         occurrence_ratio = ((1 - (1 / _sign_factor)) + (_word_factor * _word_characters_count) + (_digit_characters_count**(
             1 - (_digit_factor * _digit_characters_count))) + ((1 / _sign_factor) * _other_characters_count)) / total_characters_count
 
         return float(occurrence_ratio)
 
-    def _character_occurrences_analysis(self, target_column_label=None, custom_factors=None, results_column_label=None):
+    def _character_occurrences_ratios(self, target_strings, custom_factors=None):
+        ''' Calculate the occurrence ratio for an array of strings at once, with the same formula as _character_occurrences_ratio.
+
+        Missing values, and empty strings, have a ratio of 0.
+
+        Args:
+            target_strings: The strings to be analysed.
+            custom_factors: If provided, an array containing custom weighting factors for each character type,
+                as [word_factor, digit factor, sign factor].
+        Raises:
+            None
+        Returns:
+            An array of floating point numbers, which represent the character occurrences ratios. 
+        '''
+
+        _word_factor, _digit_factor, _sign_factor = self._weighting_factors(
+            custom_factors)
+
+        _word_characters_count, _digit_characters_count, _total_characters_count = count_character_types(
+            target_strings)
+
+        _other_characters_count = _total_characters_count - \
+            _digit_characters_count - _word_characters_count
+
+        # Digit counts are raised to a negative power, which NumPy only allows for floating point numbers
+        _digit_characters_count = _digit_characters_count.astype(numpy.float64)
+
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+
+            _occurrence_ratios = ((1 - (1 / _sign_factor)) + (_word_factor * _word_characters_count) + (_digit_characters_count**(
+                1 - (_digit_factor * _digit_characters_count))) + ((1 / _sign_factor) * _other_characters_count)) / _total_characters_count
+
+        return numpy.where(_total_characters_count > 0, _occurrence_ratios, 0.0)
+
+    def _character_occurrences_analysis(self, target_column_label=None, custom_factors=None, results_column_label=None, results_cache=None):
         ''' Measure the occurrence ratio of each element in a given Series and append the results in a new Series in the target_df.
 
         Args: 
@@ -75,59 +157,76 @@ class CharacterOccurrencesAnalyzer(object):
             custom_factors: An optional array containing numerical custom weights for the different character types, 
                 as [word_factor, digit_factor, sign_factor].
             results_column_label: The name of the new column populated with the results of the analysis.
+            results_cache: An optional ResultsCache, which provides the ratio of the values already analysed 
+                (e.g. in previous chunks of data) and stores the new ones.
         Raises: 
             AttributeError: If any of the attribute is not provided. 
         Returns:
             None
         '''
 
-        if all(element is not None for element in [target_column_label, results_column_label]):
+        self._dataframe_obj = self._dataframe_obj.assign(**self._occurrences_results(
+            target_column_label, custom_factors, results_column_label, results_cache))
 
-            # Collect all the unique values in an array and store them in a new DataFrame
-            _unique_values = pandas.Series(basic_unique_values(
-                self._dataframe_obj[target_column_label]))
+    def _analyse_unique_values(self, unique_values, custom_factors=None, results_column_label=None):
+        ''' Measure the occurrence ratio of the unique values of a given Series.
 
-            _occurrence_results_series = _unique_values.apply(
-                lambda row: self._character_occurrences_ratio(row, custom_factors) if row is not None else 0)
+        Args: 
+            unique_values: The unique values to be analysed.
+            custom_factors: An optional array containing numerical custom weights for the different character types, 
+                as [word_factor, digit_factor, sign_factor].
+            results_column_label: The name of the column populated with the results of the analysis.
+        Raises: 
+            None
+        Returns:
+            A dictionary with the results_column_label and the occurrence ratio of the unique values.
+        '''
 
-            _unique_values_df = pandas.DataFrame({
-                target_column_label: _unique_values,
-                results_column_label: _occurrence_results_series
-            })
+        with stage('occurrences', results_column_label=results_column_label) as _stage:
 
-            self._dataframe_obj = self._dataframe_obj.merge(
-                _unique_values_df, how='outer', on=target_column_label)
+            _stage.record(unique_values=len(unique_values))
 
-        else:
+            return {results_column_label: self._character_occurrences_ratios(unique_values, custom_factors)}
 
-            raise AttributeError(
-                'Missing attributes for _character_occurrences_analysis (CharacterOccurrencesAnalyzer).')
+    def _occurrences_results(self, target_column_label=None, custom_factors=None, results_column_label=None, results_cache=None):
+        ''' Measure the occurrence ratio of each element in a given Series and return it aligned to the rows of the dataframe.
 
-    def _character_occurrences_iterator(self, occurrences_parameters_dicts, index):
-        ''' Run the types occurrences analysis concurrently, with each process responsible for a 
-            occurrences_parameters_dicts dictionary (identified by the index).
+        The ratio is measured once for each unique value, and the results are expanded to the rows through their codes.
 
         Args: 
-            occurrences_parameters_dicts: A list of dictionaries containing the parameters to be passed to the 
-                the _character_occurrences_analysis function.
-            index: The element in the target_column_labels to be used.
+            target_column_label: The name of the column to be analysed.
+            custom_factors: An optional array containing numerical custom weights for the different character types, 
+                as [word_factor, digit_factor, sign_factor].
+            results_column_label: The name of the column populated with the results of the analysis.
+            results_cache: An optional ResultsCache, which provides the ratio of the values already analysed.
         Raises: 
-            None
+            AttributeError: If any of the attribute is not provided. 
         Returns:
-            The processed dataframe with a new column containing the result of the character occurrences analysis. 
+            A dictionary with the results_column_label and an array with the occurrence ratio of each row.
         '''
 
-        self._character_occurrences_analysis(
-            **occurrences_parameters_dicts[index])
+        if all(element is not None for element in [target_column_label, results_column_label]):
+
+            _operation_key = _occurrences_operation_key(
+                results_column_label, custom_factors) if results_cache is not None else None
 
-        return self._dataframe_obj
+            return map_unique_values(self._dataframe_obj, [target_column_label], lambda unique_values_df: self._analyse_unique_values(
+                unique_values_df[target_column_label], custom_factors, results_column_label),
+                results_cache, _operation_key)
 
-    def bulk_character_occurrences_analysis(self, occurrences_parameters_dicts):
+        else:
+
+            raise AttributeError(
+                'Missing attributes for _character_occurrences_analysis (CharacterOccurrencesAnalyzer).')
+
+    def bulk_character_occurrences_analysis(self, occurrences_parameters_dicts, executor=None, results_cache=None):
         '''For each dictionary of keyword arguments, run in parallel the _character_occurrences_analysis function. 
 
         Args: 
             occurrences_parameters_dicts: A list of dictionaries containing the parameters to be passed to the
                 the _character_occurrences_analysis. 
+            executor: An optional SharedMemoryExecutor used to run the analyses. If not provided, a default one is used.
+            results_cache: An optional ResultsCache or PersistentResultsCache, which provides the results of the values already processed.
         Raises: 
             None
         Returns:
@@ -135,20 +234,13 @@ class CharacterOccurrencesAnalyzer(object):
             results of the character occurrences analysis.  
         '''
 
-        from functools import partial
-        from rosetta.parallel.parallel_easy import imap_easy
-
-        _list_length = len(occurrences_parameters_dicts)
-
-        _character_occurrences_partial_func = partial(
-            self._character_occurrences_iterator, occurrences_parameters_dicts)
-
-        _results_iterator = imap_easy(
-            _character_occurrences_partial_func, range(_list_length), -1, 10000)
+        _executor = executor if executor is not None else SharedMemoryExecutor()
 
-        for result in _results_iterator:
+        _input_columns_labels = [parameters.get('target_column_label')
+                                 for parameters in occurrences_parameters_dicts]
 
-            self._dataframe_obj = result
+        self._dataframe_obj = _executor.run(
+            self._dataframe_obj, 'dc_occurrences', '_occurrences_results', occurrences_parameters_dicts, _input_columns_labels, results_cache)
 
         return self._dataframe_obj
 
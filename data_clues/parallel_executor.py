@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
+
+__all__ = ['SharedMemoryExecutor']
+
+import os
+
+from data_clues.instrumentation import stage, _submit_measured
+
+
+def _run_shared_task(shared_memory_name, accessor_name, method_name, parameters):
+    ''' Run a single accessor operation in a worker process, reading the input columns from shared memory.
+
+    Args:
+        shared_memory_name: The name of the shared memory block containing the input columns as an Arrow IPC stream.
+        accessor_name: The name of the dataframe accessor exposing the operation (e.g. dc_matching).
+        method_name: The name of the accessor method returning the results columns.
+        parameters: A dictionary containing the parameters to be passed to the accessor method.
+    Raises:
+        None
+    Returns:
+        A dictionary with the label and the values of each results column.
+    '''
+
+    import gc
+    from multiprocessing.shared_memory import SharedMemory
+
+    _shared_memory = SharedMemory(name=shared_memory_name)
+
+    try:
+
+        return _run_buffered_task(_shared_memory.buf, accessor_name, method_name, parameters)
+
+    finally:
+
+        # The accessor is cached on the dataframe, so the reference cycle has to be collected explicitly
+        gc.collect()
+
+        try:
+
+            _shared_memory.close()
+
+        except BufferError:
+
+            # Some objects (e.g. a traceback) still point to the block, which is released along with them
+            pass
+
+
+def _run_buffered_task(shared_buffer, accessor_name, method_name, parameters):
+    ''' Run a single accessor operation on the columns serialised in a buffer.
+
+    Args:
+        shared_buffer: The buffer containing the input columns as an Arrow IPC stream.
+        accessor_name: The name of the dataframe accessor exposing the operation (e.g. dc_matching).
+        method_name: The name of the accessor method returning the results columns.
+        parameters: A dictionary containing the parameters to be passed to the accessor method.
+    Raises:
+        None
+    Returns:
+        A dictionary with the label and the values of each results column.
+    '''
+
+    import pyarrow
+
+    _input_df = pyarrow.ipc.open_stream(
+        pyarrow.py_buffer(shared_buffer)).read_all().to_pandas()
+
+    _results_columns = getattr(
+        getattr(_input_df, accessor_name), method_name)(**parameters)
+
+    # Detach the results from any buffer pointing to the shared memory before returning them
+    return {label: values.copy() for label, values in _results_columns.items()}
+
+
+class SharedMemoryExecutor:
+    ''' Run a list of accessor operations concurrently, sharing the input columns with the worker processes through shared memory.
+
+    The input columns are written once as an Arrow IPC stream in a shared memory block. Each worker reads them
+    from there, runs one operation and returns only the new results column, which is attached to the dataframe in the parent process.
+
+    Attributes:
+        workers: The number of worker processes. If not provided, the number of available CPUs is used.
+        serial_threshold: The minimum number of rows for which worker processes are used. Smaller dataframes are processed serially.
+    '''
+
+    def __init__(self, workers=None, serial_threshold=None):
+
+        self._workers = workers if workers is not None else (
+            os.cpu_count() or 1)
+        self._serial_threshold = serial_threshold if serial_threshold is not None else 100000
+
+    def run(self, target_dataframe, accessor_name, method_name, parameters_dicts, input_columns_labels, results_cache=None):
+        ''' Run the accessor method for each dictionary of parameters and attach all the results to the dataframe at once.
+
+        Args:
+            target_dataframe: The Pandas Dataframe to be processed.
+            accessor_name: The name of the dataframe accessor exposing the operation (e.g. dc_matching).
+            method_name: The name of the accessor method returning a dictionary with the label and the values of each results column.
+            parameters_dicts: A list of dictionaries containing the parameters to be passed to the accessor method.
+            input_columns_labels: The labels of the columns read by the operations.
+            results_cache: An optional ResultsCache or PersistentResultsCache passed to the accessor method. The cache cannot
+                be shared with the worker processes, so the operations are run serially.
+        Raises:
+            None
+        Returns:
+            A new dataframe with the results columns of all the operations.
+        '''
+
+        if results_cache is not None:
+
+            _results = self._run_serially(target_dataframe, accessor_name, method_name, [
+                dict(parameters, results_cache=results_cache) for parameters in parameters_dicts])
+
+        elif self._use_workers(target_dataframe, parameters_dicts):
+
+            _results = self._run_concurrently(
+                target_dataframe, accessor_name, method_name, parameters_dicts, input_columns_labels)
+
+        else:
+
+            _results = self._run_serially(
+                target_dataframe, accessor_name, method_name, parameters_dicts)
+
+        _results_columns = {}
+
+        for results in _results:
+            _results_columns.update(results)
+
+        return target_dataframe.assign(**_results_columns)
+
+    def _use_workers(self, target_dataframe, parameters_dicts):
+        ''' Establish if the worker processes are worth their start-up and transfer costs.
+
+        Args:
+            target_dataframe: The Pandas Dataframe to be processed.
+            parameters_dicts: A list of dictionaries containing the parameters of the operations.
+        Raises:
+            None
+        Returns:
+            True if the operations have to be run in worker processes, False otherwise.
+        '''
+
+        return self._workers > 1 and len(parameters_dicts) > 1 and len(target_dataframe) >= self._serial_threshold
+
+    def _run_serially(self, target_dataframe, accessor_name, method_name, parameters_dicts):
+        ''' Run the operations one after the other in the current process.
+
+        Args:
+            target_dataframe: The Pandas Dataframe to be processed.
+            accessor_name: The name of the dataframe accessor exposing the operation.
+            method_name: The name of the accessor method returning the results columns.
+            parameters_dicts: A list of dictionaries containing the parameters to be passed to the accessor method.
+        Raises:
+            None
+        Returns:
+            A list of dictionaries with the label and the values of each results column.
+        '''
+
+        _method = getattr(getattr(target_dataframe, accessor_name), method_name)
+
+        return [_method(**parameters) for parameters in parameters_dicts]
+
+    def _run_concurrently(self, target_dataframe, accessor_name, method_name, parameters_dicts, input_columns_labels):
+        ''' Run the operations in a pool of worker processes reading the input columns from shared memory.
+
+        Args:
+            target_dataframe: The Pandas Dataframe to be processed.
+            accessor_name: The name of the dataframe accessor exposing the operation.
+            method_name: The name of the accessor method returning the results columns.
+            parameters_dicts: A list of dictionaries containing the parameters to be passed to the accessor method.
+            input_columns_labels: The labels of the columns read by the operations.
+        Raises:
+            None
+        Returns:
+            A list of dictionaries with the label and the values of each results column.
+        '''
+
+        import pyarrow
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing.shared_memory import SharedMemory
+
+        # Deduplicate the labels, keeping their order
+        _input_columns_labels = list(dict.fromkeys(input_columns_labels))
+
+        try:
+
+            _input_table = pyarrow.Table.from_pandas(
+                target_dataframe[_input_columns_labels], preserve_index=False)
+
+        except pyarrow.ArrowException:
+
+            # Columns with mixed types cannot be represented in Arrow, process them without workers
+            return self._run_serially(target_dataframe, accessor_name, method_name, parameters_dicts)
+
+        # Measure the size of the stream before allocating the shared memory block
+        _size_stream = pyarrow.MockOutputStream()
+
+        with pyarrow.ipc.new_stream(_size_stream, _input_table.schema) as _writer:
+            _writer.write_table(_input_table)
+
+        _shared_memory = SharedMemory(create=True, size=max(_size_stream.size(), 1))
+
+        try:
+
+            with stage('shared_memory_transfer', accessor=accessor_name) as _stage:
+
+                _shared_sink = pyarrow.FixedSizeBufferWriter(
+                    pyarrow.py_buffer(_shared_memory.buf))
+
+                with pyarrow.ipc.new_stream(_shared_sink, _input_table.schema) as _writer:
+                    _writer.write_table(_input_table)
+
+                _stage.record(rows=_input_table.num_rows,
+                              transferred_bytes=_size_stream.size())
+
+            # Release every reference to the shared buffer, so that the block can be closed afterwards
+            del _writer, _shared_sink, _input_table
+
+            # The stages run by the workers, e.g. the matching of each column, are reported along with their results
+            with stage('workers', accessor=accessor_name) as _stage:
+
+                with ProcessPoolExecutor(max_workers=min(self._workers, len(parameters_dicts))) as _pool:
+
+                    _results = [
+                        _submit_measured(_pool, _run_shared_task, _shared_memory.name,
+                                         accessor_name, method_name, parameters)
+                        for parameters in parameters_dicts
+                    ]
+
+                    _results = [result() for result in _results]
+
+                _stage.record(operations=len(parameters_dicts))
+
+        finally:
+
+            _shared_memory.close()
+            _shared_memory.unlink()
+
+        return _results
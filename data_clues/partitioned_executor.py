@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
+
+__all__ = ['PartitionedExecutor', 'ProcessPoolDispatcher']
+
+import os
+
+from data_clues.data_exporter import ChunksWriter, _restore_missing_markers
+from data_clues.data_importer import COLUMNAR_FORMATS
+from data_clues.instrumentation import stage, _submit_measured
+from data_clues.pipeline import Pipeline, _RESULTS_PARAMETERS
+
+# The column recording the position of each row, through which the results of the partitions are merged back
+_ROW_POSITION_LABEL = '__dc_row_position'
+
+# The suffix of the spilled files of each format
+_SPILL_SUFFIXES = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+
+def _read_partition(partition_file):
+    ''' Read a partition spilled to disk as a Parquet or Arrow IPC file.
+
+    Args:
+        partition_file: The path of the file.
+    Raises:
+        None
+    Returns:
+        The Pandas Dataframe of the partition, with the results as they were before being spilled.
+    '''
+
+    import pyarrow
+
+    if COLUMNAR_FORMATS.get(os.path.splitext(partition_file)[1].lower()) == 'parquet':
+
+        import pyarrow.parquet
+
+        _table = pyarrow.parquet.read_table(partition_file, memory_map=True)
+
+    else:
+
+        with pyarrow.memory_map(partition_file) as _source:
+            _table = pyarrow.ipc.open_file(_source).read_all()
+
+    return _restore_missing_markers(_table.to_pandas(), _table.schema)
+
+
+def _run_partition(partition_file, results_file, operations, results_only):
+    ''' Run the operations of a pipeline on a partition and spill its results to disk. Run by the workers (or nodes).
+
+    Args:
+        partition_file: The path of the partition file.
+        results_file: The path of the file where the results are written, in the same format as the partition.
+        operations: The operations of the pipeline, as returned by Pipeline.get_operations.
+        results_only: If True, only the results columns and the row positions are written, otherwise the whole partition.
+    Raises:
+        None
+    Returns:
+        A tuple with the path of the results file and its number of rows.
+    '''
+
+    _pipeline = Pipeline(workers=1)
+
+    for kind, parameters in operations:
+        getattr(_pipeline, 'add_' + kind)(**parameters)
+
+    _results_df = _pipeline.run(_read_partition(partition_file))
+
+    if results_only:
+
+        _results_df = _results_df[[_ROW_POSITION_LABEL] + [parameters[name] for _, parameters in operations
+                                                            for name in _RESULTS_PARAMETERS if parameters.get(name) is not None]]
+
+    with ChunksWriter(results_file) as _writer:
+
+        _writer.write(_results_df)
+
+        return results_file, _writer.close()
+
+
+class ProcessPoolDispatcher:
+    ''' Dispatch the tasks of a partitioned run to a pool of local worker processes, each one standing in for a node.
+
+    Any object with the same dispatch method can replace it, e.g. one submitting the tasks to remote hosts sharing the
+    spill directory: the tasks only exchange the paths of the partition and results files.
+
+    Attributes:
+        workers: The number of worker processes. If not provided, the number of available CPUs is used.
+    '''
+
+    def __init__(self, workers=None):
+
+        self._workers = workers if workers is not None else (
+            os.cpu_count() or 1)
+
+    def dispatch(self, task_function, tasks_arguments):
+        ''' Run a function for each tuple of arguments and wait for all the results.
+
+        Args:
+            task_function: A function importable by the workers.
+            tasks_arguments: A list of tuples with the arguments of each task.
+        Raises:
+            None
+        Returns:
+            A list with the value returned by each task, in the order of the arguments.
+        '''
+
+        if self._workers == 1 or len(tasks_arguments) <= 1:
+            return [task_function(*arguments) for arguments in tasks_arguments]
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=min(self._workers, len(tasks_arguments))) as _pool:
+
+            _results = [_submit_measured(_pool, task_function, *arguments)
+                        for arguments in tasks_arguments]
+
+            return [result() for result in _results]
+
+
+class PartitionedExecutor:
+    ''' Run a pipeline on partitions of the data spilled to disk, so that a single operation uses all the workers and
+    datasets larger than the memory can be processed.
+
+    The rows are hash-partitioned by a key column, so that each value of the key is processed by a single partition.
+    Each partition is spilled to local disk as a Parquet or Arrow IPC file, the pipeline is run on each partition by the
+    dispatcher, and the per-partition results are merged back. The results cache of the pipeline, if any, is not shared
+    with the workers.
+
+    Attributes:
+        pipeline: The Pipeline to be run on each partition.
+        key_column_label: The column by which the rows are partitioned. If not provided, the first column read by the pipeline.
+        partitions: The number of partitions. If not provided, the number of available CPUs is used.
+        spill_directory: The directory where the partitions are spilled, in a temporary subdirectory removed at the end of
+            each run. If not provided, the system temporary directory is used.
+        spill_format: The format of the spilled files, i.e. parquet or arrow. If not provided, parquet is used.
+        dispatcher: The dispatcher running the tasks. If not provided, a ProcessPoolDispatcher with a worker per partition is used.
+    '''
+
+    def __init__(self, pipeline, key_column_label=None, partitions=None, spill_directory=None, spill_format=None, dispatcher=None):
+
+        self._pipeline = pipeline
+        self._operations = pipeline.get_operations()
+
+        if not self._operations:
+
+            raise AttributeError(
+                'Missing operations in the pipeline (PartitionedExecutor).')
+
+        self._key_column_label = key_column_label if key_column_label is not None else next(
+            iter(pipeline.plan()))[0]
+
+        self._partitions = partitions if partitions is not None else (
+            os.cpu_count() or 1)
+        self._spill_directory = spill_directory
+        self._spill_format = spill_format if spill_format is not None else 'parquet'
+
+        if self._spill_format not in _SPILL_SUFFIXES:
+
+            raise AttributeError(
+                'Unknown spill format for PartitionedExecutor, please specify parquet or arrow.')
+
+        self._dispatcher = dispatcher if dispatcher is not None else ProcessPoolDispatcher(
+            self._partitions)
+
+    def _input_columns_labels(self):
+        ''' Collect the labels of the columns read by the pipeline, the key column first.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            A list with the labels.
+        '''
+
+        _labels = [self._key_column_label] + \
+            [label for input_columns in self._pipeline.plan() for label in input_columns]
+
+        return list(dict.fromkeys(_labels))
+
+    def _results_labels(self):
+        ''' Collect the labels of the results columns, in the order the operations were added.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            A list with the labels.
+        '''
+
+        return [parameters[name] for _, parameters in self._operations
+                for name in _RESULTS_PARAMETERS if parameters.get(name) is not None]
+
+    def partition(self, target_chunks, spill_directory, columns_labels=None):
+        ''' Hash-partition a stream of chunks by the key column and spill the partitions to disk, chunk by chunk.
+
+        Args:
+            target_chunks: An iterable of Pandas Dataframes, e.g. DataImporter.iter_chunks().
+            spill_directory: The directory where the partition files are written.
+            columns_labels: The labels of the columns to be spilled. If not provided, all the columns are.
+        Raises:
+            AttributeError: If the key column is not in the data.
+        Returns:
+            A list with the paths of the partition files, only for the partitions with at least one row.
+        '''
+
+        import numpy
+        import pandas
+
+        _writers = {}
+        _rows_count = 0
+
+        with stage('partition', partitions=self._partitions) as _stage:
+
+            try:
+
+                for target_chunk in target_chunks:
+
+                    if self._key_column_label not in target_chunk.columns:
+
+                        raise AttributeError(
+                            f'Missing key column {self._key_column_label} (PartitionedExecutor).')
+
+                    _chunk = target_chunk[columns_labels] if columns_labels is not None else target_chunk
+
+                    _chunk = _chunk.assign(**{_ROW_POSITION_LABEL: numpy.arange(
+                        _rows_count, _rows_count + len(_chunk), dtype=numpy.int64)})
+
+                    _partition_numbers = pandas.util.hash_pandas_object(
+                        _chunk[self._key_column_label], index=False).to_numpy() % self._partitions
+
+                    for partition_number in numpy.unique(_partition_numbers):
+
+                        if partition_number not in _writers:
+
+                            _writers[partition_number] = ChunksWriter(os.path.join(
+                                spill_directory, f'partition-{partition_number}{_SPILL_SUFFIXES[self._spill_format]}'), self._spill_format)
+
+                        _writers[partition_number].write(
+                            _chunk[_partition_numbers == partition_number])
+
+                    _rows_count += len(_chunk)
+
+            finally:
+
+                for writer in _writers.values():
+                    writer.close()
+
+            _stage.record(rows=_rows_count)
+
+        return [os.path.join(spill_directory, f'partition-{partition_number}{_SPILL_SUFFIXES[self._spill_format]}')
+                for partition_number in sorted(_writers)]
+
+    def _run_partitions(self, partition_files, results_only):
+        ''' Dispatch the pipeline on each partition file.
+
+        Args:
+            partition_files: The paths of the partition files.
+            results_only: If True, only the results columns and the row positions are written.
+        Raises:
+            None
+        Returns:
+            A list with the paths of the results files.
+        '''
+
+        _tasks_arguments = [(partition_file, partition_file.replace('partition-', 'results-'), self._operations, results_only)
+                            for partition_file in partition_files]
+
+        with stage('dispatch', partitions=len(partition_files)):
+
+            return [results_file for results_file, _ in self._dispatcher.dispatch(_run_partition, _tasks_arguments)]
+
+    def run(self, target_dataframe):
+        ''' Run the pipeline on the partitions of a dataframe and attach the merged results to it.
+
+        Only the columns read by the pipeline are spilled.
+
+        Args:
+            target_dataframe: The Pandas Dataframe to be processed.
+        Raises:
+            AttributeError: If the key column is not in the dataframe.
+        Returns:
+            A new dataframe with the results columns of all the operations.
+        '''
+
+        import shutil
+        import tempfile
+
+        import pandas
+
+        _spill_directory = tempfile.mkdtemp(
+            prefix='data_clues-', dir=self._spill_directory)
+
+        try:
+
+            _partition_files = self.partition(
+                [target_dataframe], _spill_directory, self._input_columns_labels())
+
+            _results_files = self._run_partitions(_partition_files, True)
+
+            with stage('merge', partitions=len(_results_files)):
+
+                if not _results_files:
+                    return self._pipeline.run(target_dataframe)
+
+                # Each row is in a single partition, so sorting by position restores the order of the dataframe
+                _results_df = pandas.concat([_read_partition(results_file) for results_file in _results_files],
+                                            ignore_index=True).sort_values(_ROW_POSITION_LABEL, kind='stable')
+
+                return target_dataframe.assign(**{label: _results_df[label].set_axis(target_dataframe.index)
+                                                  for label in self._results_labels()})
+
+        finally:
+
+            shutil.rmtree(_spill_directory, ignore_errors=True)
+
+    def process_to_file(self, target_chunks, output_file, file_format=None, append=False):
+        ''' Run the pipeline on the partitions of a stream of chunks and write the results to a file, partition by partition.
+
+        Neither the chunks nor the results are held in memory at once. The rows are written grouped by partition, in
+        their original order within each partition.
+
+        Args:
+            target_chunks: An iterable of Pandas Dataframes, e.g. DataImporter.iter_chunks().
+            output_file: The path of the output file, which is overwritten.
+            file_format: The format of the file, i.e. csv, parquet, feather or arrow. If not provided, it is inferred from the file extension.
+            append: If True, the results are appended to the existing CSV file, e.g. the results of the rows imported incrementally.
+        Raises:
+            AttributeError: If the key column is not in the data.
+        Returns:
+            The number of rows written.
+        '''
+
+        import shutil
+        import tempfile
+
+        _spill_directory = tempfile.mkdtemp(
+            prefix='data_clues-', dir=self._spill_directory)
+
+        try:
+
+            _results_files = self._run_partitions(
+                self.partition(target_chunks, _spill_directory), False)
+
+            with stage('merge', partitions=len(_results_files)), ChunksWriter(output_file, file_format, append) as _writer:
+
+                for results_file in _results_files:
+                    _writer.write(_read_partition(results_file).drop(
+                        columns=_ROW_POSITION_LABEL))
+
+                return _writer.close()
+
+        finally:
+
+            shutil.rmtree(_spill_directory, ignore_errors=True)
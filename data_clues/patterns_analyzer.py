@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
+
+__all__ = ['PatternsAnalyzer']
+
+import numpy
+import pandas
+from data_clues.utilities import factorize_columns, broadcast_results, shape_signatures
+from data_clues.instrumentation import stage
+from data_clues.parallel_executor import SharedMemoryExecutor
+
+
+# Registered as the dc_patterns accessor by data_clues/__init__.py, and imported on its first use
+class PatternsAnalyzer(object):
+    ''' Identify the common patterns of given Series in the Dataframe, as shape signatures, and measure their frequency.
+
+    The shape of a value replaces its uppercase letters with A, its lowercase letters with a and its digits with 9,
+    keeping the other characters, e.g. John.doe99@mail.com is shaped as Aaaa.aaa99@aaaa.aaa.
+
+    Attributes:
+        pandas_obj: A Pandas object containing the data to be processed.
+
+        self._rare_threshold: The frequency below which a shape is rare. If not provided a default one will be used.
+    '''
+
+    # Constructor
+    def __init__(self, pandas_obj, rare_threshold=None):
+
+        self._dataframe_obj = pandas_obj
+
+        self._rare_threshold = rare_threshold if rare_threshold is not None else 0.01
+
+    def _unique_shapes(self, target_column_label, compress_runs=False):
+        ''' Shape the unique values of a given Series and count the rows of each shape, in a single pass.
+
+        Args:
+            target_column_label: The name of the column to be analysed.
+            compress_runs: If True, the runs of letters of the same case, and of digits, are collapsed in a single character.
+        Raises:
+            None
+        Returns:
+            A tuple with the code of each row, the shape of each unique value, the shape code of each unique value
+            (-1 for the missing values), the distinct shapes and the number of rows of each distinct shape.
+        '''
+
+        _codes, _unique_values = factorize_columns(
+            self._dataframe_obj, target_column_label)
+
+        with stage('patterns', column=target_column_label) as _stage:
+
+            _stage.record(rows=len(_codes), unique_values=len(_unique_values))
+
+            _unique_shapes = shape_signatures(
+                _unique_values[target_column_label], compress_runs)
+
+            # Each unique value weighs as many rows as it occurs in
+            _occurrences_counts = numpy.bincount(
+                _codes, minlength=len(_unique_values))
+
+            _shape_codes, _distinct_shapes = pandas.factorize(_unique_shapes)
+
+            _shaped_mask = _shape_codes >= 0
+
+            _shapes_counts = numpy.bincount(_shape_codes[_shaped_mask], weights=_occurrences_counts[_shaped_mask],
+                                            minlength=len(_distinct_shapes)).astype(numpy.int64)
+
+        return _codes, _unique_shapes, _shape_codes, _distinct_shapes, _shapes_counts
+
+    def _patterns_results(self, target_column_label=None, results_column_label=None, frequency_column_label=None, rare_column_label=None, rare_threshold=None, compress_runs=False):
+        ''' Shape each element in a given Series and return the shapes, their frequency and their rarity aligned to the rows of the dataframe.
+
+        Args:
+            target_column_label: The name of the column to be analysed.
+            results_column_label: The name of the column populated with the shape of each value.
+            frequency_column_label: If provided, the name of the column populated with the frequency of the shape, i.e.
+                the share of the (non-missing) rows with the same shape.
+            rare_column_label: If provided, the name of the column populated with True for the values of a rare shape.
+            rare_threshold: The frequency below which a shape is rare. If not provided, the default one is used.
+            compress_runs: If True, the runs of letters of the same case, and of digits, are collapsed in a single character.
+        Raises:
+            AttributeError: If any of the attribute is not provided.
+        Returns:
+            A dictionary with the label and the values, aligned to the rows, of each results column.
+        '''
+
+        if not all(element is not None for element in [target_column_label, results_column_label]):
+
+            raise AttributeError(
+                'Missing attributes for pattern_analysis (PatternsAnalyzer).')
+
+        _codes, _unique_shapes, _shape_codes, _, _shapes_counts = self._unique_shapes(
+            target_column_label, compress_runs)
+
+        _rows_count = _shapes_counts.sum()
+
+        # The missing values have no shape, hence no frequency
+        _unique_frequencies = numpy.where(_shape_codes >= 0, _shapes_counts.take(
+            _shape_codes) / max(_rows_count, 1), numpy.nan)
+
+        with stage('broadcast', columns=target_column_label):
+
+            _results = {results_column_label: broadcast_results(
+                _codes, _unique_shapes)}
+
+            if frequency_column_label is not None:
+                _results[frequency_column_label] = broadcast_results(
+                    _codes, _unique_frequencies)
+
+            if rare_column_label is not None:
+
+                _rare_threshold = rare_threshold if rare_threshold is not None else self._rare_threshold
+
+                _results[rare_column_label] = broadcast_results(
+                    _codes, _unique_frequencies < _rare_threshold)
+
+        return _results
+
+    def pattern_analysis(self, target_column_label=None, results_column_label=None, frequency_column_label=None, rare_column_label=None, rare_threshold=None, compress_runs=False):
+        ''' Shape each element in a given Series and append the shapes, their frequency and their rarity in new Series in the target_df.
+
+        Args:
+            target_column_label: The name of the column to be analysed.
+            results_column_label: The name of the new column populated with the shape of each value.
+            frequency_column_label: If provided, the name of the new column populated with the frequency of the shape.
+            rare_column_label: If provided, the name of the new column populated with True for the values of a rare shape.
+            rare_threshold: The frequency below which a shape is rare. If not provided, the default one is used.
+            compress_runs: If True, the runs of letters of the same case, and of digits, are collapsed in a single character.
+        Raises:
+            AttributeError: If any of the attribute is not provided.
+        Returns:
+            None
+        '''
+
+        self._dataframe_obj = self._dataframe_obj.assign(**self._patterns_results(
+            target_column_label, results_column_label, frequency_column_label, rare_column_label, rare_threshold, compress_runs))
+
+    def shape_frequencies(self, target_column_label=None, compress_runs=False):
+        ''' Measure the frequency of each shape in a given Series.
+
+        Args:
+            target_column_label: The name of the column to be analysed.
+            compress_runs: If True, the runs of letters of the same case, and of digits, are collapsed in a single character.
+        Raises:
+            AttributeError: If the target_column_label is not provided.
+        Returns:
+            A dataframe with the shape, the number of rows and the frequency of each shape, the most common first.
+            The missing values are not counted.
+        '''
+
+        if target_column_label is None:
+
+            raise AttributeError(
+                'Missing attributes for shape_frequencies (PatternsAnalyzer).')
+
+        _, _, _, _distinct_shapes, _shapes_counts = self._unique_shapes(
+            target_column_label, compress_runs)
+
+        _frequencies_df = pandas.DataFrame({'shape': numpy.asarray(_distinct_shapes, dtype=object), 'count': _shapes_counts,
+                                            'frequency': _shapes_counts / max(_shapes_counts.sum(), 1)})
+
+        return _frequencies_df.sort_values(['count', 'shape'], ascending=[False, True], kind='stable').reset_index(drop=True)
+
+    def bulk_pattern_analysis(self, patterns_parameters_dicts, executor=None):
+        '''For each dictionary of keyword arguments, run in parallel the pattern_analysis function.
+
+        Args:
+            patterns_parameters_dicts: A list of dictionaries containing the parameters to be passed to the pattern_analysis.
+            executor: An optional SharedMemoryExecutor used to run the analyses. If not provided, a default one is used.
+        Raises:
+            None
+        Returns:
+            The processed Pandas dataframe with new columns containing the shapes, their frequency and their rarity.
+        '''
+
+        _executor = executor if executor is not None else SharedMemoryExecutor()
+
+        _input_columns_labels = [parameters.get('target_column_label')
+                                 for parameters in patterns_parameters_dicts]
+
+        self._dataframe_obj = _executor.run(
+            self._dataframe_obj, 'dc_patterns', '_patterns_results', patterns_parameters_dicts, _input_columns_labels)
+
+        return self._dataframe_obj
+
+    def get_dataframe(self):
+        ''' Return the processed dataframe.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            The targeted dataframe.
+        '''
+
+        return self._dataframe_obj
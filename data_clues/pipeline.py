@@ -0,0 +1,490 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
+
+__all__ = ['Pipeline']
+
+import os
+
+from data_clues.utilities import factorize_columns, broadcast_results, _cached_unique_results
+from data_clues.keywords_matcher import _matching_operation_key, _fuzzy_matching_operation_key
+from data_clues.similarity_checker import _similarity_operation_key
+from data_clues.occurrences_analyzer import _occurrences_operation_key
+from data_clues.instrumentation import stage, _submit_measured
+
+# For each kind of operation: the accessor, the method computing the results of the unique values, the input columns
+# parameters and the function building the key of its cached results, shared with the accessor
+_OPERATIONS_KINDS = {
+    'matching': ('dc_matching', '_match_unique_values', ('target_column_label',), _matching_operation_key),
+    'similarity': ('dc_similarity', '_check_unique_values_similarity', ('target_column_a_label', 'target_column_b_label'), _similarity_operation_key),
+    'occurrences': ('dc_occurrences', '_analyse_unique_values', ('target_column_label',), _occurrences_operation_key),
+    'fuzzy_matching': ('dc_matching', '_fuzzy_match_unique_values', ('target_column_label',), _fuzzy_matching_operation_key),
+}
+
+# The input columns parameters and the key function of each kind of operation, by the method computing its results
+_OPERATIONS_KEYS = {method_name: (input_parameters, operation_key)
+                    for _, method_name, input_parameters, operation_key in _OPERATIONS_KINDS.values()}
+
+# The parameters naming the results columns of the operations
+_RESULTS_PARAMETERS = ('results_column_label',
+                       'matched_keywords_column_label', 'distance_column_label')
+
+
+def _run_fused_operations(unique_values_df, operations):
+    ''' Run all the operations reading the same column(s) on their unique values, in a single pass.
+
+    Args:
+        unique_values_df: The dataframe with the unique (combinations of) values of the input column(s).
+        operations: A list of tuples with the accessor name, the method name, the input column label (None if the method
+            reads the whole dataframe) and the parameters of each operation.
+    Raises:
+        None
+    Returns:
+        A dictionary with the label of each results column and the results of the unique values.
+    '''
+
+    _unique_results_dict = {}
+
+    for accessor_name, method_name, input_column_label, parameters in operations:
+
+        _input_values = unique_values_df[input_column_label] if input_column_label is not None else unique_values_df
+
+        _unique_results_dict.update(getattr(getattr(unique_values_df, accessor_name), method_name)(
+            _input_values, **parameters))
+
+    return _unique_results_dict
+
+
+class Pipeline:
+    ''' Plan and run the matching, similarity and occurrences analyses of a dataframe as a whole, sharing work across them.
+
+    The operations are compiled into a plan: each column is factorized once, the operations reading the same column(s)
+    are fused into a single pass over their unique values, and the fused groups, which are independent of each other,
+    are run in parallel worker processes. All the results are attached to the dataframe at once.
+
+    Attributes:
+        matching_parameters_dicts: A list of dictionaries containing the parameters to be passed to the match_rows_to_keywords function.
+        similarity_parameters_dicts: A list of dictionaries containing the parameters to be passed to the check_similarity function.
+        occurrences_parameters_dicts: A list of dictionaries containing the parameters to be passed to the bulk_character_occurrences_analysis function.
+        workers: The number of worker processes. If not provided, the number of available CPUs is used.
+        serial_threshold: The minimum number of unique values for which worker processes are used. If not provided, 100000 is used.
+        results_cache: An optional ResultsCache or PersistentResultsCache. The cache cannot be shared with the worker
+            processes, so the operations are run serially.
+        categorical_results: If True, the results columns are attached as Pandas Categoricals, storing each distinct
+            result once instead of the result of each row.
+        persistent_pool: If True, the worker processes are started on the first concurrent run and kept alive for the
+            following ones, e.g. by a long-running service, until close is called. Otherwise, they are started at each run.
+        fuzzy_matching_parameters_dicts: A list of dictionaries containing the parameters to be passed to the fuzzy_match_rows_to_keywords function.
+    '''
+
+    def __init__(self, matching_parameters_dicts=None, similarity_parameters_dicts=None, occurrences_parameters_dicts=None, workers=None, serial_threshold=None, results_cache=None, categorical_results=False, persistent_pool=False, fuzzy_matching_parameters_dicts=None):
+
+        self._workers = workers if workers is not None else (
+            os.cpu_count() or 1)
+        self._serial_threshold = serial_threshold if serial_threshold is not None else 100000
+        self._results_cache = results_cache
+        self._categorical_results = categorical_results
+        self._persistent_pool = persistent_pool
+
+        # The pool of worker processes kept alive across runs, if persistent
+        self._pool = None
+
+        # The operations, as tuples of kind and parameters, in the order their results are attached
+        self._operations = []
+
+        for parameters in matching_parameters_dicts or []:
+            self.add_matching(**parameters)
+
+        for parameters in similarity_parameters_dicts or []:
+            self.add_similarity(**parameters)
+
+        for parameters in occurrences_parameters_dicts or []:
+            self.add_occurrences(**parameters)
+
+        for parameters in fuzzy_matching_parameters_dicts or []:
+            self.add_fuzzy_matching(**parameters)
+
+    @classmethod
+    def from_settings(cls, pipeline_settings, reference_keywords_lists=None, **pipeline_kwargs):
+        ''' Build a pipeline from its declaration in the settings file (see SettingsReader.get_pipeline_settings).
+
+        Args:
+            pipeline_settings: A dictionary with the lists of matching, similarity, occurrences and fuzzy_matching parameters.
+            reference_keywords_lists: An optional module or dictionary with the reference lists, to which a
+                reference_keywords_list given as a name refers (e.g. "popular_urls").
+            pipeline_kwargs: The other attributes of the pipeline, e.g. workers.
+        Raises:
+            AttributeError: If a reference list cannot be found.
+        Returns:
+            The Pipeline.
+        '''
+
+        _resolved_parameters_dicts = {'matching': [], 'fuzzy_matching': []}
+
+        for kind, parameters in [(kind, parameters) for kind in _resolved_parameters_dicts for parameters in pipeline_settings.get(kind, [])]:
+
+            _reference_keywords_list = parameters.get(
+                'reference_keywords_list')
+
+            if isinstance(_reference_keywords_list, str) and reference_keywords_lists is not None:
+
+                # The lists of a module can be loaded on first use, by the module __getattr__
+                _reference_list = reference_keywords_lists.get(_reference_keywords_list) if isinstance(
+                    reference_keywords_lists, dict) else getattr(reference_keywords_lists, _reference_keywords_list, None)
+
+                if _reference_list is None:
+
+                    raise AttributeError(
+                        f'Unknown reference list {_reference_keywords_list} for method from_settings (Pipeline).')
+
+                parameters = dict(
+                    parameters, reference_keywords_list=_reference_list)
+
+            _resolved_parameters_dicts[kind].append(parameters)
+
+        return cls(_resolved_parameters_dicts['matching'], pipeline_settings.get('similarity'), pipeline_settings.get('occurrences'),
+                   fuzzy_matching_parameters_dicts=_resolved_parameters_dicts['fuzzy_matching'], **pipeline_kwargs)
+
+    def add_matching(self, target_column_label=None, reference_keywords_list=None, results_column_label=None, engine=None, matched_keywords_column_label=None, match_mode=None, ignore_case=False):
+        ''' Add a matching operation to the pipeline, see KeywordsMatcher.match_rows_to_keywords.
+
+        Args:
+            target_column_label: The name of the column to be analysed.
+            reference_keywords_list: The list of keywords used to filter the object_series.
+            results_column_label: The name of the column populated with the result of the matching process.
+            engine: An optional engine name, i.e. 'auto', 'regex', 'automaton' or 'arrow'.
+            matched_keywords_column_label: If provided, the name of the column populated with the matching keyword.
+            match_mode: 'match' or 'search', see KeywordsMatcher.match_rows_to_keywords.
+            ignore_case: If True, the values are matched regardless of the case.
+        Raises:
+            AttributeError: If any of the attribute is not provided.
+        Returns:
+            The pipeline, so that the operations can be chained.
+        '''
+
+        if not all(element is not None for element in [target_column_label, reference_keywords_list, results_column_label]):
+
+            raise AttributeError(
+                'Missing attributes for method add_matching (Pipeline).')
+
+        self._operations.append(('matching', {'target_column_label': target_column_label, 'reference_keywords_list': reference_keywords_list,
+                                              'results_column_label': results_column_label, 'engine': engine, 'matched_keywords_column_label': matched_keywords_column_label,
+                                              'match_mode': match_mode, 'ignore_case': ignore_case}))
+
+        return self
+
+    def add_fuzzy_matching(self, target_column_label=None, reference_keywords_list=None, results_column_label=None, max_distance=None, matched_keywords_column_label=None, distance_column_label=None, ignore_case=False):
+        ''' Add a fuzzy matching operation to the pipeline, see KeywordsMatcher.fuzzy_match_rows_to_keywords.
+
+        Args:
+            target_column_label: The name of the column to be analysed.
+            reference_keywords_list: The list of keywords, compared as literal strings.
+            results_column_label: The name of the column populated with the result of the matching process.
+            max_distance: The maximum Levenshtein distance between a value and its keyword. If not provided, 2 is used.
+            matched_keywords_column_label: If provided, the name of the column populated with the nearest keyword.
+            distance_column_label: If provided, the name of the column populated with the distance of the nearest keyword.
+            ignore_case: If True, the values are matched regardless of the case.
+        Raises:
+            AttributeError: If any of the attribute is not provided.
+        Returns:
+            The pipeline, so that the operations can be chained.
+        '''
+
+        if not all(element is not None for element in [target_column_label, reference_keywords_list, results_column_label]):
+
+            raise AttributeError(
+                'Missing attributes for method add_fuzzy_matching (Pipeline).')
+
+        self._operations.append(('fuzzy_matching', {'target_column_label': target_column_label, 'reference_keywords_list': reference_keywords_list,
+                                                    'results_column_label': results_column_label, 'max_distance': max_distance,
+                                                    'matched_keywords_column_label': matched_keywords_column_label,
+                                                    'distance_column_label': distance_column_label, 'ignore_case': ignore_case}))
+
+        return self
+
+    def add_similarity(self, target_column_a_label=None, target_column_b_label=None, results_column_label=None, min_ratio=None):
+        ''' Add a similarity check to the pipeline, see SimilarityChecker.check_similarity.
+
+        Args:
+            target_column_a_label: The label of one of the two Pandas Series to be proccessed.
+            target_column_b_label: The label of one of the two Pandas Series to be proccessed.
+            results_column_label: The label of the Pandas Series used to store the result from the similarity check.
+            min_ratio: An optional similarity threshold. The pairs below it are reported with a similarity of 0.
+        Raises:
+            AttributeError: If any of the attribute is not provided.
+        Returns:
+            The pipeline, so that the operations can be chained.
+        '''
+
+        if not all(element is not None for element in [target_column_a_label, target_column_b_label, results_column_label]):
+
+            raise AttributeError(
+                'Missing attributes for method add_similarity (Pipeline).')
+
+        self._operations.append(('similarity', {'target_column_a_label': target_column_a_label, 'target_column_b_label': target_column_b_label,
+                                                'results_column_label': results_column_label, 'min_ratio': min_ratio}))
+
+        return self
+
+    def add_occurrences(self, target_column_label=None, custom_factors=None, results_column_label=None):
+        ''' Add a character occurrences analysis to the pipeline, see CharacterOccurrencesAnalyzer.bulk_character_occurrences_analysis.
+
+        Args:
+            target_column_label: The name of the column to be analysed.
+            custom_factors: An optional array containing numerical custom weights for the different character types,
+                as [word_factor, digit_factor, sign_factor].
+            results_column_label: The name of the new column populated with the results of the analysis.
+        Raises:
+            AttributeError: If any of the attribute is not provided.
+        Returns:
+            The pipeline, so that the operations can be chained.
+        '''
+
+        if not all(element is not None for element in [target_column_label, results_column_label]):
+
+            raise AttributeError(
+                'Missing attributes for method add_occurrences (Pipeline).')
+
+        self._operations.append(('occurrences', {'target_column_label': target_column_label, 'custom_factors': custom_factors,
+                                                 'results_column_label': results_column_label}))
+
+        return self
+
+    def plan(self):
+        ''' Compile the operations into groups reading the same input column(s), each one run in a single pass.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            A dictionary with the tuple of input columns of each group and the list of its operations, as tuples with
+            the accessor name, the method name, the input column label and the parameters of the method.
+        '''
+
+        _fused_operations = {}
+
+        for kind, parameters in self._operations:
+
+            _accessor_name, _method_name, _input_parameters, _ = _OPERATIONS_KINDS[kind]
+
+            _input_columns = tuple(parameters[name]
+                                   for name in _input_parameters)
+
+            if len(_input_columns) == 1:
+
+                # The method receives the unique values of the column, not its label
+                _method_parameters = {name: value for name, value in parameters.items()
+                                      if name not in _input_parameters}
+
+                _fused_operations.setdefault(_input_columns, []).append(
+                    (_accessor_name, _method_name, _input_columns[0], _method_parameters))
+
+            else:
+
+                _fused_operations.setdefault(_input_columns, []).append(
+                    (_accessor_name, _method_name, None, parameters))
+
+        return _fused_operations
+
+    def run(self, target_dataframe):
+        ''' Run all the operations of the pipeline and attach their results to the dataframe at once.
+
+        Args:
+            target_dataframe: The Pandas Dataframe to be processed.
+        Raises:
+            None
+        Returns:
+            A new dataframe with the results columns of all the operations.
+        '''
+
+        _fused_operations = self.plan()
+
+        # Each column is factorized once, even if it is read by more than one group (e.g. two similarity pairs)
+        _factorized_columns = {}
+        _factorized_groups = {}
+
+        for input_columns in _fused_operations:
+
+            with stage('factorize', columns=','.join(input_columns)) as _stage:
+
+                _factorized_groups[input_columns] = factorize_columns(
+                    target_dataframe, *input_columns, factorized_columns=_factorized_columns)
+
+                _stage.record(rows=len(target_dataframe), unique_values=len(
+                    _factorized_groups[input_columns][1]))
+
+        with stage('compute', groups=len(_fused_operations)):
+
+            if self._results_cache is not None:
+
+                _unique_results = self._run_cached_groups(
+                    _fused_operations, _factorized_groups)
+
+            elif self._use_workers(_fused_operations, _factorized_groups):
+
+                _unique_results = self._run_concurrently(
+                    _fused_operations, _factorized_groups)
+
+            else:
+
+                _unique_results = {input_columns: _run_fused_operations(_factorized_groups[input_columns][1], operations)
+                                   for input_columns, operations in _fused_operations.items()}
+
+        _results_columns = {}
+
+        with stage('broadcast', groups=len(_fused_operations)):
+
+            for input_columns, unique_results_dict in _unique_results.items():
+
+                _codes = _factorized_groups[input_columns][0]
+
+                for label, unique_results in unique_results_dict.items():
+                    _results_columns[label] = broadcast_results(
+                        _codes, unique_results, self._categorical_results)
+
+        # Attach the results in the order the operations were added
+        _results_labels = [parameters[name] for _, parameters in self._operations
+                           for name in _RESULTS_PARAMETERS if parameters.get(name) is not None]
+
+        return target_dataframe.assign(**{label: _results_columns[label] for label in _results_labels})
+
+    def _use_workers(self, fused_operations, factorized_groups):
+        ''' Establish if the worker processes are worth their start-up and transfer costs.
+
+        Args:
+            fused_operations: The groups of operations, as returned by plan.
+            factorized_groups: The codes and the unique values of the input columns of each group.
+        Raises:
+            None
+        Returns:
+            True if the groups have to be run in worker processes, False otherwise.
+        '''
+
+        _unique_values_count = sum(len(unique_values)
+                                   for _, unique_values in factorized_groups.values())
+
+        return self._workers > 1 and len(fused_operations) > 1 and _unique_values_count >= self._serial_threshold
+
+    def _run_concurrently(self, fused_operations, factorized_groups):
+        ''' Run the groups of operations in a pool of worker processes. Only the unique values are sent to the workers.
+
+        Args:
+            fused_operations: The groups of operations, as returned by plan.
+            factorized_groups: The codes and the unique values of the input columns of each group.
+        Raises:
+            None
+        Returns:
+            A dictionary with the results of the unique values of each group.
+        '''
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        if self._persistent_pool:
+
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self._workers)
+
+            return self._submit_groups(self._pool, fused_operations, factorized_groups)
+
+        with ProcessPoolExecutor(max_workers=min(self._workers, len(fused_operations))) as _pool:
+            return self._submit_groups(_pool, fused_operations, factorized_groups)
+
+    def _submit_groups(self, pool, fused_operations, factorized_groups):
+        ''' Submit each group of operations to a pool of worker processes and wait for their results.
+
+        Args:
+            pool: The ProcessPoolExecutor.
+            fused_operations: The groups of operations, as returned by plan.
+            factorized_groups: The codes and the unique values of the input columns of each group.
+        Raises:
+            None
+        Returns:
+            A dictionary with the results of the unique values of each group.
+        '''
+
+        # The stages run by the workers, e.g. the matching of each column, are reported along with their results
+        _results = {input_columns: _submit_measured(pool, _run_fused_operations, factorized_groups[input_columns][1], operations)
+                    for input_columns, operations in fused_operations.items()}
+
+        return {input_columns: result() for input_columns, result in _results.items()}
+
+    def _run_cached_groups(self, fused_operations, factorized_groups):
+        ''' Run the groups of operations in the current process, taking the results of the values already seen from the cache.
+
+        Args:
+            fused_operations: The groups of operations, as returned by plan.
+            factorized_groups: The codes and the unique values of the input columns of each group.
+        Raises:
+            None
+        Returns:
+            A dictionary with the results of the unique values of each group.
+        '''
+
+        _unique_results = {}
+
+        for input_columns, operations in fused_operations.items():
+
+            _unique_values = factorized_groups[input_columns][1]
+
+            _unique_results[input_columns] = {}
+
+            for operation in operations:
+
+                _accessor_name, _method_name, _, _parameters = operation
+
+                _input_parameters, _operation_key = _OPERATIONS_KEYS[_method_name]
+
+                # Measure the cache hit rate of each operation
+                with stage('cached_operation', accessor=_accessor_name, results_column_label=_parameters['results_column_label']):
+
+                    _unique_results[input_columns].update(_cached_unique_results(
+                        _unique_values, list(input_columns),
+                        lambda unique_values_df, operation=operation: _run_fused_operations(
+                            unique_values_df, [operation]),
+                        self._results_cache, _operation_key(**{name: value for name, value in _parameters.items()
+                                                               if name not in _input_parameters})))
+
+        return _unique_results
+
+    def get_operations(self):
+        ''' Return the operations of the pipeline, e.g. to build the same pipeline in another process.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            A list of tuples with the kind (i.e. matching, similarity or occurrences) and the parameters of each operation,
+            in the order they were added.
+        '''
+
+        return list(self._operations)
+
+    def get_results_cache(self):
+        ''' Return the cache of the results used by the pipeline.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            The ResultsCache or PersistentResultsCache, None if the pipeline has no cache.
+        '''
+
+        return self._results_cache
+
+    def close(self):
+        ''' Stop the worker processes kept alive across runs, if any.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            None
+        '''
+
+        if self._pool is not None:
+
+            self._pool.shutdown()
+            self._pool = None
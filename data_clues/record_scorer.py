@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
+
+__all__ = ['RecordScorer']
+
+from data_clues.keywords_matcher import compile_reference_keywords, _value_matcher, _fuzzy_value_matcher
+from data_clues.similarity_checker import _similarity_ratio
+from data_clues.occurrences_analyzer import CharacterOccurrencesAnalyzer
+from data_clues.pipeline import Pipeline
+
+
+def _matching_scorer(target_column_label, reference_keywords_list, results_column_label, engine=None, matched_keywords_column_label=None, match_mode=None, ignore_case=False):
+    ''' Compile a matching operation into a function scoring a single record, see KeywordsMatcher.match_rows_to_keywords.
+
+    Args:
+        target_column_label: The name of the field to be matched.
+        reference_keywords_list: The list of keywords (or a single regular expression).
+        results_column_label: The name of the result populated with the result of the matching process.
+        engine: An optional engine name, i.e. 'auto', 'regex', 'automaton' or 'arrow'.
+        matched_keywords_column_label: If provided, the name of the result populated with the matching keyword.
+        match_mode: 'match' or 'search', see KeywordsMatcher.match_rows_to_keywords.
+        ignore_case: If True, the values are matched regardless of the case.
+    Raises:
+        ValueError: If the engine or the match mode is not supported.
+    Returns:
+        A function receiving a record and the dictionary where its results are written.
+    '''
+
+    _match_value = _value_matcher(*compile_reference_keywords(reference_keywords_list, engine, ignore_case),
+                                  match_mode, ignore_case)
+
+    def _score(record, results):
+
+        _value = record.get(target_column_label)
+
+        # The values which are not strings are reported with '-', as in the dataframes
+        if isinstance(_value, str):
+
+            _matched_keyword = _match_value(_value)
+
+            results[results_column_label] = _matched_keyword is not None
+
+        else:
+
+            _matched_keyword = None
+
+            results[results_column_label] = '-'
+
+        if matched_keywords_column_label is not None:
+            results[matched_keywords_column_label] = _matched_keyword
+
+    return _score
+
+
+def _fuzzy_matching_scorer(target_column_label, reference_keywords_list, results_column_label, max_distance=None, matched_keywords_column_label=None, distance_column_label=None, ignore_case=False):
+    ''' Compile a fuzzy matching operation into a function scoring a single record, see KeywordsMatcher.fuzzy_match_rows_to_keywords.
+
+    Args:
+        target_column_label: The name of the field to be matched.
+        reference_keywords_list: The list of keywords, compared as literal strings.
+        results_column_label: The name of the result populated with the result of the matching process.
+        max_distance: The maximum Levenshtein distance between a value and its keyword. If not provided, 2 is used.
+        matched_keywords_column_label: If provided, the name of the result populated with the nearest keyword.
+        distance_column_label: If provided, the name of the result populated with the distance of the nearest keyword.
+        ignore_case: If True, the values are matched regardless of the case.
+    Raises:
+        None
+    Returns:
+        A function receiving a record and the dictionary where its results are written.
+    '''
+
+    _match_value = _fuzzy_value_matcher(
+        reference_keywords_list, max_distance, ignore_case)
+
+    def _score(record, results):
+
+        _value = record.get(target_column_label)
+
+        if isinstance(_value, str):
+
+            _matched_keyword, _distance = _match_value(_value)
+
+            results[results_column_label] = _matched_keyword is not None
+
+        else:
+
+            _matched_keyword, _distance = None, None
+
+            results[results_column_label] = '-'
+
+        if matched_keywords_column_label is not None:
+            results[matched_keywords_column_label] = _matched_keyword
+
+        if distance_column_label is not None:
+            results[distance_column_label] = _distance
+
+    return _score
+
+
+def _similarity_scorer(target_column_a_label, target_column_b_label, results_column_label, min_ratio=None):
+    ''' Compile a similarity check into a function scoring a single record, see SimilarityChecker.check_similarity.
+
+    Args:
+        target_column_a_label: The name of one of the two fields to be compared.
+        target_column_b_label: The name of one of the two fields to be compared.
+        results_column_label: The name of the result populated with the similarity ratio.
+        min_ratio: An optional similarity threshold. The pairs below it are reported with a similarity of 0.
+    Raises:
+        None
+    Returns:
+        A function receiving a record and the dictionary where its results are written.
+    '''
+
+    def _score(record, results):
+
+        results[results_column_label] = _similarity_ratio(record.get(
+            target_column_a_label), record.get(target_column_b_label), min_ratio)
+
+    return _score
+
+
+def _occurrences_scorer(target_column_label, results_column_label, custom_factors=None):
+    ''' Compile a character occurrences analysis into a function scoring a single record, see CharacterOccurrencesAnalyzer.
+
+    Args:
+        target_column_label: The name of the field to be analysed.
+        results_column_label: The name of the result populated with the occurrence ratio.
+        custom_factors: An optional array containing numerical custom weights for the different character types,
+            as [word_factor, digit_factor, sign_factor].
+    Raises:
+        None
+    Returns:
+        A function receiving a record and the dictionary where its results are written.
+    '''
+
+    _analyzer = CharacterOccurrencesAnalyzer(None)
+
+    # The factors are resolved once, rather than for each record
+    _weighting_factors = _analyzer._weighting_factors(custom_factors)
+
+    _character_occurrences_ratio = _analyzer._character_occurrences_ratio
+
+    def _score(record, results):
+
+        results[results_column_label] = _character_occurrences_ratio(
+            record.get(target_column_label), _weighting_factors)
+
+    return _score
+
+
+# The function compiling each kind of operation
+_SCORERS_KINDS = {
+    'matching': _matching_scorer,
+    'similarity': _similarity_scorer,
+    'occurrences': _occurrences_scorer,
+    'fuzzy_matching': _fuzzy_matching_scorer,
+}
+
+
+class RecordScorer:
+    ''' Score single records, e.g. each incoming signup for online screening, with the same analyses as the accessors and
+    the Pipeline, without building a dataframe.
+
+    The operations are compiled once into plain functions over the fields of a record: the reference keywords are
+    compiled, the weighting factors resolved and the similarity ratios of the pairs already seen cached, so that scoring
+    a record takes microseconds. The results are the same as the ones of the Pipeline.
+
+    Attributes:
+        matching_parameters_dicts: A list of dictionaries containing the parameters to be passed to the match_rows_to_keywords function.
+        similarity_parameters_dicts: A list of dictionaries containing the parameters to be passed to the check_similarity function.
+        occurrences_parameters_dicts: A list of dictionaries containing the parameters to be passed to the bulk_character_occurrences_analysis function.
+        pipeline: An optional Pipeline, whose operations are scored instead of the ones of the parameters dictionaries.
+        fuzzy_matching_parameters_dicts: A list of dictionaries containing the parameters to be passed to the fuzzy_match_rows_to_keywords function.
+    '''
+
+    def __init__(self, matching_parameters_dicts=None, similarity_parameters_dicts=None, occurrences_parameters_dicts=None, pipeline=None, fuzzy_matching_parameters_dicts=None):
+
+        # The Pipeline validates the parameters, and provides the operations in the order their results are attached
+        _pipeline = pipeline if pipeline is not None else Pipeline(
+            matching_parameters_dicts, similarity_parameters_dicts, occurrences_parameters_dicts, workers=1,
+            fuzzy_matching_parameters_dicts=fuzzy_matching_parameters_dicts)
+
+        self._operations = _pipeline.get_operations()
+
+        self._scorers = [_SCORERS_KINDS[kind](**parameters)
+                         for kind, parameters in self._operations]
+
+    def score(self, record):
+        ''' Score a single record.
+
+        Args:
+            record: A dictionary with the value of each field, e.g. a signup with full_name, username, email and website.
+                The missing fields are scored as missing values.
+        Raises:
+            None
+        Returns:
+            A dictionary with the label and the result of each operation, in the order the operations were added.
+        '''
+
+        _results = {}
+
+        for score in self._scorers:
+            score(record, _results)
+
+        return _results
+
+    def score_batch(self, records):
+        ''' Score a batch of records, one by one.
+
+        Args:
+            records: An iterable of dictionaries with the value of each field.
+        Raises:
+            None
+        Returns:
+            A list with the dictionary of the results of each record.
+        '''
+
+        _scorers = self._scorers
+
+        _batch_results = []
+
+        for record in records:
+
+            _results = {}
+
+            for score in _scorers:
+                score(record, _results)
+
+            _batch_results.append(_results)
+
+        return _batch_results
+
+    def get_operations(self):
+        ''' Return the operations of the scorer.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            A list of tuples with the kind (i.e. matching, similarity, occurrences or fuzzy_matching) and the parameters of each operation.
+        '''
+
+        return list(self._operations)
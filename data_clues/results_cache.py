@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
+
+__all__ = ['ResultsCache', 'PersistentResultsCache', 'operation_key', 'value_key']
+
+import hashlib
+from collections import OrderedDict
+
+import pandas
+
+
+def operation_key(operation_name, **parameters):
+    ''' Build a key identifying an operation and the parameters its results depend on.
+
+    Args:
+        operation_name: The name of the operation (e.g. the accessor method).
+        parameters: The parameters the results depend on (e.g. the reference list or the custom factors).
+    Raises:
+        None
+    Returns:
+        A string digest, which is the same for any operation with the same name and parameters.
+    '''
+
+    _parameters_repr = repr(sorted(
+        (name, tuple(value) if isinstance(value, list) else value) for name, value in parameters.items()))
+
+    return operation_name + ':' + hashlib.sha1(_parameters_repr.encode('utf-8')).hexdigest()
+
+
+def value_key(value):
+    ''' Normalise a value, or a tuple of values, to be used as a cache key.
+
+    Args:
+        value: The value, or the tuple of values, to be normalised.
+    Raises:
+        None
+    Returns:
+        The value with the missing values replaced by None, since NaN is not equal to itself.
+    '''
+
+    if isinstance(value, tuple):
+        return tuple(value_key(element) for element in value)
+
+    return None if pandas.isna(value) else value
+
+
+class ResultsCache:
+    ''' Keep in memory the results computed for the unique values of each operation, to reuse them across chunks of data.
+
+    The results of each operation are evicted in least-recently-used order once max_entries is reached.
+
+    Attributes:
+        max_entries: The maximum number of values whose results are kept for each operation. If not provided, 1000000 is used.
+    '''
+
+    def __init__(self, max_entries=None):
+
+        self._max_entries = max_entries if max_entries is not None else 1000000
+
+        # For each operation, the labels of the results and an ordered mapping from each value to its results
+        self._labels = {}
+        self._results = {}
+
+        self._hits_count = 0
+        self._misses_count = 0
+
+    def lookup(self, operation_key, value_keys):
+        ''' Retrieve the results already computed for the given values.
+
+        Args:
+            operation_key: The key of the operation, see operation_key.
+            value_keys: The list of (normalised) values to be looked up.
+        Raises:
+            None
+        Returns:
+            A tuple with the labels of the results (None if the operation is unknown) and a list with the tuple
+            of results of each value, or None if the value has not been seen yet.
+        '''
+
+        _operation_results = self._results.get(operation_key)
+
+        if _operation_results is None:
+
+            self._misses_count += len(value_keys)
+
+            return None, [None] * len(value_keys)
+
+        _results = []
+
+        for key in value_keys:
+
+            _value_results = _operation_results.get(key)
+
+            if _value_results is not None:
+                _operation_results.move_to_end(key)
+
+            _results.append(_value_results)
+
+        _hits_count = sum(results is not None for results in _results)
+
+        self._hits_count += _hits_count
+        self._misses_count += len(_results) - _hits_count
+
+        return self._labels[operation_key], _results
+
+    def store(self, operation_key, labels, value_keys, results):
+        ''' Store the results computed for the given values.
+
+        Args:
+            operation_key: The key of the operation, see operation_key.
+            labels: The tuple of labels of the results.
+            value_keys: The list of (normalised) values.
+            results: The list with the tuple of results of each value.
+        Raises:
+            None
+        Returns:
+            None
+        '''
+
+        _operation_results = self._results.setdefault(
+            operation_key, OrderedDict())
+
+        self._labels[operation_key] = tuple(labels)
+
+        _operation_results.update(zip(value_keys, results))
+
+        while len(_operation_results) > self._max_entries:
+            _operation_results.popitem(last=False)
+
+    def hit_rate(self):
+        ''' Return the share of the values looked up whose results were found.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            A floating point number between 0 and 1, or None if no value has been looked up.
+        '''
+
+        _lookups_count = self._hits_count + self._misses_count
+
+        return self._hits_count / _lookups_count if _lookups_count else None
+
+
+def _value_digest(value_key):
+    ''' Hash a (normalised) value, to be used as a key of the persistent results.
+
+    Args:
+        value_key: The value, or the tuple of values, normalised by value_key.
+    Raises:
+        None
+    Returns:
+        A 16 bytes digest of the value and of its type.
+    '''
+
+    _value = tuple(element.item() if hasattr(element, 'item') else element for element in value_key) if isinstance(
+        value_key, tuple) else (value_key.item() if hasattr(value_key, 'item') else value_key)
+
+    return hashlib.blake2b(repr(_value).encode('utf-8'), digest_size=16).digest()
+
+
+class PersistentResultsCache:
+    ''' Keep the results computed for the unique values of each operation in a SQLite file, to reuse them across runs.
+
+    The results are keyed by a hash of the value and by the operation key, which depends on the operation parameters
+    (e.g. the reference list). When an operation writing the same results columns is run with different parameters,
+    the results of the previous parameters are deleted. Once max_entries is reached, the least recently used results
+    are evicted. It provides the same interface as ResultsCache, so it can be used wherever a results_cache is accepted.
+
+    Attributes:
+        database_file: The path of the SQLite file, which is created if it does not exist.
+        max_entries: The maximum number of values whose results are kept, for all the operations. If not provided, 10000000 is used.
+    '''
+
+    # The number of values looked up in each query, below the SQLite limit of parameters
+    _QUERY_BATCH_SIZE = 500
+
+    def __init__(self, database_file, max_entries=None):
+
+        import sqlite3
+
+        self._max_entries = max_entries if max_entries is not None else 10000000
+
+        # The connection can be used by the threads of a long-running service, one at a time
+        self._connection = sqlite3.connect(database_file, check_same_thread=False)
+
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+
+        with self._connection:
+
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS operations (operation_key TEXT PRIMARY KEY, operation_family TEXT UNIQUE, labels TEXT)')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS results (operation_key TEXT, value_hash BLOB, results BLOB, last_used INTEGER, '
+                'PRIMARY KEY (operation_key, value_hash)) WITHOUT ROWID')
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)')
+
+        self._entries_count, _last_used = self._connection.execute(
+            'SELECT COUNT(*), COALESCE(MAX(last_used), 0) FROM results').fetchone()
+
+        # A logical clock, increased at every lookup and store, ordering the results by their last use
+        self._clock = _last_used
+
+        self._hits_count = 0
+        self._misses_count = 0
+
+    def lookup(self, operation_key, value_keys):
+        ''' Retrieve the results already computed for the given values.
+
+        Args:
+            operation_key: The key of the operation, see operation_key.
+            value_keys: The list of (normalised) values to be looked up.
+        Raises:
+            None
+        Returns:
+            A tuple with the labels of the results (None if the operation is unknown) and a list with the tuple
+            of results of each value, or None if the value has not been stored yet.
+        '''
+
+        import json
+        import pickle
+
+        _operation = self._connection.execute(
+            'SELECT labels FROM operations WHERE operation_key = ?', (operation_key,)).fetchone()
+
+        if _operation is None:
+
+            self._misses_count += len(value_keys)
+
+            return None, [None] * len(value_keys)
+
+        _value_hashes = [_value_digest(key) for key in value_keys]
+        _stored_results = {}
+
+        for batch_start in range(0, len(_value_hashes), self._QUERY_BATCH_SIZE):
+
+            _batch_hashes = _value_hashes[batch_start:batch_start +
+                                          self._QUERY_BATCH_SIZE]
+
+            _stored_results.update(self._connection.execute(
+                'SELECT value_hash, results FROM results WHERE operation_key = ? AND value_hash IN (' +
+                ','.join('?' * len(_batch_hashes)) + ')', (operation_key, *_batch_hashes)))
+
+        _results = [pickle.loads(_stored_results[value_hash]) if value_hash in _stored_results else None
+                    for value_hash in _value_hashes]
+
+        if _stored_results:
+
+            self._clock += 1
+
+            with self._connection:
+                self._connection.executemany('UPDATE results SET last_used = ? WHERE operation_key = ? AND value_hash = ?',
+                                             ((self._clock, operation_key, value_hash) for value_hash in _stored_results))
+
+        self._hits_count += len(_stored_results)
+        self._misses_count += len(_results) - len(_stored_results)
+
+        return tuple(json.loads(_operation[0])), _results
+
+    def store(self, operation_key, labels, value_keys, results):
+        ''' Store the results computed for the given values.
+
+        Args:
+            operation_key: The key of the operation, see operation_key.
+            labels: The tuple of labels of the results.
+            value_keys: The list of (normalised) values.
+            results: The list with the tuple of results of each value.
+        Raises:
+            None
+        Returns:
+            None
+        '''
+
+        import json
+        import pickle
+
+        # The operations writing the same results columns differ only in their parameters, e.g. an updated reference list
+        _operation_family = operation_key.split(':')[0] + ':' + json.dumps(list(labels))
+
+        self._clock += 1
+
+        with self._connection:
+
+            _previous_operation = self._connection.execute(
+                'SELECT operation_key FROM operations WHERE operation_family = ?', (_operation_family,)).fetchone()
+
+            if _previous_operation is not None and _previous_operation[0] != operation_key:
+
+                # The parameters have changed: the results stored so far are no longer valid
+                self._entries_count -= self._connection.execute(
+                    'DELETE FROM results WHERE operation_key = ?', _previous_operation).rowcount
+                self._connection.execute(
+                    'DELETE FROM operations WHERE operation_key = ?', _previous_operation)
+
+            self._connection.execute('INSERT OR REPLACE INTO operations VALUES (?, ?, ?)',
+                                     (operation_key, _operation_family, json.dumps(list(labels))))
+
+            _stored_count = self._connection.total_changes
+
+            self._connection.executemany('INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?)', (
+                (operation_key, _value_digest(key), pickle.dumps(value_results, pickle.HIGHEST_PROTOCOL), self._clock)
+                for key, value_results in zip(value_keys, results)))
+
+            self._entries_count += self._connection.total_changes - _stored_count
+
+            if self._entries_count > self._max_entries:
+
+                self._entries_count -= self._connection.execute(
+                    'DELETE FROM results WHERE (operation_key, value_hash) IN '
+                    '(SELECT operation_key, value_hash FROM results ORDER BY last_used LIMIT ?)',
+                    (self._entries_count - self._max_entries,)).rowcount
+
+    def hit_rate(self):
+        ''' Return the share of the values looked up whose results were found.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            A floating point number between 0 and 1, or None if no value has been looked up.
+        '''
+
+        _lookups_count = self._hits_count + self._misses_count
+
+        return self._hits_count / _lookups_count if _lookups_count else None
+
+    def close(self):
+        ''' Close the SQLite file.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            None
+        '''
+
+        self._connection.close()
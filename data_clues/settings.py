@@ -26,34 +26,297 @@ class SettingsReader():
         Raises: 
             Exception: If the JSON config file is not properly configured. 
         Returns:
-            A dictionary with the data necessary to retrive a dataset. 
+            A dictionary with the data necessary to retrive a dataset. With a list of data sources, the first one.
         '''
 
+        return self.get_sources_data()[0]
+
+    def get_sources_data(self):
+        ''' Provide the necessary data to retrive each dataset to be processed, e.g. the daily CSV shards and the database tables.
+
+        The data_source can be a single source name (e.g. "csv"), whose settings are in the section of the same name, or a
+        list of sources, each one either a source name or a dictionary with the source name, as data_source, and its
+        settings (e.g. {"data_source": "csv", "filepath": "data/input/", "filename": "shard-*.csv"}). The CSV, Parquet,
+        Feather and Arrow filenames can be glob patterns, matching one source for each file.
+
+        Args: 
+            None
+        Raises: 
+            Exception: If the JSON config file is not properly configured. 
+        Returns:
+            A list of dictionaries with the data necessary to retrive each dataset. 
+        '''
+
+        import glob
+        import os
+
         _settings = self._settings['settings']
 
-        if _settings['data_source'] == 'database':
+        _data_sources = _settings['data_source'] if isinstance(
+            _settings['data_source'], list) else [_settings['data_source']]
+
+        _sources_data_kwargs = []
+
+        for data_source in _data_sources:
+
+            if isinstance(data_source, dict):
+                _data_source, _source_settings = data_source.get('data_source'), data_source
+            else:
+                _data_source, _source_settings = data_source, _settings.get(data_source, {})
+
+            _source_data_kwargs = self._source_data_kwargs(_data_source, _source_settings)
+
+            _filepath_key, _filename_key = ('csv_filepath', 'csv_filename') if 'csv_filename' in _source_data_kwargs else ('filepath', 'filename')
+
+            if _filename_key in _source_data_kwargs and glob.has_magic(_source_data_kwargs[_filename_key]):
+
+                # A source for each file matching the pattern, in the order of their names
+                _sources_data_kwargs.extend(self._file_data_kwargs(_source_data_kwargs, _filename_key, os.path.basename(path)) for path in sorted(
+                    glob.glob(os.path.join(_source_data_kwargs[_filepath_key], _source_data_kwargs[_filename_key]))))
+
+            else:
+
+                _sources_data_kwargs.append(_source_data_kwargs)
+
+        return _sources_data_kwargs
+
+    def _file_data_kwargs(self, source_data_kwargs, filename_key, filename):
+        ''' Provide the necessary data to retrive a single file matching the glob pattern of a source.
+
+        Each file keeps its own watermark, i.e. the byte offset reached in the file, in a watermark_file named after
+        the one of the source and the file (e.g. watermark-shard-1.csv.json for watermark.json and shard-1.csv).
+
+        Args: 
+            source_data_kwargs: A dictionary with the data of the source, see _source_data_kwargs.
+            filename_key: The key of the filename in the data of the source, i.e. csv_filename or filename.
+            filename: The name of the file.
+        Raises: 
+            None
+        Returns:
+            A dictionary with the data necessary to retrive the file. 
+        '''
+
+        import os
+
+        _file_data_kwargs = dict(source_data_kwargs, **{filename_key: filename})
+
+        if source_data_kwargs.get('watermark_file') is not None:
+
+            _root, _extension = os.path.splitext(source_data_kwargs['watermark_file'])
+
+            _file_data_kwargs['watermark_file'] = f'{_root}-{filename}{_extension}'
+
+        return _file_data_kwargs
 
-            _db_host = _settings['database']['host']
-            _db_port = _settings['database']['port']
-            _db_name = _settings['database']['name']
-            _table_name = _settings['database']['table_name']
-            _username = _settings['database']['username']
-            _password = _settings['database']['password']
+    def _source_data_kwargs(self, data_source, source_settings):
+        ''' Provide the necessary data to retrive a single dataset.
 
-            _source_data_kwargs = {'db_host': _db_host, 'db_port': _db_port, 'db_name': _db_name,
+        Args: 
+            data_source: The type of the source, i.e. csv, database, parquet, feather or arrow.
+            source_settings: A dictionary with the settings of the source.
+        Raises: 
+            Exception: If the JSON config file is not properly configured. 
+        Returns:
+            A dictionary with the data necessary to retrive the dataset. 
+        '''
+
+        if data_source == 'database':
+
+            # The host, the port and the credentials are not required by SQLite
+            _db_type = source_settings.get('type')
+            _db_host = source_settings.get('host')
+            _db_port = source_settings.get('port')
+            _db_name = source_settings['name']
+            _table_name = source_settings['table_name']
+            _username = source_settings.get('username')
+            _password = source_settings.get('password')
+
+            _source_data_kwargs = {'db_type': _db_type, 'db_host': _db_host, 'db_port': _db_port, 'db_name': _db_name,
                                    'table_name': _table_name, 'username': _username, 'password': _password}
 
-        elif _settings['data_source'] == 'csv':
+            # Optionally, filter the rows of the table
+            if 'where' in source_settings:
+                _source_data_kwargs['where'] = source_settings['where']
+
+        elif data_source == 'csv':
 
-            _csv_filepath = _settings['csv']['filepath']
-            _csv_filename = _settings['csv']['filename']
+            _csv_filepath = source_settings['filepath']
+            _csv_filename = source_settings['filename']
 
             _source_data_kwargs = {
                 'csv_filepath': _csv_filepath, 'csv_filename': _csv_filename}
 
+        elif data_source in ('parquet', 'feather', 'arrow'):
+
+            _filepath = source_settings['filepath']
+            _filename = source_settings['filename']
+
+            _source_data_kwargs = {
+                'filepath': _filepath, 'filename': _filename, 'file_format': data_source}
+
         else:
 
             raise Exception(
                 f'Unable to retrive any data source, please check you have provided all the details in the settings file. (Ref. {self.__class__.__name__})')
 
+        # Optionally, stream the data in chunks instead of loading them at once
+        _chunk_size = source_settings.get('chunk_size')
+
+        if _chunk_size is not None:
+            _source_data_kwargs['chunk_size'] = _chunk_size
+
+        # Optionally, import only the rows added since the previous run
+        for key in ('watermark_column', 'watermark_file'):
+
+            if key in source_settings:
+                _source_data_kwargs[key] = source_settings[key]
+
+        # Optionally, import only the columns needed by the analyses
+        _columns = source_settings.get('columns')
+
+        if _columns is not None:
+            _source_data_kwargs['columns'] = _columns
+
+        # Optionally, keep the repeated values of some columns as categoricals
+        _categorical_columns = source_settings.get('categorical_columns')
+
+        if _categorical_columns is not None:
+            _source_data_kwargs['categorical_columns'] = _categorical_columns
+
         return _source_data_kwargs
+
+    def get_executor_settings(self):
+        ''' Provide the parameters of the executor running the bulk operations concurrently.
+
+        Args: 
+            None
+        Raises: 
+            None
+        Returns:
+            A dictionary with the parameters to be passed to the SharedMemoryExecutor. Empty if the settings file does not include them.
+        '''
+
+        _executor_settings = self._settings['settings'].get('executor', {})
+
+        _executor_kwargs = {key: _executor_settings[key] for key in (
+            'workers', 'serial_threshold') if key in _executor_settings}
+
+        return _executor_kwargs
+
+    def get_output_settings(self):
+        ''' Provide the path and the format of the file where the processed dataset is written.
+
+        Args: 
+            None
+        Raises: 
+            None
+        Returns:
+            A dictionary with the parameters to be passed to export_dataframe. By default, a CSV file in data/output/.
+        '''
+
+        _output_settings = self._settings['settings'].get('output', {})
+
+        _output_kwargs = {
+            'output_file': _output_settings.get('filepath', 'data/output/') + _output_settings.get('filename', 'processed_dataframe.csv'),
+            'file_format': _output_settings.get('format')
+        }
+
+        return _output_kwargs
+
+    def get_results_cache_settings(self):
+        ''' Provide the parameters of the persistent store of the results, which are reused across runs.
+
+        Args: 
+            None
+        Raises: 
+            None
+        Returns:
+            A dictionary with the parameters to be passed to the PersistentResultsCache. Empty if the settings file does not include them.
+        '''
+
+        _results_store_settings = self._settings['settings'].get('results_store', {})
+
+        _results_cache_kwargs = {key: _results_store_settings[key] for key in (
+            'database_file', 'max_entries') if key in _results_store_settings}
+
+        return _results_cache_kwargs
+
+    def get_partitioning_settings(self):
+        ''' Provide the parameters of the partitioned execution of the pipeline.
+
+        Args: 
+            None
+        Raises: 
+            None
+        Returns:
+            A dictionary with the parameters to be passed to the PartitionedExecutor. Empty if the settings file does not
+            include them, in which case the data are not partitioned.
+        '''
+
+        _partitioning_settings = self._settings['settings'].get('partitioning', {})
+
+        return {key: _partitioning_settings[key] for key in ('key_column_label', 'partitions', 'spill_directory', 'spill_format')
+                if key in _partitioning_settings}
+
+    def get_pipeline_settings(self):
+        ''' Provide the declaration of the analyses to be run by the Pipeline.
+
+        Args: 
+            None
+        Raises: 
+            None
+        Returns:
+            A dictionary with the lists of matching, similarity and occurrences parameters, see Pipeline.from_settings. 
+            Empty if the settings file does not include them.
+        '''
+
+        return self._settings['settings'].get('pipeline', {})
+
+    def get_profiling_settings(self):
+        ''' Provide the parameters of the approximate profiling of the columns, and the file where the profile is written.
+
+        Args: 
+            None
+        Raises: 
+            None
+        Returns:
+            A dictionary with the json_file and the parameters to be passed to the SketchProfiler. Empty if the settings
+            file does not include them, in which case the columns are not profiled.
+        '''
+
+        _profiling_settings = self._settings['settings'].get('profiling', {})
+
+        return {key: _profiling_settings[key] for key in ('json_file', 'columns_labels', 'shapes', 'width', 'depth', 'heavy_hitters', 'precision', 'sample_size', 'seed')
+                if key in _profiling_settings}
+
+    def get_service_settings(self):
+        ''' Provide the address the analysis service listens on.
+
+        Args: 
+            None
+        Raises: 
+            None
+        Returns:
+            A dictionary with the host and the port, or the unix_socket, to be passed to the AnalysisService. Empty if the
+            settings file does not include them, in which case the data source is processed once.
+        '''
+
+        _service_settings = self._settings['settings'].get('service', {})
+
+        return {key: _service_settings[key] for key in ('host', 'port', 'unix_socket') if key in _service_settings}
+
+    def get_instrumentation_settings(self):
+        ''' Provide the files where the metrics of the processing stages are exported.
+
+        Args: 
+            None
+        Raises: 
+            None
+        Returns:
+            A dictionary with the optional json_file and prometheus_file. Empty if the settings file does not include them,
+            in which case the instrumentation is disabled.
+        '''
+
+        _instrumentation_settings = self._settings['settings'].get('instrumentation', {})
+
+        return {key: _instrumentation_settings[key] for key in ('json_file', 'prometheus_file') if key in _instrumentation_settings}
@@ -1,14 +1,135 @@
 # -*- coding: utf-8 -*-
 # Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
 
+import numpy
 import pandas
-import Levenshtein
-from data_clues.utilities import advanced_unique_values
+from functools import lru_cache
+from data_clues.utilities import map_unique_values, factorize_columns, broadcast_results, _string_value
+from data_clues.instrumentation import stage
+from data_clues.results_cache import operation_key
+from data_clues.minhash_index import MinHashIndex
+from data_clues.parallel_executor import SharedMemoryExecutor
 
-__all__ = ['SimilarityChecker']
+__all__ = ['SimilarityChecker', 'similarity_ratios']
 
+# The maximum number of pairs of values whose similarity is kept in memory
+_SIMILARITY_CACHE_SIZE = 2 ** 20
 
-@pandas.api.extensions.register_dataframe_accessor("dc_similarity")
+
+@lru_cache(maxsize=_SIMILARITY_CACHE_SIZE)
+def _cached_similarity_ratio(value_a, value_b):
+    ''' Compute the Levenshtein ratio between two strings, reusing the ratios of the pairs already seen.
+
+    Args:
+        value_a: One of the two strings to be compared. 
+        value_b: One of the two strings to be compared. 
+    Raises:
+        None
+    Returns:
+        The similarity ratio.
+    '''
+
+    # Only imported when the similarity is checked, and only run for the pairs not cached yet
+    import Levenshtein
+
+    return Levenshtein.ratio(value_a, value_b)
+
+
+def _similarity_ratio(value_a, value_b, min_ratio=None):
+    ''' Compute the Levenshtein ratio of a single pair of values, as similarity_ratios does for each pair of two arrays.
+
+    Args:
+        value_a: The first value of the pair. A missing value is compared as an empty string.
+        value_b: The second value of the pair. A missing value is compared as an empty string.
+        min_ratio: An optional similarity threshold, between 0 and 1.
+    Raises:
+        None
+    Returns:
+        The similarity ratio, 0 if it is below min_ratio.
+    '''
+
+    _value_a = _string_value(value_a)
+    _value_b = _string_value(value_b)
+
+    if min_ratio is not None:
+
+        _lengths_sum = len(_value_a) + len(_value_b)
+
+        # The ratio cannot reach min_ratio, given the difference in length
+        if _lengths_sum > 0 and 2 * min(len(_value_a), len(_value_b)) / _lengths_sum < min_ratio:
+            return 0.0
+
+    _ratio = _cached_similarity_ratio(*sorted((_value_a, _value_b)))
+
+    return _ratio if min_ratio is None or _ratio >= min_ratio else 0.0
+
+
+def similarity_ratios(values_a, values_b, min_ratio=None):
+    ''' Compute the Levenshtein ratio between two arrays of strings, pair by pair.
+
+    With min_ratio, the pairs whose lengths are too far apart to reach it are skipped: the ratio is at most 
+    2 * min(len_a, len_b) / (len_a + len_b). The ratio of the pairs below min_ratio is reported as 0.
+
+    Args:
+        values_a: The first strings of the pairs. Missing values are compared as empty strings.
+        values_b: The second strings of the pairs. Missing values are compared as empty strings.
+        min_ratio: An optional similarity threshold, between 0 and 1.
+    Raises:
+        None
+    Returns:
+        An array with the similarity ratio of each pair.
+    '''
+
+    _values_a = [str(value) if not pandas.isna(value) else '' for value in values_a]
+    _values_b = [str(value) if not pandas.isna(value) else '' for value in values_b]
+
+    _similarity_ratios = numpy.zeros(len(_values_a), dtype=numpy.float64)
+
+    if min_ratio is not None:
+
+        _lengths_a = numpy.fromiter(map(len, _values_a), dtype=numpy.int64, count=len(_values_a))
+        _lengths_b = numpy.fromiter(map(len, _values_b), dtype=numpy.int64, count=len(_values_b))
+
+        _lengths_sum = _lengths_a + _lengths_b
+
+        # Two empty strings are identical
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            _upper_bounds = numpy.where(_lengths_sum > 0, 2 * numpy.minimum(_lengths_a, _lengths_b) / _lengths_sum, 1.0)
+
+        _candidate_positions = numpy.flatnonzero(_upper_bounds >= min_ratio)
+
+    else:
+
+        _candidate_positions = numpy.arange(len(_values_a))
+
+    # The ratio is symmetric, so the pairs are sorted to share the cache between (a, b) and (b, a)
+    _similarity_ratios[_candidate_positions] = [
+        _cached_similarity_ratio(*sorted((_values_a[position], _values_b[position])))
+        for position in _candidate_positions.tolist()
+    ]
+
+    if min_ratio is not None:
+        _similarity_ratios[_similarity_ratios < min_ratio] = 0.0
+
+    return _similarity_ratios
+
+
+def _similarity_operation_key(results_column_label, min_ratio=None):
+    ''' Build the key of the cached results of a similarity check, the same for the accessor and the Pipeline.
+
+    Args:
+        results_column_label: The label of the Pandas Series used to store the result from the similarity check.
+        min_ratio: An optional similarity threshold.
+    Raises:
+        None
+    Returns:
+        The operation key, see operation_key.
+    '''
+
+    return operation_key('dc_similarity', results_column_label=results_column_label, min_ratio=min_ratio)
+
+
+# Registered as the dc_similarity accessor by data_clues/__init__.py, and imported on its first use
 class SimilarityChecker(object):
     ''' Check the similarity between pre-defined columns of a given dataframe using Levenshtein distance. 
 
@@ -21,82 +142,150 @@ class SimilarityChecker(object):
         # TODO: add validator self._validate(pandas_obj)
         self._dataframe_obj = pandas_obj
 
-    def check_similarity(self, target_column_a_label=None, target_column_b_label=None, results_column_label=None):
+    def check_similarity(self, target_column_a_label=None, target_column_b_label=None, results_column_label=None, min_ratio=None, results_cache=None):
         ''' Determine the similarity between two given Pandas Series. 
 
         Args:  
             target_column_a_labels: The label of one of the two Pandas Series to be proccessed. 
             target_column_b_labels: The label of one of the two Pandas Series to be proccessed. 
             results_column_labels: The label of the Pandas Series used to store the result from the similarity check.
+            min_ratio: An optional similarity threshold, between 0 and 1. The pairs of values below it are reported 
+                with a similarity of 0, and the pairs which cannot reach it because of their lengths are skipped.
+            results_cache: An optional ResultsCache, which provides the similarity of the pairs of values already compared 
+                (e.g. in previous chunks of data) and stores the new ones.
         Raises: 
             None
         Return: 
             None
         '''
 
-        # Get the rows with unique values
-        # TODO: put this operation in the brader bulk_similarity_check
-        _unique_values_df = advanced_unique_values(
-            self._dataframe_obj, target_column_a_label, target_column_b_label)
+        self._dataframe_obj = self._dataframe_obj.assign(**self._similarity_results(
+            target_column_a_label, target_column_b_label, results_column_label, min_ratio, results_cache))
 
-        _similarity_results_series = _unique_values_df.fillna('').apply(lambda row: Levenshtein.ratio(
-            str(row[target_column_a_label]), str(row[target_column_b_label])), axis=1)
+    def _check_unique_values_similarity(self, unique_values_df, target_column_a_label=None, target_column_b_label=None, results_column_label=None, min_ratio=None):
+        ''' Determine the similarity between the unique pairs of values of two given Pandas Series. 
 
-        _similarity_check_df = pandas.DataFrame({
-            target_column_a_label: _unique_values_df[target_column_a_label],
-            target_column_b_label: _unique_values_df[target_column_b_label],
-            results_column_label: _similarity_results_series
-        })
+        Args:  
+            unique_values_df: The dataframe with the unique pairs of values.
+            target_column_a_labels: The label of one of the two Pandas Series to be proccessed. 
+            target_column_b_labels: The label of one of the two Pandas Series to be proccessed. 
+            results_column_labels: The label of the Pandas Series used to store the result from the similarity check.
+            min_ratio: An optional similarity threshold. The pairs below it are reported with a similarity of 0.
+        Raises: 
+            None
+        Return: 
+            A dictionary with the results_column_label and the similarity of the unique pairs of values.
+        '''
 
-        self._dataframe_obj = self._dataframe_obj.merge(
-            _similarity_check_df, how='outer', on=(target_column_a_label, target_column_b_label)
-        )
+        with stage('similarity', results_column_label=results_column_label) as _stage:
 
-    def _similarity_check_iterator(self, similarity_parameters_dicts, index):
-        '''Run the similarity check concurrently,  with each process responsible for a similarity_parameters_dicts 
-            dictionary (identified by the index). 
+            _stage.record(unique_values=len(unique_values_df))
 
-        Args: 
-            similarity_parameters_dicts: A list of dictionaries containing the parameters to be passed to the 
-                _similarity_check_function function.
-            index: The element in the similarity_parameters_dicts to be used.
+            return {results_column_label: similarity_ratios(
+                unique_values_df[target_column_a_label], unique_values_df[target_column_b_label], min_ratio)}
+
+    def _similarity_results(self, target_column_a_label=None, target_column_b_label=None, results_column_label=None, min_ratio=None, results_cache=None):
+        ''' Determine the similarity between two given Pandas Series and return it aligned to the rows of the dataframe. 
+
+        The similarity is determined once for each unique pair of values, and the results are expanded to the rows through their codes.
+
+        Args:  
+            target_column_a_labels: The label of one of the two Pandas Series to be proccessed. 
+            target_column_b_labels: The label of one of the two Pandas Series to be proccessed. 
+            results_column_labels: The label of the Pandas Series used to store the result from the similarity check.
+            min_ratio: An optional similarity threshold. The pairs below it are reported with a similarity of 0.
+            results_cache: An optional ResultsCache, which provides the similarity of the pairs of values already compared.
         Raises: 
             None
-        Returns:
-            The processed dataframe with a new column containing the result of the similarity check. 
+        Return: 
+            A dictionary with the results_column_label and an array with the similarity of each row.
         '''
 
-        self.check_similarity(**similarity_parameters_dicts[index])
+        _operation_key = _similarity_operation_key(
+            results_column_label, min_ratio) if results_cache is not None else None
 
-        return self._dataframe_obj
+        return map_unique_values(self._dataframe_obj, [target_column_a_label, target_column_b_label], lambda unique_values_df: self._check_unique_values_similarity(
+            unique_values_df, target_column_a_label, target_column_b_label, results_column_label, min_ratio),
+            results_cache, _operation_key)
+
+    def find_near_duplicates(self, target_column_label=None, min_ratio=None, ngram_size=None, max_bucket_size=None, results_column_label=None):
+        ''' Find the values of a given Pandas Series which are near-copies of each other. 
+
+        The unique values are blocked by the MinHash signatures of their n-grams (see MinHashIndex), and only the values 
+        in the same blocks are compared with the Levenshtein ratio. A small fraction of the near-duplicates can be missed.
+
+        Args:  
+            target_column_label: The label of the Pandas Series to be proccessed. 
+            min_ratio: The similarity threshold, between 0 and 1. If not provided, 0.8 is used.
+            ngram_size: The number of characters of the n-grams used to index the values. If not provided, 2 is used.
+            max_bucket_size: The maximum number of values in a block for them to be compared. If not provided, 100 is used.
+            results_column_label: If provided, the label of a new Pandas Series populated with the cluster of near-duplicates 
+                of each row, identified by one of its values (missing if the value has no near-duplicates).
+        Raises: 
+            AttributeError: If the target_column_label is not provided. 
+        Return: 
+            A dataframe with the pairs of near-duplicate values (value_a, value_b) and their similarity.
+        '''
+
+        if target_column_label is None:
+
+            raise AttributeError(
+                'Missing attributes for method find_near_duplicates (SimilarityChecker).')
+
+        _codes, _unique_values_df = factorize_columns(
+            self._dataframe_obj, target_column_label)
+
+        _unique_values = _unique_values_df[target_column_label]
+
+        # Missing values are not near-duplicates of anything
+        _indexed_positions = numpy.flatnonzero(_unique_values.notna().to_numpy())
+
+        _minhash_index = MinHashIndex(
+            _unique_values.iloc[_indexed_positions], ngram_size=ngram_size, max_bucket_size=max_bucket_size)
+
+        _similar_pairs = _minhash_index.similar_pairs(min_ratio)
+
+        _indexed_values = _unique_values.iloc[_indexed_positions].to_numpy()
 
-    def bulk_check_similarity(self, similarity_parameters_dicts):
+        _near_duplicates_df = pandas.DataFrame({
+            'value_a': [_indexed_values[pair[0]] for pair in _similar_pairs],
+            'value_b': [_indexed_values[pair[1]] for pair in _similar_pairs],
+            'similarity': [pair[2] for pair in _similar_pairs]
+        })
+
+        if results_column_label is not None:
+
+            _unique_clusters = numpy.full(len(_unique_values), None, dtype=object)
+
+            _unique_clusters[_indexed_positions] = [_indexed_values[cluster] if cluster >= 0 else None
+                                                    for cluster in _minhash_index.clusters(_similar_pairs)]
+
+            self._dataframe_obj = self._dataframe_obj.assign(
+                **{results_column_label: broadcast_results(_codes, _unique_clusters)})
+
+        return _near_duplicates_df
+
+    def bulk_check_similarity(self, similarity_parameters_dicts, executor=None, results_cache=None):
         '''For each dictionary of keyword arguments, run in parallel the check_similarity function. 
 
         Args: 
             similarity_parameters_dicts: A list of dictionaries containing the parameters to be passed to the 
                 check_similarity function. 
+            executor: An optional SharedMemoryExecutor used to run the similarity checks. If not provided, a default one is used.
+            results_cache: An optional ResultsCache or PersistentResultsCache, which provides the results of the values already processed.
         Raises: 
             None
         Returns:
             The processed Pandas dataframe with new columns containing the results of the similarity checks. 
         '''
 
-        from functools import partial
-        from rosetta.parallel.parallel_easy import imap_easy
-
-        _list_length = len(similarity_parameters_dicts)
-
-        _similarity_check_partial_func = partial(
-            self._similarity_check_iterator, similarity_parameters_dicts)
-
-        _results_iterator = imap_easy(
-            _similarity_check_partial_func, range(_list_length), -1, 10000
-        )
+        _executor = executor if executor is not None else SharedMemoryExecutor()
 
-        for result in _results_iterator:
+        _input_columns_labels = [label for parameters in similarity_parameters_dicts for label in (
+            parameters.get('target_column_a_label'), parameters.get('target_column_b_label'))]
 
-            self._dataframe_obj = result
+        self._dataframe_obj = _executor.run(
+            self._dataframe_obj, 'dc_similarity', '_similarity_results', similarity_parameters_dicts, _input_columns_labels, results_cache)
 
         return self._dataframe_obj
 
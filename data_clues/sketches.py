@@ -0,0 +1,663 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
+
+__all__ = ['CountMinSketch', 'HyperLogLog', 'ReservoirSample', 'SketchProfiler']
+
+import itertools
+
+import numpy
+import pandas
+from data_clues.utilities import shape_signatures
+from data_clues.instrumentation import stage
+
+# The key of the hash of the values, fixed so that the sketches built in different processes can be merged
+_HASH_KEY = 'dataclues_sketch'
+
+# The partition of the profilers built without one, numbered in the order they are built in the process
+_PROFILERS_PARTITIONS = itertools.count()
+
+
+def _canonical_value(value):
+    ''' Convert a float holding an integer into the integer, e.g. 1.0 into 1.
+
+    Args:
+        value: The value to be converted.
+    Raises:
+        None
+    Returns:
+        The integer, or the value itself.
+    '''
+
+    if isinstance(value, (float, numpy.floating)) and numpy.isfinite(value) and float(value).is_integer():
+        return int(value)
+
+    return value
+
+
+def _canonical_values(values):
+    ''' Give the numbers which are equal the same type, so that they are hashed in the same way whatever the data type of
+    their column, e.g. an int column which is float in the chunks with missing values.
+
+    Args:
+        values: The values to be converted.
+    Raises:
+        None
+    Returns:
+        An object array with the values, the floats holding an integer being converted into integers.
+    '''
+
+    _values = numpy.asarray(values, dtype=object)
+
+    # Only the floats are converted, e.g. not the strings and the integers
+    if pandas.api.types.infer_dtype(_values, skipna=True) not in ('floating', 'mixed-integer-float', 'mixed'):
+        return _values
+
+    return numpy.fromiter(map(_canonical_value, _values), dtype=object, count=len(_values))
+
+
+def _hash_values(values):
+    ''' Hash an array of values to 64-bit integers, in the same way in every process.
+
+    The numbers are hashed by value, e.g. 1 and 1.0 have the same hash (see _canonical_values).
+
+    Args:
+        values: The values to be hashed.
+    Raises:
+        None
+    Returns:
+        An array of unsigned 64-bit integers.
+    '''
+
+    return pandas.util.hash_pandas_object(pandas.Series(_canonical_values(values), dtype=object), index=False,
+                                          hash_key=_HASH_KEY).to_numpy()
+
+
+def _value_counts(values):
+    ''' Count the occurrences of the non-missing values.
+
+    Args:
+        values: The values to be counted.
+    Raises:
+        None
+    Returns:
+        A tuple with the array of the distinct values and the array of their counts. The numbers are counted by value,
+        e.g. 1 and 1.0 are the same value (see _canonical_values).
+    '''
+
+    _counts = pandas.Series(values).value_counts(sort=False, dropna=True)
+
+    # The unused categories of a categorical are counted as 0
+    _counts = _counts[_counts.to_numpy() > 0]
+
+    _values = _canonical_values(_counts.index)
+
+    # The equal numbers of different types, e.g. in an object column, are counted together
+    if len(set(_values)) < len(_values):
+
+        _counts = pandas.Series(_counts.to_numpy()).groupby(_values, sort=False).sum()
+
+        _values = numpy.asarray(_counts.index, dtype=object)
+
+    return _values, _counts.to_numpy(dtype=numpy.int64)
+
+
+def _bit_length(target_integers):
+    ''' Measure the number of significant bits of an array of unsigned 64-bit integers.
+
+    Args:
+        target_integers: The integers to be measured.
+    Raises:
+        None
+    Returns:
+        An array with the bit length of each integer, 0 for 0.
+    '''
+
+    _integers = target_integers.copy()
+    _bit_lengths = numpy.zeros(len(_integers), dtype=numpy.int64)
+
+    for shift in (32, 16, 8, 4, 2, 1):
+
+        _mask = _integers >= numpy.uint64(1 << shift)
+
+        _bit_lengths += _mask * shift
+        _integers = numpy.where(_mask, _integers >> numpy.uint64(shift), _integers)
+
+    return _bit_lengths + (_integers > 0)
+
+
+class CountMinSketch:
+    ''' Estimate the occurrences of the values of a stream in a fixed amount of memory, keeping track of the heavy hitters.
+
+    The estimates are never lower than the exact counts, and exceed them by at most 2 / width of the total count with a
+    probability of 1 - 2 ** -depth. Sketches with the same width and depth can be merged, e.g. across chunks and processes.
+
+    Attributes:
+        width: The number of counters of each row. If not provided, 2 ** 16 is used.
+        depth: The number of rows, each one with a different hash function. If not provided, 4 is used.
+        heavy_hitters: The number of most frequent values kept. If not provided, 20 is used.
+    '''
+
+    def __init__(self, width=None, depth=None, heavy_hitters=None):
+
+        self._width = width if width is not None else 2 ** 16
+        self._depth = depth if depth is not None else 4
+        self._heavy_hitters = heavy_hitters if heavy_hitters is not None else 20
+
+        self._counters = numpy.zeros((self._depth, self._width), dtype=numpy.int64)
+        self._total_count = 0
+
+        # The candidate heavy hitters and their estimated counts
+        self._candidates = {}
+
+    def _columns(self, hashes):
+        ''' Derive the counter of each row for each hash, by double hashing.
+
+        Args:
+            hashes: An array of 64-bit hashes.
+        Raises:
+            None
+        Returns:
+            A 2D array with the column of the counter of each row (one line per row of the sketch).
+        '''
+
+        _lower_hashes = (hashes & numpy.uint64(0xFFFFFFFF)).astype(numpy.int64)
+        _upper_hashes = (hashes >> numpy.uint64(32)).astype(numpy.int64) | 1
+
+        return numpy.stack([(_lower_hashes + row * _upper_hashes) % self._width for row in range(self._depth)])
+
+    def update(self, values, counts=None):
+        ''' Add values to the sketch. Missing values are ignored.
+
+        Args:
+            values: The values to be added.
+            counts: If provided, the number of occurrences of each value. Otherwise, the values are counted.
+        Raises:
+            None
+        Returns:
+            None
+        '''
+
+        _values, _counts = _value_counts(values) if counts is None else (
+            numpy.asarray(values, dtype=object), numpy.asarray(counts, dtype=numpy.int64))
+
+        if not len(_values):
+            return
+
+        _columns = self._columns(_hash_values(_values))
+
+        for row in range(self._depth):
+            self._counters[row] += numpy.bincount(
+                _columns[row], weights=_counts, minlength=self._width).astype(numpy.int64)
+
+        self._total_count += int(_counts.sum())
+
+        # Only the values of the current update can overtake the candidates
+        _estimates = self._counters[numpy.arange(self._depth)[:, None], _columns].min(axis=0)
+
+        _top_positions = numpy.argsort(-_estimates, kind='stable')[:self._heavy_hitters]
+
+        self._update_candidates({_values[position]: int(_estimates[position]) for position in _top_positions.tolist()})
+
+    def _update_candidates(self, new_candidates):
+        ''' Estimate again the candidate heavy hitters, along with new ones, and keep the most frequent.
+
+        Args:
+            new_candidates: A dictionary with the new candidates and their estimated counts.
+        Raises:
+            None
+        Returns:
+            None
+        '''
+
+        _candidates = list(dict.fromkeys(list(self._candidates) + list(new_candidates)))
+
+        _estimates = self.estimate(_candidates)
+
+        _top_positions = numpy.argsort(-_estimates, kind='stable')[:self._heavy_hitters]
+
+        self._candidates = {_candidates[position]: int(_estimates[position]) for position in _top_positions.tolist()}
+
+    def estimate(self, values):
+        ''' Estimate the occurrences of some values.
+
+        Args:
+            values: The values to be estimated.
+        Raises:
+            None
+        Returns:
+            An array with the estimated count of each value.
+        '''
+
+        if not len(values):
+            return numpy.zeros(0, dtype=numpy.int64)
+
+        _columns = self._columns(_hash_values(numpy.asarray(values, dtype=object)))
+
+        return self._counters[numpy.arange(self._depth)[:, None], _columns].min(axis=0)
+
+    def merge(self, other_sketch):
+        ''' Add the counts of another sketch, with the same width and depth, to this one.
+
+        Args:
+            other_sketch: The CountMinSketch to be merged.
+        Raises:
+            AttributeError: If the sketches have different sizes.
+        Returns:
+            The sketch, so that the merges can be chained.
+        '''
+
+        if (self._width, self._depth) != (other_sketch._width, other_sketch._depth):
+
+            raise AttributeError(
+                'Only sketches of the same width and depth can be merged (CountMinSketch).')
+
+        self._counters += other_sketch._counters
+        self._total_count += other_sketch._total_count
+
+        self._update_candidates(other_sketch._candidates)
+
+        return self
+
+    def get_heavy_hitters(self):
+        ''' Return the most frequent values.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            A list of tuples with the value and its estimated count, the most frequent first.
+        '''
+
+        return sorted(self._candidates.items(), key=lambda candidate: -candidate[1])
+
+    def get_total_count(self):
+        ''' Return the number of values added to the sketch.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            The total count.
+        '''
+
+        return self._total_count
+
+
+class HyperLogLog:
+    ''' Estimate the number of distinct values of a stream in a fixed amount of memory.
+
+    The relative standard error is about 1.04 / sqrt(2 ** precision), i.e. 0.8% with the default precision, using
+    2 ** precision bytes. Sketches with the same precision can be merged, e.g. across chunks and processes.
+
+    Attributes:
+        precision: The number of bits of the hash selecting the register, between 4 and 18. If not provided, 14 is used.
+    '''
+
+    def __init__(self, precision=None):
+
+        self._precision = precision if precision is not None else 14
+
+        if not 4 <= self._precision <= 18:
+
+            raise AttributeError(
+                'The precision has to be between 4 and 18 (HyperLogLog).')
+
+        self._registers = numpy.zeros(2 ** self._precision, dtype=numpy.uint8)
+
+    def update(self, values):
+        ''' Add values to the sketch. Missing values are ignored.
+
+        Args:
+            values: The values to be added.
+        Raises:
+            None
+        Returns:
+            None
+        '''
+
+        # The repetitions do not change the registers, so each value is hashed once
+        _values, _ = _value_counts(values)
+
+        if not len(_values):
+            return
+
+        _hashes = _hash_values(_values)
+
+        _register_positions = (_hashes >> numpy.uint64(64 - self._precision)).astype(numpy.int64)
+
+        # The rank is the position of the first 1 bit in the remaining bits of the hash
+        _remaining_bits = _hashes & numpy.uint64((1 << (64 - self._precision)) - 1)
+
+        _ranks = (64 - self._precision) - _bit_length(_remaining_bits) + 1
+
+        numpy.maximum.at(self._registers, _register_positions, _ranks.astype(numpy.uint8))
+
+    def estimate(self):
+        ''' Estimate the number of distinct values added to the sketch.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            The estimated number of distinct values.
+        '''
+
+        _registers_count = len(self._registers)
+
+        _alpha = 0.7213 / (1 + 1.079 / _registers_count)
+
+        _estimate = _alpha * _registers_count ** 2 / numpy.sum(2.0 ** -self._registers.astype(numpy.float64))
+
+        _empty_registers_count = int(numpy.count_nonzero(self._registers == 0))
+
+        # Small cardinalities are estimated more accurately by linear counting
+        if _estimate <= 2.5 * _registers_count and _empty_registers_count:
+            _estimate = _registers_count * numpy.log(_registers_count / _empty_registers_count)
+
+        return int(round(_estimate))
+
+    def merge(self, other_sketch):
+        ''' Add the distinct values of another sketch, with the same precision, to this one.
+
+        Args:
+            other_sketch: The HyperLogLog to be merged.
+        Raises:
+            AttributeError: If the sketches have different precisions.
+        Returns:
+            The sketch, so that the merges can be chained.
+        '''
+
+        if self._precision != other_sketch._precision:
+
+            raise AttributeError(
+                'Only sketches of the same precision can be merged (HyperLogLog).')
+
+        numpy.maximum(self._registers, other_sketch._registers, out=self._registers)
+
+        return self
+
+
+class ReservoirSample:
+    ''' Keep a uniform random sample of the values of a stream, e.g. examples of each column.
+
+    Each value gets a random priority, and the values with the lowest priorities are kept, so that samples built on
+    different chunks and processes can be merged into a uniform sample of all the values.
+
+    Attributes:
+        size: The number of values kept. If not provided, 10 is used.
+        seed: An optional seed of the random priorities, an integer or a sequence of integers. The samples to be merged
+            need distinct seeds, otherwise they draw the same priorities.
+    '''
+
+    def __init__(self, size=None, seed=None):
+
+        self._size = size if size is not None else 10
+        self._random_generator = numpy.random.default_rng(seed)
+
+        self._values = numpy.empty(0, dtype=object)
+        self._priorities = numpy.empty(0, dtype=numpy.float64)
+
+    def update(self, values):
+        ''' Add values to the sample. Missing values are ignored.
+
+        Args:
+            values: The values to be added.
+        Raises:
+            None
+        Returns:
+            None
+        '''
+
+        _values = numpy.asarray(pandas.Series(values).dropna(), dtype=object)
+
+        self._keep_lowest(_values, self._random_generator.random(len(_values)))
+
+    def _keep_lowest(self, values, priorities):
+        ''' Keep the values with the lowest priorities among the sampled ones and the new ones.
+
+        Args:
+            values: The new values.
+            priorities: The priority of each new value.
+        Raises:
+            None
+        Returns:
+            None
+        '''
+
+        # Only the lowest priorities of the new values can enter the sample
+        if len(values) > self._size:
+
+            _lowest_positions = numpy.argpartition(priorities, self._size)[:self._size]
+
+            values, priorities = values[_lowest_positions], priorities[_lowest_positions]
+
+        _values = numpy.concatenate([self._values, values])
+        _priorities = numpy.concatenate([self._priorities, priorities])
+
+        _order = numpy.argsort(_priorities, kind='stable')[:self._size]
+
+        self._values, self._priorities = _values[_order], _priorities[_order]
+
+    def merge(self, other_sample):
+        ''' Add the values of another sample to this one.
+
+        Args:
+            other_sample: The ReservoirSample to be merged.
+        Raises:
+            None
+        Returns:
+            The sample, so that the merges can be chained.
+        '''
+
+        self._keep_lowest(other_sample._values, other_sample._priorities)
+
+        return self
+
+    def get_values(self):
+        ''' Return the sampled values.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            A list with the sampled values.
+        '''
+
+        return self._values.tolist()
+
+
+class SketchProfiler:
+    ''' Profile the columns of a stream of chunks in bounded memory: the approximate number of distinct values, the heavy
+    hitters and a sample of examples of each column and, optionally, the same for the shapes of its values (see PatternsAnalyzer).
+
+    The profilers built on different chunks or processes can be merged.
+
+    Attributes:
+        columns_labels: The labels of the columns to be profiled. If not provided, all the columns of the first chunk.
+        shapes: If True, the shapes of the values are profiled too.
+        width: The width of the Count-Min sketches, see CountMinSketch.
+        depth: The depth of the Count-Min sketches, see CountMinSketch.
+        heavy_hitters: The number of most frequent values kept, see CountMinSketch.
+        precision: The precision of the HyperLogLog sketches, see HyperLogLog.
+        sample_size: The number of examples kept, see ReservoirSample.
+        seed: An optional seed of the samples. The sample of each column, and of each profiler, draws its own stream of
+            priorities from it.
+        partition: The number of the chunks profiled, e.g. of the process or of the partition, distinct for each of the
+            seeded profilers to be merged. If not provided, the profilers are numbered in the order they are built in
+            the process, so the profilers built in different processes need one.
+    '''
+
+    def __init__(self, columns_labels=None, shapes=False, width=None, depth=None, heavy_hitters=None, precision=None, sample_size=None, seed=None, partition=None):
+
+        self._columns_labels = list(columns_labels) if columns_labels is not None else None
+        self._shapes = shapes
+
+        self._sketches_parameters = {'width': width, 'depth': depth, 'heavy_hitters': heavy_hitters,
+                                     'precision': precision, 'sample_size': sample_size}
+        self._seed = seed
+        self._partition = partition if partition is not None else next(
+            _PROFILERS_PARTITIONS)
+
+        self._rows_count = 0
+
+        # The sketches of each column, and of the shapes of its values
+        self._sketches = {}
+
+    def _new_sketches(self, key):
+        ''' Build the empty sketches of a column.
+
+        Args:
+            key: The label of the column, or a tuple with the label and shapes for the shapes of its values.
+        Raises:
+            None
+        Returns:
+            A dictionary with the Count-Min sketch, the HyperLogLog and the sample.
+        '''
+
+        # The seed is mixed with the partition and the key, so that no two samples draw the same priorities
+        _sample_seed = None if self._seed is None else [
+            self._seed, self._partition, int(_hash_values([repr(key)])[0])]
+
+        return {'frequencies': CountMinSketch(self._sketches_parameters['width'], self._sketches_parameters['depth'], self._sketches_parameters['heavy_hitters']),
+                'distinct_values': HyperLogLog(self._sketches_parameters['precision']),
+                'examples': ReservoirSample(self._sketches_parameters['sample_size'], _sample_seed)}
+
+    def update(self, target_chunk):
+        ''' Add a chunk of data to the sketches.
+
+        Args:
+            target_chunk: The Pandas Dataframe to be profiled.
+        Raises:
+            None
+        Returns:
+            None
+        '''
+
+        if self._columns_labels is None:
+            self._columns_labels = list(target_chunk.columns)
+
+        with stage('profile', columns=','.join(map(str, self._columns_labels))) as _stage:
+
+            _stage.record(rows=len(target_chunk))
+
+            for label in self._columns_labels:
+
+                _values, _counts = _value_counts(target_chunk[label])
+
+                _targets = [(label, _values, _counts, target_chunk[label])]
+
+                if self._shapes:
+
+                    # Only the distinct values are shaped, and their shapes are weighted by their counts
+                    _value_shapes = shape_signatures(_values)
+
+                    _shapes_counts = pandas.Series(_counts).groupby(_value_shapes, sort=False).sum()
+
+                    _targets.append(((label, 'shapes'), numpy.asarray(_shapes_counts.index, dtype=object),
+                                     _shapes_counts.to_numpy(dtype=numpy.int64), numpy.repeat(_value_shapes, _counts)))
+
+                for key, values, counts, rows_values in _targets:
+
+                    _sketches = self._sketches.setdefault(key, self._new_sketches(key))
+
+                    _sketches['frequencies'].update(values, counts)
+                    _sketches['distinct_values'].update(values)
+                    _sketches['examples'].update(rows_values)
+
+        self._rows_count += len(target_chunk)
+
+    def process(self, target_chunks):
+        ''' Profile each chunk of data as it passes through, e.g. before the StreamingProcessor.
+
+        Args:
+            target_chunks: An iterable of Pandas Dataframes, e.g. DataImporter.iter_chunks().
+        Raises:
+            None
+        Returns:
+            A generator of the same chunks.
+        '''
+
+        for target_chunk in target_chunks:
+
+            self.update(target_chunk)
+
+            yield target_chunk
+
+    def merge(self, other_profiler):
+        ''' Add the sketches of another profiler, e.g. built by another process, to this one.
+
+        Args:
+            other_profiler: The SketchProfiler to be merged, with the same parameters.
+        Raises:
+            None
+        Returns:
+            The profiler, so that the merges can be chained.
+        '''
+
+        for key, other_sketches in other_profiler._sketches.items():
+
+            _sketches = self._sketches.setdefault(key, self._new_sketches(key))
+
+            for name, sketch in other_sketches.items():
+                _sketches[name].merge(sketch)
+
+        if self._columns_labels is None:
+            self._columns_labels = other_profiler._columns_labels
+
+        self._rows_count += other_profiler._rows_count
+
+        return self
+
+    def get_profile(self):
+        ''' Return the profile of each column.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            A dictionary with the number of rows and, for each column, a dictionary with its number of non-missing values,
+            its estimated number of distinct values, its heavy hitters (as pairs of value and estimated count) and
+            its examples. With shapes, the same details of the shapes of its values are under the shapes key.
+        '''
+
+        def _sketches_profile(sketches):
+
+            return {'values': sketches['frequencies'].get_total_count(),
+                    'distinct_values': sketches['distinct_values'].estimate(),
+                    'heavy_hitters': sketches['frequencies'].get_heavy_hitters(),
+                    'examples': sketches['examples'].get_values()}
+
+        _profile = {'rows': self._rows_count, 'columns': {}}
+
+        for label in self._columns_labels or []:
+
+            if label not in self._sketches:
+                continue
+
+            _profile['columns'][label] = _sketches_profile(self._sketches[label])
+
+            if (label, 'shapes') in self._sketches:
+                _profile['columns'][label]['shapes'] = _sketches_profile(self._sketches[(label, 'shapes')])
+
+        return _profile
+
+    def to_json(self, output_file):
+        ''' Write the profile of the columns in a JSON file.
+
+        Args:
+            output_file: The path of the JSON file.
+        Raises:
+            None
+        Returns:
+            None
+        '''
+
+        import json
+
+        with open(output_file, 'w') as _output_file:
+            json.dump(self.get_profile(), _output_file, indent=4, default=str)
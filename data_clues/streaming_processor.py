@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
+
+__all__ = ['StreamingProcessor']
+
+from data_clues.data_exporter import ChunksWriter
+from data_clues.pipeline import Pipeline
+from data_clues.results_cache import ResultsCache
+
+
+class StreamingProcessor:
+    ''' Run the matching, similarity and occurrences analyses on a stream of chunks of data, with bounded memory.
+
+    The results computed for the unique values of a chunk are kept in a ResultsCache, so that the values repeated in the
+    following chunks are not processed again.
+
+    Attributes:
+        matching_parameters_dicts: A list of dictionaries containing the parameters to be passed to the match_rows_to_keywords function.
+        similarity_parameters_dicts: A list of dictionaries containing the parameters to be passed to the check_similarity function.
+        occurrences_parameters_dicts: A list of dictionaries containing the parameters to be passed to the bulk_character_occurrences_analysis function.
+        results_cache: The cache of the results shared across chunks. If not provided, a default ResultsCache is used.
+        pipeline: An optional Pipeline to be run on each chunk, instead of the one built from the parameters dicts. Its
+            results cache, if any, is shared across chunks.
+    '''
+
+    def __init__(self, matching_parameters_dicts=None, similarity_parameters_dicts=None, occurrences_parameters_dicts=None, results_cache=None, pipeline=None):
+
+        if pipeline is not None:
+
+            self._pipeline = pipeline
+            self._results_cache = pipeline.get_results_cache()
+
+        else:
+
+            self._results_cache = results_cache if results_cache is not None else ResultsCache()
+
+            # The operations are planned once and run on every chunk
+            self._pipeline = Pipeline(matching_parameters_dicts, similarity_parameters_dicts,
+                                      occurrences_parameters_dicts, results_cache=self._results_cache)
+
+    def process_chunk(self, target_chunk):
+        ''' Run all the analyses on a chunk of data.
+
+        Args:
+            target_chunk: The Pandas Dataframe to be processed.
+        Raises:
+            None
+        Returns:
+            A new dataframe with the results columns of all the analyses.
+        '''
+
+        return self._pipeline.run(target_chunk)
+
+    def process(self, target_chunks):
+        ''' Run all the analyses on each chunk of data, as soon as it is available.
+
+        Args:
+            target_chunks: An iterable of Pandas Dataframes, e.g. DataImporter.iter_chunks().
+        Raises:
+            None
+        Returns:
+            A generator of processed dataframes.
+        '''
+
+        for target_chunk in target_chunks:
+            yield self.process_chunk(target_chunk)
+
+    def process_to_file(self, target_chunks, output_file, file_format=None, append=False):
+        ''' Run all the analyses on each chunk of data and append the results to a CSV, Parquet, Feather or Arrow IPC file, chunk by chunk.
+
+        Args:
+            target_chunks: An iterable of Pandas Dataframes, e.g. DataImporter.iter_chunks().
+            output_file: The path of the output file, which is overwritten.
+            file_format: The format of the file, i.e. csv, parquet, feather or arrow. If not provided, it is inferred from the file extension.
+            append: If True, the results are appended to the existing CSV file, e.g. the results of the rows imported incrementally.
+        Raises:
+            None
+        Returns:
+            The number of rows written.
+        '''
+
+        with ChunksWriter(output_file, file_format, append) as _writer:
+
+            for processed_chunk in self.process(target_chunks):
+                _writer.write(processed_chunk)
+
+        return _writer.close()
+
+    def process_to_csv(self, target_chunks, output_file):
+        ''' Run all the analyses on each chunk of data and append the results to a CSV file, chunk by chunk.
+
+        Args:
+            target_chunks: An iterable of Pandas Dataframes, e.g. DataImporter.iter_chunks().
+            output_file: The path of the CSV file, which is overwritten.
+        Raises:
+            None
+        Returns:
+            The number of rows written.
+        '''
+
+        return self.process_to_file(target_chunks, output_file, 'csv')
+
+    def get_results_cache(self):
+        ''' Return the cache of the results shared across chunks.
+
+        Args:
+            None
+        Raises:
+            None
+        Returns:
+            The ResultsCache or PersistentResultsCache, None if the pipeline has no cache.
+        '''
+
+        return self._results_cache
@@ -1,7 +1,30 @@
 # -*- coding: utf-8 -*-
 # Copyright (c) 2021 Francesco Ugolini <contact@francescougolini.com>
 
-__all__ = ['basic_unique_values', 'advanced_unique_values']
+__all__ = ['basic_unique_values', 'advanced_unique_values',
+           'factorize_columns', 'broadcast_results', 'map_unique_values',
+           'code_points_batches', 'count_character_types', 'shape_signatures']
+
+import numpy
+import pandas
+from data_clues.instrumentation import stage, record
+from data_clues.results_cache import value_key
+
+# The maximum number of strings, and of characters, held in a single batch of code points
+_BATCH_STRINGS_COUNT = 2 ** 16
+_BATCH_CHARACTERS_COUNT = 2 ** 22
+
+# The character type of each ASCII code point: 1 for letters, 2 for digits, 0 for the other characters
+_ASCII_CHARACTER_TYPES = numpy.array([1 if chr(code_point).isalpha() else 2 if chr(code_point).isdigit() else 0
+                                      for code_point in range(128)], dtype=numpy.int8)
+
+# The code point of the shape of each ASCII character: A for uppercase letters, a for lowercase letters, 9 for digits,
+# the character itself otherwise
+_ASCII_SHAPES = numpy.array([ord('A') if chr(code_point).isupper() else ord('a') if chr(code_point).islower() else ord('9')
+                             if chr(code_point).isdigit() else code_point for code_point in range(128)], dtype=numpy.uint32)
+
+# The shapes standing for a class of characters, whose runs can be collapsed
+_CLASS_SHAPES = numpy.array([ord('A'), ord('a'), ord('9')], dtype=numpy.uint32)
 
 
 def basic_unique_values(target_series):
@@ -37,3 +60,376 @@ def advanced_unique_values(target_dataframe, *target_series_headers):
     _unique_values = target_dataframe.drop_duplicates(subset=_series_subset)
 
     return _unique_values
+
+
+def factorize_columns(target_dataframe, *target_series_headers, factorized_columns=None):
+    ''' Encode the rows of one or more Pandas Series as integer codes, one for each unique (combination of) value(s).
+
+    Missing values are treated as values on their own, so they get a code as any other value. Categorical series are
+    factorized through their codes, and their unique values are returned with the data type of their categories.
+
+    Args: 
+        target_dataframe: The Pandas Dataframe from which the series belong. 
+        target_series_headers: The headers of Pandas Series to be proccessed.  
+        factorized_columns: An optional dictionary with the codes and the unique values of the series already factorized, 
+            which is updated with the new ones, so that each series is factorized only once.
+    Raises: 
+        None
+    Return: 
+        A tuple with an array containing the code of each row and a dataframe with the unique values, whose positions are the codes.
+    '''
+
+    _series_subset = list(target_series_headers)
+
+    _codes = None
+
+    for header in _series_subset:
+
+        if factorized_columns is not None and header in factorized_columns:
+
+            _series_codes, _series_uniques = factorized_columns[header]
+
+        else:
+
+            _series_codes, _series_uniques = pandas.factorize(
+                target_dataframe[header], use_na_sentinel=False)
+
+            # The analyses are run on the values, not on the categories
+            _series_uniques = _decode_categorical(_series_uniques)
+
+            if factorized_columns is not None:
+                factorized_columns[header] = (_series_codes, _series_uniques)
+
+        # Combine the codes of the different series in a single code, then compact them again
+        _codes = _series_codes.astype(numpy.int64) if _codes is None else pandas.factorize(
+            _codes * len(_series_uniques) + _series_codes)[0]
+
+    if len(_series_subset) == 1:
+
+        _unique_values = pandas.DataFrame({_series_subset[0]: _series_uniques})
+
+    else:
+
+        # Codes are assigned in order of appearance, so the first row of each code is found in the same order
+        _first_positions = numpy.unique(_codes, return_index=True)[1]
+
+        _unique_values = target_dataframe[_series_subset].iloc[_first_positions].reset_index(
+            drop=True)
+
+        _unique_values = _unique_values.assign(**{header: _decode_categorical(_unique_values[header])
+                                                  for header in _series_subset if isinstance(_unique_values[header].dtype, pandas.CategoricalDtype)})
+
+    return _codes, _unique_values
+
+
+def _decode_categorical(values):
+    ''' Convert categorical values to the data type of their categories.
+
+    Args: 
+        values: A Pandas Series or Index.
+    Raises: 
+        None
+    Return: 
+        The values, converted only if they are categorical.
+    '''
+
+    if isinstance(values.dtype, pandas.CategoricalDtype):
+        return values.astype(values.dtype.categories.dtype)
+
+    return values
+
+
+def broadcast_results(codes, unique_results, categorical=False):
+    ''' Expand the results computed for the unique values to all the rows.
+
+    Args: 
+        codes: The array containing the code of each row, as returned by factorize_columns.
+        unique_results: The results of the unique values, whose positions are the codes.
+        categorical: If True, the results are returned as a Pandas Categorical, which stores each distinct result once
+            along with an integer code for each row, instead of the result of each row.
+    Raises: 
+        None
+    Return: 
+        An array (or a Categorical) with the result of each row.
+    '''
+
+    if categorical:
+
+        # Missing results get the -1 code, i.e. a missing value of the Categorical
+        _results_codes, _distinct_results = pandas.factorize(
+            numpy.asarray(unique_results))
+
+        return pandas.Categorical.from_codes(_results_codes.take(codes), categories=_distinct_results)
+
+    return numpy.asarray(unique_results).take(codes)
+
+
+def map_unique_values(target_dataframe, target_series_headers, unique_results_function, results_cache=None, operation_key=None):
+    ''' Compute results once for each unique (combination of) value(s) and expand them to all the rows, keeping their order.
+
+    Args: 
+        target_dataframe: The Pandas Dataframe from which the series belong. 
+        target_series_headers: The list of headers of the Pandas Series to be proccessed.  
+        unique_results_function: A function receiving the dataframe of unique values and returning a dictionary with the 
+            label of each results column and the results of the unique values.
+        results_cache: An optional ResultsCache, from which the results of the values already seen are taken.
+        operation_key: The key identifying the operation in the results_cache, see operation_key.
+    Raises: 
+        None
+    Return: 
+        A dictionary with the label of each results column and the result of each row.
+    '''
+
+    with stage('factorize', columns=','.join(target_series_headers)) as _stage:
+
+        _codes, _unique_values = factorize_columns(
+            target_dataframe, *target_series_headers)
+
+        _stage.record(rows=len(_codes), unique_values=len(_unique_values))
+
+    with stage('compute', columns=','.join(target_series_headers)):
+
+        if results_cache is None:
+
+            _unique_results_dict = unique_results_function(_unique_values)
+
+        else:
+
+            _unique_results_dict = _cached_unique_results(
+                _unique_values, target_series_headers, unique_results_function, results_cache, operation_key)
+
+    with stage('broadcast', columns=','.join(target_series_headers)):
+
+        return {label: broadcast_results(_codes, unique_results)
+                for label, unique_results in _unique_results_dict.items()}
+
+
+def _cached_unique_results(unique_values, target_series_headers, unique_results_function, results_cache, operation_key):
+    ''' Compute the results of the unique values which are not in the cache, and take the others from there.
+
+    Args: 
+        unique_values: The dataframe of unique values.
+        target_series_headers: The list of headers of the Pandas Series to be proccessed.  
+        unique_results_function: A function receiving a dataframe of unique values and returning a dictionary with the 
+            label of each results column and their results.
+        results_cache: The ResultsCache, from which the results of the values already seen are taken.
+        operation_key: The key identifying the operation in the results_cache.
+    Raises: 
+        None
+    Return: 
+        A dictionary with the label of each results column and the results of the unique values.
+    '''
+
+    if len(target_series_headers) == 1:
+        _value_keys = [value_key(value) for value in unique_values[target_series_headers[0]]]
+    else:
+        _value_keys = [value_key(tuple(values)) for values in zip(
+            *(unique_values[header] for header in target_series_headers))]
+
+    _labels, _unique_results = results_cache.lookup(operation_key, _value_keys)
+
+    _missing_positions = [position for position, results in enumerate(_unique_results) if results is None]
+
+    record(cache_hits=len(_unique_results) - len(_missing_positions), cache_misses=len(_missing_positions))
+
+    # Without any result stored yet, the function is run anyway to know the labels of its results
+    if _missing_positions or _labels is None:
+
+        _computed_results_dict = unique_results_function(
+            unique_values.iloc[_missing_positions].reset_index(drop=True))
+
+        _labels = tuple(_computed_results_dict)
+
+        _computed_results = list(zip(*(numpy.asarray(results).tolist()
+                                       for results in _computed_results_dict.values())))
+
+        results_cache.store(operation_key, _labels, [
+                            _value_keys[position] for position in _missing_positions], _computed_results)
+
+        for position, results in zip(_missing_positions, _computed_results):
+            _unique_results[position] = results
+
+    # Restore the data types lost by storing the results as Python objects
+    return {label: pandas.Series([results[label_position] for results in _unique_results], dtype=object).infer_objects().to_numpy()
+            for label_position, label in enumerate(_labels)}
+
+
+def _character_types(code_points):
+    ''' Classify an array of code points as letters, digits or other characters, following str.isalpha and str.isdigit.
+
+    Args:
+        code_points: An array of Unicode code points.
+    Raises:
+        None
+    Returns:
+        An array of the same shape, with 1 for letters, 2 for digits and 0 for the other characters.
+    '''
+
+    _character_types_array = _ASCII_CHARACTER_TYPES.take(
+        numpy.minimum(code_points, 127))
+
+    _non_ascii_mask = code_points > 127
+
+    if _non_ascii_mask.any():
+
+        # Classify each distinct non-ASCII code point once, then look them up
+        _non_ascii_code_points = numpy.unique(code_points[_non_ascii_mask])
+
+        _non_ascii_types = numpy.array([1 if chr(code_point).isalpha() else 2 if chr(code_point).isdigit() else 0
+                                        for code_point in _non_ascii_code_points.tolist()], dtype=numpy.int8)
+
+        _character_types_array[_non_ascii_mask] = _non_ascii_types[numpy.searchsorted(
+            _non_ascii_code_points, code_points[_non_ascii_mask])]
+
+    return _character_types_array
+
+
+def _string_value(value):
+    ''' Convert a single value to the string analysed by the kernels, as code_points_batches does for an array.
+
+    Args:
+        value: The value to be converted.
+    Raises:
+        None
+    Returns:
+        The value itself if it is a string, an empty string if it is missing, or its string representation.
+    '''
+
+    return value if isinstance(value, str) else '' if pandas.isna(value) else str(value)
+
+
+def code_points_batches(target_strings):
+    ''' Convert an array of strings in batches of code points, grouping strings of similar length to limit the padding.
+
+    Args:
+        target_strings: The strings to be converted. Missing values are converted to empty strings.
+    Raises:
+        None
+    Returns:
+        A generator of tuples with the positions of the strings in the batch, their code points as a 2D array 
+        (padded with zeros) and their lengths.
+    '''
+
+    _target_strings = [value if isinstance(value, str) else '' if pandas.isna(value) else str(value)
+                       for value in target_strings]
+
+    _lengths = numpy.fromiter(map(len, _target_strings), dtype=numpy.int64, count=len(_target_strings))
+
+    _order = numpy.argsort(_lengths, kind='stable')
+
+    _batch_start = 0
+
+    while _batch_start < len(_order):
+
+        # Strings are sorted by length, so the last one of the candidate batch sets an upper bound to its width
+        _batch_width = max(int(_lengths[_order[min(_batch_start + _BATCH_STRINGS_COUNT, len(_order)) - 1]]), 1)
+
+        _batch_end = _batch_start + \
+            max(min(_BATCH_STRINGS_COUNT, _BATCH_CHARACTERS_COUNT // _batch_width), 1)
+
+        _positions = _order[_batch_start:_batch_end]
+
+        _batch_strings = numpy.array(
+            [_target_strings[position] for position in _positions.tolist()], dtype=str)
+
+        _code_points = _batch_strings.view(
+            numpy.uint32).reshape(len(_positions), -1)
+
+        yield _positions, _code_points, _lengths[_positions]
+
+        _batch_start = _batch_end
+
+
+def count_character_types(target_strings):
+    ''' Count the letters and the digits of an array of strings, processing the strings in batches of code points.
+
+    Args:
+        target_strings: The strings to be analysed. Missing values are counted as empty strings.
+    Raises:
+        None
+    Returns:
+        A tuple with the arrays of the letters, digits and total characters counts.
+    '''
+
+    _word_characters_count = numpy.zeros(len(target_strings), dtype=numpy.int64)
+    _digit_characters_count = numpy.zeros(len(target_strings), dtype=numpy.int64)
+    _total_characters_count = numpy.zeros(len(target_strings), dtype=numpy.int64)
+
+    for positions, code_points, lengths in code_points_batches(target_strings):
+
+        _character_types_array = _character_types(code_points)
+
+        # Padding zeros are neither letters nor digits, so they do not affect the counts
+        _word_characters_count[positions] = (_character_types_array == 1).sum(axis=1)
+        _digit_characters_count[positions] = (_character_types_array == 2).sum(axis=1)
+        _total_characters_count[positions] = lengths
+
+    return _word_characters_count, _digit_characters_count, _total_characters_count
+
+
+def _shape_code_points(code_points):
+    ''' Map an array of code points to the code points of their shapes, following str.isupper, str.islower and str.isdigit.
+
+    Args:
+        code_points: An array of Unicode code points.
+    Raises:
+        None
+    Returns:
+        An array of the same shape, with A for uppercase letters, a for lowercase letters, 9 for digits and the
+        character itself otherwise. Padding zeros stay zeros.
+    '''
+
+    _shapes_array = _ASCII_SHAPES.take(numpy.minimum(code_points, 127))
+
+    _non_ascii_mask = code_points > 127
+
+    if _non_ascii_mask.any():
+
+        # Shape each distinct non-ASCII code point once, then look them up
+        _non_ascii_code_points = numpy.unique(code_points[_non_ascii_mask])
+
+        _non_ascii_shapes = numpy.array([ord('A') if chr(code_point).isupper() else ord('a') if chr(code_point).islower() else ord('9')
+                                         if chr(code_point).isdigit() else code_point for code_point in _non_ascii_code_points.tolist()], dtype=numpy.uint32)
+
+        _shapes_array[_non_ascii_mask] = _non_ascii_shapes[numpy.searchsorted(
+            _non_ascii_code_points, code_points[_non_ascii_mask])]
+
+    return _shapes_array
+
+
+def shape_signatures(target_strings, compress_runs=False):
+    ''' Map an array of strings to their shape signatures (e.g. Aaaa.aaa99@aaaa.aaa), processing the strings in batches of code points.
+
+    Args:
+        target_strings: The strings to be shaped.
+        compress_runs: If True, the runs of letters of the same case, and of digits, are collapsed in a single
+            character (e.g. Aa.a9@a.a), so that values differing only in their lengths share the same shape.
+    Raises:
+        None
+    Returns:
+        An array of objects with the shape of each string, None for the missing values.
+    '''
+
+    _shapes = numpy.empty(len(target_strings), dtype=object)
+
+    for positions, code_points, lengths in code_points_batches(target_strings):
+
+        _shapes_array = _shape_code_points(code_points)
+
+        if compress_runs and _shapes_array.shape[1] > 1:
+
+            # Blank the characters repeating the class of the previous one, then move the blanks to the end of the rows
+            _repeated_mask = numpy.zeros(_shapes_array.shape, dtype=bool)
+            _repeated_mask[:, 1:] = (_shapes_array[:, 1:] == _shapes_array[:, :-1]) & numpy.isin(
+                _shapes_array[:, 1:], _CLASS_SHAPES)
+
+            _shapes_array = numpy.take_along_axis(numpy.where(_repeated_mask, 0, _shapes_array), numpy.argsort(
+                _repeated_mask, axis=1, kind='stable'), axis=1)
+
+        # The rows of code points are read back as strings, without the padding zeros
+        _shapes[positions] = numpy.ascontiguousarray(_shapes_array).view(
+            f'U{_shapes_array.shape[1]}').ravel().tolist()
+
+    _shapes[pandas.isna(numpy.asarray(target_strings, dtype=object))] = None
+
+    return _shapes
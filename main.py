@@ -11,13 +11,48 @@ import data_clues as dc
 from data.input import reference_keywords_lists as rkl
 
 # 2) Retrieve the csv or database data source from the config file.
-# NOTE: remember to specify in config.json the "data_source" type, i.e. "csv" or "database".
+# NOTE: remember to specify in config.json the "data_source" type, i.e. "csv", "database", "parquet", "feather" or "arrow".
 settings_reader = dc.SettingsReader('config.json')
 
+# Optionally, measure the duration, the memory and the counts of each processing stage.
+# NOTE: the instrumentation is enabled by the "instrumentation" section of config.json.
+instrumentation_settings = settings_reader.get_instrumentation_settings()
+
+metrics_collector = dc.MetricsCollector() if instrumentation_settings else None
+
+if metrics_collector is not None:
+    dc.add_hook(metrics_collector)
+
 # From the configuration file retrive the source data to be processed.
-data_importer = dc.DataImporter(**settings_reader.get_source_data())
+# NOTE: with a "chunk_size" in the data source settings, the data are streamed chunk by chunk. With a list of data
+# sources (or a glob pattern as filename), the sources are imported concurrently and concatenated.
+sources_data = settings_reader.get_sources_data()
+
+if len(sources_data) > 1:
+    data_importer = dc.MultiSourceImporter(sources_data, settings_reader.get_executor_settings().get('workers'))
+else:
+    data_importer = dc.DataImporter(**sources_data[0])
+
+streaming = any('chunk_size' in source_data for source_data in sources_data)
 
-target_df = data_importer.get_dataframe()
+# NOTE: with a "watermark_file" in the data source settings, only the rows added since the previous run are imported,
+# and their results are appended to the output file.
+incremental = any('watermark_file' in source_data for source_data in sources_data)
+
+# The optional store of the results, which are reused across runs for the values already processed.
+# When the data are streamed, the results are at least reused across chunks.
+results_cache_settings = settings_reader.get_results_cache_settings()
+
+# NOTE: with a "service" section in config.json, e.g. {"host": "127.0.0.1", "port": 8765} or {"unix_socket": "data_clues.sock"},
+# the analyses stay resident and run the jobs sent to the service, instead of processing the data source once.
+service_settings = settings_reader.get_service_settings()
+
+if results_cache_settings:
+    results_cache = dc.PersistentResultsCache(**results_cache_settings)
+elif streaming or service_settings:
+    results_cache = dc.ResultsCache()
+else:
+    results_cache = None
 
 # A list of dictionaries containing the parameters to perform the matching operations.
 matching_parameters_dict = [
@@ -71,18 +106,107 @@ occurrences_parameters_dicts = [
     },
 ]
 
-# Run the matching, similarity, and occurrences checks.
-target_df = target_df.dc_matching.bulk_data_matching(
-    matching_parameters_dict
-)
+# 3) Plan the analyses: each column is factorized once, the operations reading the same column are run in a single pass,
+# and the independent ones are run in parallel. Small datasets are processed serially.
+# NOTE: the analyses can also be declared in the "pipeline" section of config.json, referring to the reference lists by name.
+pipeline_settings = settings_reader.get_pipeline_settings()
+
+if pipeline_settings:
+
+    pipeline = dc.Pipeline.from_settings(
+        pipeline_settings, rkl, **settings_reader.get_executor_settings(), results_cache=results_cache,
+        persistent_pool=bool(service_settings)
+    )
+
+else:
+
+    pipeline = dc.Pipeline(
+        matching_parameters_dict, similarity_parameters_dict, occurrences_parameters_dicts,
+        **settings_reader.get_executor_settings(), results_cache=results_cache, persistent_pool=bool(service_settings)
+    )
+
+if service_settings:
+
+    # Serve the jobs until the process is interrupted, e.g. with Ctrl+C.
+    dc.AnalysisService(pipeline, **service_settings).serve_forever()
+
+    raise SystemExit
+
+# Optionally, profile the columns in bounded memory, with sketches of their distinct values, heavy hitters and examples.
+# NOTE: the profiling is enabled by the "profiling" section of config.json.
+profiling_settings = settings_reader.get_profiling_settings()
+
+profile_file = profiling_settings.pop('json_file', None)
+
+sketch_profiler = dc.SketchProfiler(**profiling_settings) if profiling_settings or profile_file else None
+
+if streaming:
+
+    target_chunks = data_importer.iter_chunks()
+
+    # The chunks are profiled as they pass through
+    if sketch_profiler is not None:
+        target_chunks = sketch_profiler.process(target_chunks)
+
+else:
+
+    target_df = data_importer.get_dataframe()
+
+    if sketch_profiler is not None:
+        sketch_profiler.update(target_df)
+
+# NOTE: with a "partitioning" section in config.json, the rows are hash-partitioned by a key column and spilled to disk,
+# and the pipeline is run on each partition in a pool of worker processes.
+partitioning_settings = settings_reader.get_partitioning_settings()
+
+if partitioning_settings:
+
+    partitioned_executor = dc.PartitionedExecutor(pipeline, **partitioning_settings)
+
+    if streaming:
+
+        partitioned_executor.process_to_file(
+            target_chunks, **settings_reader.get_output_settings(), append=incremental
+        )
+
+    else:
+
+        dc.export_dataframe(
+            partitioned_executor.run(target_df), **settings_reader.get_output_settings(), append=incremental
+        )
+
+elif streaming:
+
+    # Run the matching, similarity, and occurrences checks chunk by chunk, appending the results to the output file.
+    streaming_processor = dc.StreamingProcessor(pipeline=pipeline)
+
+    streaming_processor.process_to_file(
+        target_chunks, **settings_reader.get_output_settings(), append=incremental
+    )
+
+else:
+
+    # Run the matching, similarity, and occurrences checks.
+    target_df = pipeline.run(target_df)
+
+    # The format of the output file (CSV, Parquet, Feather or Arrow) is set in config.json.
+    dc.export_dataframe(
+        target_df, **settings_reader.get_output_settings(), append=incremental)
+
+# Remember the rows processed, once their results have been written.
+if incremental:
+    data_importer.save_watermark()
+
+# Export the profile of the columns.
+if sketch_profiler is not None and profile_file is not None:
+    sketch_profiler.to_json(profile_file)
 
-target_df = target_df.dc_similarity.bulk_check_similarity(
-    similarity_parameters_dict
-)
+# Export the metrics of the processing stages.
+if metrics_collector is not None:
 
-target_df = target_df.dc_occurrences.bulk_character_occurrences_analysis(
-    occurrences_parameters_dicts
-)
+    if 'json_file' in instrumentation_settings:
+        metrics_collector.to_json(instrumentation_settings['json_file'])
 
-target_df.to_csv('data/output/processed_dataframe.csv',
-                 index=None, header=True)
+    if 'prometheus_file' in instrumentation_settings:
+        metrics_collector.to_prometheus(
+            instrumentation_settings['prometheus_file'])